@@ -4,7 +4,9 @@
 # Bước 1: Thêm import vào đầu file medical_chatbot_controller.py
 # Tìm dòng import và thêm:
 
-from src.services.suggestion_agent_service import generate_next_questions
+from src.services.suggestion_agent_service import generate_next_questions_async
+from src.config.config import Config
+from src.services.cached_chatbot_service import cached_suggestions_async
 
 # Bước 2: Cập nhật response model
 # Tìm chat_response model (khoảng dòng 29-54) và thêm field suggestions:
@@ -20,6 +22,16 @@ chat_response = medical_chatbot_ns.model('MedicalChatResponse', {
 # Bước 3: Cập nhật SecureMedicalChat.post method
 # Tìm phần return (khoảng dòng 153-162) và sửa thành:
 
+        # ========== THÊM PHẦN NÀY ==========
+        # Generate next-question suggestions (cached theo hash của question + answer)
+        # Submit lên thread pool TRƯỚC khi commit để LLM call chạy song song với DB
+        suggestion_future = cached_suggestions_async(
+            generate_next_questions_async,
+            question,
+            answer
+        )
+        # ===================================
+        
         # Lưu câu trả lời bot
         bot_msg = Message(
             conversation_id=conversation.conversation_id,
@@ -32,26 +44,26 @@ chat_response = medical_chatbot_ns.model('MedicalChatResponse', {
         db.session.commit()
         
         # ========== THÊM PHẦN NÀY ==========
-        # Generate next-question suggestions
-        suggestions = []
-        try:
-            suggestions = generate_next_questions(
-                user_question=question,
-                bot_answer=answer
-            )
-        except Exception as e:
-            logger.warning(f"Failed to generate suggestions: {e}")
-            # Không block response nếu suggestion fail
-        # ===================================
-        
-        return {
+        # Dựng response trong lúc suggestion vẫn đang chạy; chỉ chờ ở bước cuối
+        # (có timeout để không block response)
+        result = {
             'question': question,
             'answer': answer,
-            'suggestions': suggestions,  # ← THÊM DÒNG NÀY
+            'suggestions': [],  # ← THÊM DÒNG NÀY
             'conversation_id': conversation.conversation_id,
             'user_info': {'user_id': user_id, 'name': user_name},
             'cache_info': {
                 'search_cached': search_from_cache,
                 'response_cached': response_from_cache
             }
-        }, 200
+        }
+        
+        try:
+            result['suggestions'] = suggestion_future.result(timeout=Config.SUGGESTION_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Failed to generate suggestions: {e}")
+            # Không block response nếu suggestion fail
+        # ===================================
+        
+        # Trả về kết quả cho Client
+        return result, 200
@@ -20,7 +20,7 @@ from src import create_app
 from src.models.base import db
 from src.models.user import User
 from werkzeug.security import generate_password_hash
-from sqlalchemy import text
+from sqlalchemy import inspect, text
 
 def add_admin_column():
     """Thêm cột is_admin vào bảng Users"""
@@ -29,8 +29,19 @@ def add_admin_column():
     with app.app_context():
         try:
             # Kiểm tra xem cột is_admin đã tồn tại chưa
-            inspector = db.inspect(db.engine)
-            columns = [col['name'] for col in inspector.get_columns('Users')]
+            # PostgreSQL: 1 query information_schema; SQLite (dev) không có information_schema -> Inspector
+            with db.engine.connect() as conn:
+                if db.engine.dialect.name == 'postgresql':
+                    rows = conn.execute(
+                        text(
+                            "SELECT column_name FROM information_schema.columns "
+                            "WHERE table_name = :table AND column_name = ANY(:columns)"
+                        ),
+                        {'table': 'Users', 'columns': ['is_admin']}
+                    )
+                    columns = {row[0] for row in rows}
+                else:
+                    columns = {col['name'] for col in inspect(conn).get_columns('Users')}
             
             if 'is_admin' not in columns:
                 print("📝 Thêm cột is_admin vào bảng Users...")
@@ -3,6 +3,7 @@ from src.models.base import db
 from src.models.conversation import Conversation
 from src.models.message import Message
 from src.models.user import User
+from sqlalchemy import func
 
 app = create_app()
 
@@ -32,8 +33,17 @@ with app.app_context():
     print("\n📋 All conversations for User 5:")
     user_convs = Conversation.query.filter_by(user_id=5).all()
     if user_convs:
+        # Count messages for all conversations in one grouped query
+        ids = [c.conversation_id for c in user_convs]
+        rows = (
+            db.session.query(Message.conversation_id, func.count())
+            .filter(Message.conversation_id.in_(ids))
+            .group_by(Message.conversation_id)
+            .all()
+        )
+        counts = dict(rows)
         for c in user_convs:
-            msg_count = Message.query.filter_by(conversation_id=c.conversation_id).count()
+            msg_count = counts.get(c.conversation_id, 0)
             print(f"   - ID: {c.conversation_id} | Title: {c.title} | Messages: {msg_count}")
     else:
         print("   (No conversations found)")
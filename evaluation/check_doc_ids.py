@@ -15,7 +15,7 @@ collection = get_or_create_collection()
 # Get first 20 documents
 results = collection.get(
     limit=20,
-    include=["metadatas", "documents"]
+    include=["metadatas"]  # Chỉ hiển thị metadata, không cần documents
 )
 
 print("=" * 60)
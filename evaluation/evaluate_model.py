@@ -9,15 +9,21 @@ Usage:
 """
 
 import os
+import re
 import sys
 import json
 import time
 import argparse
+import hashlib
+import inspect
+import sqlite3
+import threading
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Any, Tuple
 from pathlib import Path
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add project root to path
 project_root = Path(__file__).parent.parent
@@ -25,10 +31,12 @@ sys.path.insert(0, str(project_root))
 
 # Import from backend
 from src.nlp_model.phobert_embedding import PhoBERTEmbeddingFunction
+from src.nlp_model.embedding_cache import CachedEmbeddingFunction
 from src.services.medical_chatbot_service import (
     get_or_create_collection,
     hybrid_search,
-    generate_natural_response
+    generate_natural_response,
+    GENERATION_MODEL
 )
 from openai import OpenAI
 from dotenv import load_dotenv
@@ -37,18 +45,23 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # ==================== EVALUATION METRICS ====================
+# Các hàm metric nhận relevant_ids dạng list hoặc set/frozenset đã build sẵn
+# (build 1 lần mỗi row rồi truyền vào mọi metric/k, không tạo set lại mỗi lần gọi)
+
+def _as_set(relevant_ids) -> frozenset:
+    return relevant_ids if isinstance(relevant_ids, (set, frozenset)) else frozenset(relevant_ids)
 
 def calculate_precision_at_k(retrieved_ids: List[str], relevant_ids: List[str], k: int) -> float:
     """Precision@K: Tỷ lệ tài liệu đúng trong top K"""
     retrieved_k = retrieved_ids[:k]
-    relevant_set = set(relevant_ids)
+    relevant_set = _as_set(relevant_ids)
     correct = sum(1 for doc_id in retrieved_k if doc_id in relevant_set)
     return correct / k if k > 0 else 0.0
 
 def calculate_recall_at_k(retrieved_ids: List[str], relevant_ids: List[str], k: int) -> float:
     """Recall@K: Tỷ lệ tìm được tài liệu đúng trong top K"""
     retrieved_k = set(retrieved_ids[:k])
-    relevant_set = set(relevant_ids)
+    relevant_set = _as_set(relevant_ids)
     if len(relevant_set) == 0:
         return 0.0
     correct = len(retrieved_k & relevant_set)
@@ -56,52 +69,253 @@ def calculate_recall_at_k(retrieved_ids: List[str], relevant_ids: List[str], k:
 
 def calculate_mrr(retrieved_ids: List[str], relevant_ids: List[str]) -> float:
     """Mean Reciprocal Rank: 1 / vị trí của kết quả đúng đầu tiên"""
-    relevant_set = set(relevant_ids)
+    relevant_set = _as_set(relevant_ids)
     for i, doc_id in enumerate(retrieved_ids, 1):
         if doc_id in relevant_set:
             return 1.0 / i
     return 0.0
 
+# Bảng discount 1 / log2(i + 2) cho NDCG, tính 1 lần cho mỗi độ dài k
+_DCG_WEIGHTS = {}
+
+def _dcg_w(k: int) -> np.ndarray:
+    """Discount weights [1/log2(2), ..., 1/log2(k+1)] (read-only, cached theo k)"""
+    w = _DCG_WEIGHTS.get(k)
+    if w is None:
+        w = 1.0 / np.log2(np.arange(2, k + 2))
+        w.flags.writeable = False
+        _DCG_WEIGHTS[k] = w
+    return w
+
 def calculate_ndcg_at_k(retrieved_ids: List[str], relevant_ids: List[str], k: int) -> float:
     """NDCG@K: Normalized Discounted Cumulative Gain"""
     retrieved_k = retrieved_ids[:k]
-    relevant_set = set(relevant_ids)
+    relevant_set = _as_set(relevant_ids)
+    weights = _dcg_w(k)
     
-    # DCG
-    dcg = sum((1 if doc_id in relevant_set else 0) / np.log2(i + 2) 
-              for i, doc_id in enumerate(retrieved_k))
+    # DCG: vector hit 0/1 nhân với bảng discount (1 phép dot thay vì K lần log2)
+    hits = np.fromiter((doc_id in relevant_set for doc_id in retrieved_k), dtype=np.float64, count=len(retrieved_k))
+    dcg = float(hits @ weights[:len(hits)])
     
     # IDCG (ideal DCG)
     ideal_k = min(k, len(relevant_ids))
-    idcg = sum(1 / np.log2(i + 2) for i in range(ideal_k))
+    idcg = float(weights[:ideal_k].sum())
     
     return dcg / idcg if idcg > 0 else 0.0
 
+def calculate_retrieval_metrics(
+    retrieved_lists: List[List[str]],
+    relevant_lists: List[List[str]],
+    k_values: List[int]
+) -> Dict[str, np.ndarray]:
+    """
+    Precision@K / Recall@K / NDCG@K / MRR cho toàn bộ dataset cùng lúc.
+    
+    Xây ma trận hit H[i, j] = (retrieved_lists[i][j] thuộc relevant_lists[i]),
+    sau đó mọi metric chỉ là phép reduce trên H. Kết quả giống hệt các hàm
+    calculate_*_at_k ở trên nhưng không lặp Python theo từng (row, k).
+    
+    Returns:
+        Dict tên cột ('precision@k', 'recall@k', 'ndcg@k', 'mrr') -> array (N,)
+    """
+    n = len(retrieved_lists)
+    width = max([max(k_values)] + [len(r) for r in retrieved_lists])
+    
+    # 1 frozenset cho mỗi row, dùng chung cho ma trận hit và recall
+    relevant_sets = [_as_set(r) for r in relevant_lists]
+    
+    hits = np.zeros((n, width), dtype=bool)
+    for i, (retrieved, relevant_set) in enumerate(zip(retrieved_lists, relevant_sets)):
+        hits[i, :len(retrieved)] = [doc_id in relevant_set for doc_id in retrieved]
+    
+    n_relevant_unique = np.array([len(r) for r in relevant_sets], dtype=np.float64)
+    n_relevant = np.array([len(r) for r in relevant_lists])
+    discounts = _dcg_w(width)
+    
+    metrics = {}
+    for k in k_values:
+        hits_k = hits[:, :k]
+        metrics[f'precision@{k}'] = hits_k.sum(axis=1) / k
+        metrics[f'recall@{k}'] = np.divide(
+            hits_k.sum(axis=1), n_relevant_unique,
+            out=np.zeros(n), where=n_relevant_unique > 0
+        )
+        dcg = hits_k @ discounts[:k]
+        idcg = np.cumsum(discounts[:k])[np.minimum(k, n_relevant) - 1]
+        idcg = np.where(n_relevant > 0, idcg, 0.0)
+        metrics[f'ndcg@{k}'] = np.divide(dcg, idcg, out=np.zeros(n), where=idcg > 0)
+    
+    first_hit = hits.argmax(axis=1)
+    metrics['mrr'] = np.where(hits.any(axis=1), 1.0 / (first_hit + 1), 0.0)
+    
+    return metrics
+
+def _embed(texts: List[str], phobert_model, batch_size: int = 32) -> np.ndarray:
+    """Embed texts in batches, returns float32 matrix (len(texts), dim)"""
+    chunks = [
+        np.asarray(phobert_model(texts[i:i + batch_size]), dtype=np.float32)
+        for i in range(0, len(texts), batch_size)
+    ]
+    return np.vstack(chunks) if chunks else np.empty((0, 0), dtype=np.float32)
+
+def generation_fingerprint() -> str:
+    """
+    Hash của cấu hình generation: model + source của generate_natural_response
+    (chứa system/user prompt). Đổi model hoặc prompt -> cache cũ không còn khớp.
+    """
+    source = inspect.getsource(generate_natural_response)
+    return hashlib.blake2b((GENERATION_MODEL + '|' + source).encode('utf-8'), digest_size=16).hexdigest()
+
+class GenerationCache:
+    """
+    Cache câu trả lời LLM của evaluation trong SQLite (opt-in bằng --gen_cache PATH).
+    
+    - Exact: key = blake2b(fingerprint | question | top-5 retrieved ids + nội dung doc)
+      -> chạy lại cùng test set với cùng model/prompt không gọi lại OpenAI.
+    - Semantic (tùy chọn): nếu không trùng exact, tìm câu hỏi đã cache (cùng fingerprint)
+      có cosine >= semantic_threshold (so khớp embedding bằng 1 phép nhân ma trận numpy).
+    """
+    
+    def __init__(self, path: str, semantic_threshold: float = None, fingerprint: str = None):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.semantic_threshold = semantic_threshold
+        self.fingerprint = fingerprint or generation_fingerprint()
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generation_answers ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT, question TEXT, answer TEXT, embedding BLOB)"
+        )
+        self._conn.commit()
+        
+        # Embeddings câu hỏi (đã normalize) cho semantic lookup, chỉ của cùng fingerprint
+        self._keys, self._embs, self._matrix = [], [], None
+        if semantic_threshold is not None:
+            rows = self._conn.execute(
+                "SELECT key, embedding FROM generation_answers WHERE fingerprint = ? AND embedding IS NOT NULL",
+                (self.fingerprint,)
+            )
+            for key, blob in rows:
+                self._keys.append(key)
+                self._embs.append(np.frombuffer(blob, dtype=np.float32))
+    
+    def make_key(self, question: str, search_results: List[Dict[str, Any]]) -> str:
+        parts = [self.fingerprint, question]
+        for r in search_results[:5]:
+            parts.append(r['id'])
+            parts.append(r.get('document') or '')
+        return hashlib.blake2b('|'.join(parts).encode('utf-8')).hexdigest()
+    
+    def get(self, key: str, query_embedding: np.ndarray = None):
+        """Trả về câu trả lời đã cache hoặc None"""
+        with self._lock:
+            answer = self._lookup(key, query_embedding)
+            if answer is not None:
+                self.hits += 1
+            return answer
+    
+    def _lookup(self, key: str, query_embedding: np.ndarray = None):
+        row = self._conn.execute("SELECT answer FROM generation_answers WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            return row[0]
+        
+        if self.semantic_threshold is None or query_embedding is None or not self._keys:
+            return None
+        
+        if self._matrix is None:
+            self._matrix = np.vstack(self._embs)
+        sims = self._matrix @ _normalize(np.asarray(query_embedding, dtype=np.float32))
+        best = int(np.argmax(sims))
+        if sims[best] < self.semantic_threshold:
+            return None
+        row = self._conn.execute("SELECT answer FROM generation_answers WHERE key = ?", (self._keys[best],)).fetchone()
+        return row[0] if row else None
+    
+    def put(self, key: str, question: str, answer: str, query_embedding: np.ndarray = None):
+        emb = None
+        if query_embedding is not None:
+            emb = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generation_answers (key, fingerprint, question, answer, embedding) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, self.fingerprint, question, answer, emb.tobytes() if emb is not None else None)
+            )
+            self._conn.commit()
+            if emb is not None and self.semantic_threshold is not None:
+                self._keys.append(key)
+                self._embs.append(emb)
+                self._matrix = None
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
 def calculate_semantic_similarity(text1: str, text2: str, phobert_model) -> float:
     """Semantic Similarity using PhoBERT embeddings"""
     try:
-        emb1 = phobert_model([text1])[0]
-        emb2 = phobert_model([text2])[0]
+        # 1 forward pass cho cả 2 câu
+        emb1, emb2 = np.asarray(phobert_model([text1, text2]), dtype=np.float32)
         
         # Cosine similarity
-        dot_product = np.dot(emb1, emb2)
-        norm1 = np.linalg.norm(emb1)
-        norm2 = np.linalg.norm(emb2)
-        
-        return float(dot_product / (norm1 * norm2))
+        return float(np.dot(emb1, emb2) / np.sqrt(np.vdot(emb1, emb1) * np.vdot(emb2, emb2)))
     except Exception as e:
         print(f"Warning: Semantic similarity calculation failed: {e}")
         return 0.0
 
+def _normalize(x: np.ndarray) -> np.ndarray:
+    """L2-normalize theo chiều cuối: cosine similarity trở thành dot product"""
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+def _quantize_int8(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: x ~= codes / scales[:, None]"""
+    scales = 127.0 / np.maximum(np.abs(x).max(axis=1), 1e-12)
+    codes = np.round(x * scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def calculate_semantic_similarities(
+    generated: List[str],
+    expected: List[str],
+    phobert_model,
+    int8: bool = False
+) -> np.ndarray:
+    """
+    Semantic Similarity cho nhiều cặp (generated, expected) cùng thứ tự.
+    Embed tất cả text trong 1 lượt batched PhoBERT, cosine = dot product sau normalize.
+    
+    int8=True: lưu embeddings dạng int8 (1/4 bộ nhớ so với float32), dot product
+    tích lũy int32 rồi chia lại scale; sai số ~1e-3, đủ cho metric báo cáo 2-3 chữ số.
+    """
+    if not generated:
+        return np.zeros(0, dtype=np.float32)
+    
+    norm_emb = _normalize(_embed(list(generated) + list(expected), phobert_model))
+    gen_norm_emb, expected_norm_emb = norm_emb[:len(generated)], norm_emb[len(generated):]
+    if not int8:
+        return (gen_norm_emb * expected_norm_emb).sum(axis=1)
+    
+    gen_q, gen_scales = _quantize_int8(gen_norm_emb)
+    expected_q, expected_scales = _quantize_int8(expected_norm_emb)
+    # int16 không đủ cho tổng 768 tích 127*127 -> tích lũy int32
+    dots = np.einsum('ij,ij->i', gen_q.astype(np.int32), expected_q.astype(np.int32))
+    return (dots / (gen_scales * expected_scales)).astype(np.float32)
+
+MEDICAL_KEYWORDS = [
+    'sốt', 'đau', 'viêm', 'nhiễm', 'bệnh', 'thuốc', 'paracetamol', 'aspirin',
+    'xuất huyết', 'tiểu cầu', 'gan', 'phổi', 'tim', 'vắc-xin', 'điều trị',
+    'triệu chứng', 'phòng ngừa', 'chẩn đoán', 'xét nghiệm'
+]
+
+# 1 regex alternation duy nhất, compile 1 lần: quét text 1 lượt thay vì 19 lần `in`.
+# Lookahead để bắt cả các keyword chồng lấn nhau (giống hệt ngữ nghĩa substring).
+_MEDICAL_KEYWORDS_RE = re.compile(
+    '(?=(' + '|'.join(re.escape(kw) for kw in sorted(MEDICAL_KEYWORDS, key=len, reverse=True)) + '))'
+)
+
 def extract_medical_entities(text: str) -> set:
     """Extract medical entities (simple keyword-based)"""
-    medical_keywords = [
-        'sốt', 'đau', 'viêm', 'nhiễm', 'bệnh', 'thuốc', 'paracetamol', 'aspirin',
-        'xuất huyết', 'tiểu cầu', 'gan', 'phổi', 'tim', 'vắc-xin', 'điều trị',
-        'triệu chứng', 'phòng ngừa', 'chẩn đoán', 'xét nghiệm'
-    ]
-    text_lower = text.lower()
-    return {kw for kw in medical_keywords if kw in text_lower}
+    return set(_MEDICAL_KEYWORDS_RE.findall(text.lower()))
 
 def calculate_entity_accuracy(generated: str, reference: str) -> float:
     """Medical Entity Accuracy: Tỷ lệ thực thể y tế đúng"""
@@ -116,26 +330,48 @@ def calculate_entity_accuracy(generated: str, reference: str) -> float:
 
 # ==================== EVALUATION FUNCTIONS ====================
 
+GENERATION_FAILED = "[Generation skipped - no API key or error]"
+
+# Các cột phase2_score cần; khi stream ra JSONL chỉ giữ các cột này trong RAM
+SCORING_COLUMNS = ['question', 'expected_answer', 'generated_answer', 'retrieved_ids', 'relevant_ids', 'response_time']
+
+def _json_default(obj):
+    """numpy scalar/array -> kiểu Python khi ghi JSONL"""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    return str(obj)
+
 def evaluate_single_question(
     question: str,
     expected_answer: str,
     relevant_doc_ids: List[str],  # Now optional - can be empty list
     phobert_model,
     k_values: List[int] = [1, 3, 5],
-    auto_detect_relevant: bool = True  # NEW: Auto-detect relevant docs
+    auto_detect_relevant: bool = True,  # NEW: Auto-detect relevant docs
+    query_embedding: np.ndarray = None,  # Vector câu hỏi đã tính sẵn (batch)
+    eval_generation: bool = False,  # False: chỉ đánh giá retrieval, bỏ qua LLM call
+    search_results: List[Dict[str, Any]] = None,  # Kết quả retrieval tính sẵn (VD: vector_search_all)
+    generation_cache: 'GenerationCache' = None  # Cache câu trả lời LLM giữa các lần chạy
 ) -> Dict[str, Any]:
-    """Đánh giá một câu hỏi"""
+    """Chạy retrieval (+ generation) cho một câu hỏi, trả về raw record chưa có metrics"""
     
     start_time = time.time()
     
     # 1. RETRIEVAL
-    try:
-        search_results = hybrid_search(question, n_results=max(k_values))
+    if search_results is not None:
         retrieved_ids = [r['id'] for r in search_results]
-    except Exception as e:
-        print(f"Error in retrieval: {e}")
-        retrieved_ids = []
-        search_results = []
+    else:
+        try:
+            search_results = hybrid_search(
+                question,
+                n_results=max(k_values),
+                query_embedding=query_embedding.tolist() if query_embedding is not None else None
+            )
+            retrieved_ids = [r['id'] for r in search_results]
+        except Exception as e:
+            print(f"Error in retrieval: {e}")
+            retrieved_ids = []
+            search_results = []
     
     # 2. AUTO-DETECT RELEVANT DOC IDs (NEW!)
     if auto_detect_relevant and not relevant_doc_ids:
@@ -150,70 +386,290 @@ def evaluate_single_question(
         if relevant_doc_ids:
             print(f"   Auto-detected {len(relevant_doc_ids)} relevant docs (score ≥ {RELEVANCE_THRESHOLD})")
     
-    # 3. GENERATION (optional - comment out nếu không có OpenAI API key)
-    try:
-        generated_answer = generate_natural_response(
-            question=question,
-            search_results=search_results,
-            extracted_features={},
-            conversation_id=None,
-            user_name=None
-        )
-        generated_answer = generated_answer.get('answer', '') if isinstance(generated_answer, dict) else str(generated_answer)
-    except Exception as e:
-        print(f"Warning: Generation failed: {e}")
-        generated_answer = "[Generation skipped - no API key or error]"
+    # 3. GENERATION (optional - bật bằng --eval_generation, tốn 1 OpenAI call/câu)
+    generated_answer = ''
+    cache_key = None
+    if eval_generation and generation_cache is not None:
+        cache_key = generation_cache.make_key(question, search_results)
+        generated_answer = generation_cache.get(cache_key, query_embedding) or ''
+    
+    if eval_generation and not generated_answer:
+        try:
+            generated_answer = generate_natural_response(
+                question=question,
+                search_results=search_results,
+                extracted_features={},
+                conversation_id=None,
+                user_name=None
+            )
+            generated_answer = generated_answer.get('answer', '') if isinstance(generated_answer, dict) else str(generated_answer)
+            if cache_key is not None and generated_answer:
+                generation_cache.put(cache_key, question, generated_answer, query_embedding)
+        except Exception as e:
+            print(f"Warning: Generation failed: {e}")
+            generated_answer = GENERATION_FAILED
     
     response_time = time.time() - start_time
     
-    # 4. CALCULATE METRICS
+    # 4. RAW RECORD (chưa tính metrics)
     result = {
         'question': question,
         'expected_answer': expected_answer,
         'generated_answer': generated_answer,
-        'retrieved_ids': retrieved_ids[:10],  # Top 10
+        'retrieved_ids': retrieved_ids[:max(10, max(k_values))],  # Top 10 (hoặc top K lớn nhất)
         'relevant_ids': relevant_doc_ids,
         'auto_detected': auto_detect_relevant and len(relevant_doc_ids) > 0,
         'response_time': response_time,
     }
     
-    # Add top retrieval scores for analysis
-    if search_results:
-        result['top_scores'] = [
-            {
-                'id': r['id'],
-                'score': r.get('relevance_score', 0),
-                'disease': r.get('metadata', {}).get('disease_name', 'N/A')[:50]
-            }
-            for r in search_results[:3]
-        ]
-    
-    # Retrieval metrics
-    for k in k_values:
-        result[f'precision@{k}'] = calculate_precision_at_k(retrieved_ids, relevant_doc_ids, k)
-        result[f'recall@{k}'] = calculate_recall_at_k(retrieved_ids, relevant_doc_ids, k)
-        result[f'ndcg@{k}'] = calculate_ndcg_at_k(retrieved_ids, relevant_doc_ids, k)
-    
-    result['mrr'] = calculate_mrr(retrieved_ids, relevant_doc_ids)
+    # Add top retrieval scores for analysis (luôn có key để các record cùng schema)
+    result['top_scores'] = [
+        {
+            'id': r['id'],
+            'score': r.get('relevance_score', 0),
+            'disease': r.get('metadata', {}).get('disease_name', 'N/A')[:50]
+        }
+        for r in search_results[:3]
+    ]
     
-    # Response quality metrics (only if generation succeeded)
-    if generated_answer and generated_answer != "[Generation skipped - no API key or error]":
-        result['semantic_similarity'] = calculate_semantic_similarity(
-            generated_answer, expected_answer, phobert_model
+    # Metrics (retrieval + response quality) được tính cho toàn bộ dataset
+    # trong phase2_score
+    return result
+
+
+def vector_search_all(
+    query_emb: np.ndarray,
+    n_results: int,
+    page_size: int = 1000,
+    query_block: int = 256
+) -> List[List[Dict[str, Any]]]:
+    """
+    Baseline chỉ dùng vector (không BM25/rerank) cho TẤT CẢ câu hỏi cùng lúc.
+    
+    Load toàn bộ embeddings của collection 1 lần, L2-normalize, rồi cosine cho
+    mọi câu hỏi là 1 phép GEMM Q @ D.T (theo block câu hỏi để giới hạn RAM).
+    
+    Returns:
+        List (theo thứ tự query_emb) các list kết quả dạng hybrid_search
+        ('id', 'relevance_score', 'metadata'), đã sắp xếp theo score giảm dần
+    """
+    collection = get_or_create_collection()
+    total_docs = collection.count()
+    
+    ids, metadatas, doc_emb = [], [], None
+    for offset in range(0, total_docs, page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+        if not page['ids']:
+            break
+        chunk = np.asarray(page['embeddings'], dtype=np.float32)
+        if doc_emb is None:
+            doc_emb = np.empty((total_docs, chunk.shape[1]), dtype=np.float32)
+        doc_emb[len(ids):len(ids) + len(chunk)] = chunk
+        ids.extend(page['ids'])
+        metadatas.extend(page['metadatas'])
+    
+    if doc_emb is None:
+        return [[] for _ in range(len(query_emb))]
+    
+    doc_norm = _normalize(doc_emb[:len(ids)])
+    query_norm = _normalize(np.asarray(query_emb, dtype=np.float32))
+    k = min(n_results, len(ids))
+    
+    all_results = []
+    for start in range(0, len(query_norm), query_block):
+        sims = query_norm[start:start + query_block] @ doc_norm.T
+        # Top-k không cần sort toàn bộ: argpartition rồi chỉ sort k phần tử
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1)
+        top, top_sims = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_sims, order, axis=1)
+        
+        for row_idx, row_sims in zip(top, top_sims):
+            all_results.append([
+                {
+                    'id': ids[doc_idx],
+                    'relevance_score': float(min(max(sim, 0.0), 1.0)),
+                    'metadata': metadatas[doc_idx] or {}
+                }
+                for doc_idx, sim in zip(row_idx, row_sims)
+            ])
+    
+    return all_results
+
+
+def phase1_collect(
+    test_df: pd.DataFrame,
+    phobert_model,
+    k_values: List[int] = [1, 3, 5],
+    auto_detect_relevant: bool = True,
+    max_workers: int = 8,
+    eval_generation: bool = False,
+    stream_path: str = None,
+    vector_only: bool = False,
+    generation_cache: GenerationCache = None
+) -> pd.DataFrame:
+    """
+    Phase 1: chạy retrieval (+ generation) cho mọi câu hỏi, chỉ lưu raw output.
+    
+    Nếu có stream_path: mỗi record đầy đủ được ghi ra JSONL (theo thứ tự test_df)
+    ngay khi xong, trong RAM chỉ giữ SCORING_COLUMNS -> peak RSS không phụ thuộc
+    vào top_scores/text của toàn bộ dataset, và có kết quả một phần nếu bị dừng giữa chừng.
+    
+    vector_only=True: bỏ qua hybrid_search, retrieval cho mọi câu hỏi bằng 1 GEMM
+    (xem vector_search_all) - baseline chẩn đoán cho riêng vector search.
+    
+    Phần tốn kém (ChromaDB, OpenAI) nằm hết ở đây; kết quả có thể chấm lại bằng
+    phase2_score với k_values khác mà không cần chạy lại retrieval/generation
+    (retrieved_ids giữ top max(10, max(k_values))).
+    
+    Returns:
+        DataFrame raw records theo thứ tự test_df, hoặc None nếu không có kết quả
+    """
+    # Embed toàn bộ câu hỏi 1 lần (batched) thay vì mỗi hybrid_search tự embed
+    question_emb = _embed(test_df['question'].astype(str).tolist(), phobert_model)
+    
+    precomputed_results = None
+    if vector_only:
+        precomputed_results = vector_search_all(question_emb, n_results=max(k_values))
+    
+    def run_one(position: int) -> Dict[str, Any]:
+        row = test_df.iloc[position]
+        return evaluate_single_question(
+            question=row['question'],
+            expected_answer=row['expected_answer'],
+            relevant_doc_ids=row['relevant_doc_ids'],
+            phobert_model=phobert_model,
+            k_values=k_values,
+            auto_detect_relevant=auto_detect_relevant,
+            query_embedding=question_emb[position],
+            eval_generation=eval_generation,
+            search_results=precomputed_results[position] if precomputed_results is not None else None,
+            generation_cache=generation_cache
         )
-        result['entity_accuracy'] = calculate_entity_accuracy(generated_answer, expected_answer)
-    else:
-        result['semantic_similarity'] = 0.0
-        result['entity_accuracy'] = 0.0
     
-    return result
+    # Retrieval + generation (OpenAI, I/O-bound) chạy song song trên thread pool
+    results_by_position = {}  # None = câu hỏi bị lỗi
+    next_to_write = 0
+    stream = open(stream_path, 'w', encoding='utf-8') if stream_path else None
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run_one, pos): pos for pos in range(len(test_df))}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Evaluating"):
+                pos = futures[future]
+                try:
+                    results_by_position[pos] = future.result()
+                except Exception as e:
+                    print(f"❌ Error evaluating question {pos + 1}: {e}")
+                    results_by_position[pos] = None
+                
+                if stream is None:
+                    continue
+                # Ghi theo đúng thứ tự test file: flush các vị trí liên tiếp đã xong
+                while next_to_write in results_by_position:
+                    record = results_by_position[next_to_write]
+                    if record is not None:
+                        stream.write(json.dumps(record, ensure_ascii=False, default=_json_default) + '\n')
+                        results_by_position[next_to_write] = {c: record[c] for c in SCORING_COLUMNS}
+                    next_to_write += 1
+    finally:
+        if stream is not None:
+            stream.close()
+    
+    # Giữ thứ tự như test file
+    records = [results_by_position[pos] for pos in sorted(results_by_position)]
+    records = [r for r in records if r is not None]
+    if not records:
+        return None
+    
+    return pd.DataFrame(records)
+
+
+def phase2_score(
+    results_df: pd.DataFrame,
+    k_values: List[int],
+    phobert_model,
+    eval_generation: bool = False,
+    int8_similarity: bool = False
+) -> pd.DataFrame:
+    """
+    Phase 2: tính toàn bộ metrics từ raw records của phase1_collect.
+    
+    - Retrieval metrics: vectorized qua ma trận hit (calculate_retrieval_metrics)
+    - Semantic similarity: 1 lượt batched PhoBERT cho mọi cặp generated/expected
+    - Entity accuracy: regex keyword trên từng cặp
+    
+    Khi eval_generation=False, 2 metric chất lượng là NaN (summary dùng nanmean).
+    """
+    results_df = results_df.copy()
+    
+    retrieval_metrics = calculate_retrieval_metrics(
+        results_df['retrieved_ids'].tolist(),
+        results_df['relevant_ids'].tolist(),
+        k_values
+    )
+    for name, values in retrieval_metrics.items():
+        results_df[name] = values
+    
+    if not eval_generation:
+        results_df['semantic_similarity'] = np.nan
+        results_df['entity_accuracy'] = np.nan
+        return results_df
+    
+    # Response quality metrics (only if generation succeeded, 0.0 otherwise)
+    results_df['semantic_similarity'] = 0.0
+    results_df['entity_accuracy'] = 0.0
+    generated_mask = results_df['generated_answer'].ne(GENERATION_FAILED) & \
+        results_df['generated_answer'].astype(bool)
+    if generated_mask.any():
+        generated = results_df.loc[generated_mask, 'generated_answer'].tolist()
+        expected = results_df.loc[generated_mask, 'expected_answer'].astype(str).tolist()
+        try:
+            results_df.loc[generated_mask, 'semantic_similarity'] = calculate_semantic_similarities(
+                generated, expected, phobert_model, int8=int8_similarity
+            )
+        except Exception as e:
+            print(f"Warning: Semantic similarity calculation failed: {e}")
+        results_df.loc[generated_mask, 'entity_accuracy'] = [
+            calculate_entity_accuracy(g, e) for g, e in zip(generated, expected)
+        ]
+    
+    return results_df
+
+
+def save_results(stream_path: str, scores_df: pd.DataFrame, output_file: str, chunksize: int = 1000):
+    """
+    Ghép raw records (JSONL từ phase1_collect) với metrics của phase2_score và ghi ra
+    output_file. CSV được ghi theo từng chunk nên không cần load toàn bộ records vào RAM.
+    """
+    metric_cols = [c for c in scores_df.columns if c not in SCORING_COLUMNS]
+    
+    def chunks():
+        offset = 0
+        for records in pd.read_json(stream_path, lines=True, dtype=False, precise_float=True, chunksize=chunksize):
+            scores = scores_df[metric_cols].iloc[offset:offset + len(records)]
+            offset += len(records)
+            yield pd.concat([records.reset_index(drop=True), scores.reset_index(drop=True)], axis=1)
+    
+    if output_file.endswith('.csv'):
+        with open(output_file, 'w', encoding='utf-8-sig', newline='') as f:
+            for i, chunk in enumerate(chunks()):
+                chunk.to_csv(f, index=False, header=(i == 0))
+    elif output_file.endswith('.json'):
+        pd.concat(chunks(), ignore_index=True).to_json(output_file, orient='records', force_ascii=False, indent=2)
 
 
 def evaluate_dataset(
     test_file: str,
     output_file: str = None,
     k_values: List[int] = [1, 3, 5],
-    auto_detect_relevant: bool = True  # NEW: Enable auto-detection
+    auto_detect_relevant: bool = True,  # NEW: Enable auto-detection
+    max_workers: int = 8,
+    embedding_cache_dir: str = '.cache/phobert',  # None = chỉ cache trong RAM
+    eval_generation: bool = False,  # True: gọi LLM để tính semantic similarity / entity accuracy
+    int8_similarity: bool = False,  # True: semantic similarity trên embeddings int8
+    vector_only: bool = False,  # True: retrieval chỉ bằng vector (1 GEMM), không BM25
+    generation_cache_path: str = None,  # Opt-in: file SQLite cache câu trả lời LLM (None = không cache)
+    generation_cache_semantic: bool = False  # True: dùng lại câu trả lời của câu hỏi gần giống (cosine >= 0.95)
 ) -> Tuple[pd.DataFrame, Dict[str, float]]:
     """Đánh giá toàn bộ test dataset"""
     
@@ -224,7 +680,11 @@ def evaluate_dataset(
     # Load test data
     print(f"\n📂 Loading test data from: {test_file}")
     if test_file.endswith('.csv'):
-        test_df = pd.read_csv(test_file)
+        try:
+            # pyarrow: parser đa luồng, nhanh hơn engine mặc định với CSV nhiều text
+            test_df = pd.read_csv(test_file, engine='pyarrow')
+        except ImportError:
+            test_df = pd.read_csv(test_file)
     elif test_file.endswith('.json'):
         test_df = pd.read_json(test_file)
     else:
@@ -248,9 +708,12 @@ def evaluate_dataset(
     if 'category' in test_df.columns:
         print(f"   Categories: {test_df['category'].value_counts().to_dict()}")
     
-    # Initialize PhoBERT
+    # Initialize PhoBERT (bọc cache embedding theo hash text)
     print("\n🧠 Loading PhoBERT model...")
-    phobert_model = PhoBERTEmbeddingFunction()
+    phobert_model = CachedEmbeddingFunction(
+        PhoBERTEmbeddingFunction(),
+        cache_path=os.path.join(embedding_cache_dir, 'embedding_cache.db') if embedding_cache_dir else None
+    )
     print("✅ PhoBERT loaded")
     
     # Check ChromaDB
@@ -269,34 +732,48 @@ def evaluate_dataset(
         print("   Mode: AUTO-DETECT (using retrieval scores to determine relevance)")
     else:
         print("   Mode: MANUAL (using provided doc IDs)")
+    if vector_only:
+        print("   Retrieval: VECTOR-ONLY baseline (no BM25)")
     print("-" * 60)
     
-    results = []
-    for idx, row in tqdm(test_df.iterrows(), total=len(test_df), desc="Evaluating"):
-        try:
-            result = evaluate_single_question(
-                question=row['question'],
-                expected_answer=row['expected_answer'],
-                relevant_doc_ids=row['relevant_doc_ids'],
-                phobert_model=phobert_model,
-                k_values=k_values,
-                auto_detect_relevant=auto_detect_relevant
-            )
-            results.append(result)
-            
-            # Print progress every 5 questions
-            if (idx + 1) % 5 == 0:
-                print(f"   Processed {idx + 1}/{len(test_df)} questions")
-        
-        except Exception as e:
-            print(f"❌ Error evaluating question {idx + 1}: {e}")
-            continue
+    # Stream record đầy đủ ra JSONL cạnh output file; RAM chỉ giữ cột để chấm điểm
+    stream_path = os.path.splitext(output_file)[0] + '.jsonl' if output_file else None
+    
+    generation_cache = None
+    if eval_generation and generation_cache_path:
+        generation_cache = GenerationCache(
+            generation_cache_path,
+            semantic_threshold=0.95 if generation_cache_semantic else None
+        )
+        print(f"   Generation cache: {generation_cache_path} (reusing cached answers for model {GENERATION_MODEL} + current prompt)")
+    
+    results_df = phase1_collect(
+        test_df,
+        phobert_model,
+        k_values=k_values,
+        auto_detect_relevant=auto_detect_relevant,
+        max_workers=max_workers,
+        eval_generation=eval_generation,
+        stream_path=stream_path,
+        vector_only=vector_only,
+        generation_cache=generation_cache
+    )
+    if generation_cache is not None:
+        print(f"   Generation cache: reused {generation_cache.hits} cached answers")
+        generation_cache.close()
     
-    if not results:
+    if results_df is None:
         print("❌ No results generated")
         return None, None
     
-    results_df = pd.DataFrame(results)
+    results_df = phase2_score(
+        results_df,
+        k_values,
+        phobert_model,
+        eval_generation=eval_generation,
+        int8_similarity=int8_similarity
+    )
+    phobert_model.close()
     
     # Calculate summary statistics
     print("\n" + "=" * 60)
@@ -320,10 +797,15 @@ def evaluate_dataset(
     
     # Response quality
     print("\n💬 RESPONSE QUALITY METRICS:")
-    metrics_summary['Semantic Similarity'] = results_df['semantic_similarity'].mean()
-    metrics_summary['Entity Accuracy'] = results_df['entity_accuracy'].mean()
-    print(f"   Semantic Similarity: {metrics_summary['Semantic Similarity']:.4f}")
-    print(f"   Entity Accuracy: {metrics_summary['Entity Accuracy']:.4f}")
+    if eval_generation:
+        metrics_summary['Semantic Similarity'] = float(np.nanmean(results_df['semantic_similarity']))
+        metrics_summary['Entity Accuracy'] = float(np.nanmean(results_df['entity_accuracy']))
+        print(f"   Semantic Similarity: {metrics_summary['Semantic Similarity']:.4f}")
+        print(f"   Entity Accuracy: {metrics_summary['Entity Accuracy']:.4f}")
+    else:
+        metrics_summary['Semantic Similarity'] = None
+        metrics_summary['Entity Accuracy'] = None
+        print("   Skipped (chạy lại với --eval_generation để tính)")
     
     # Performance
     print("\n⚡ PERFORMANCE METRICS:")
@@ -347,39 +829,40 @@ def evaluate_dataset(
     else:
         print("   ❌ Retrieval: POOR (Precision@3 < 0.5)")
     
-    if semantic_sim >= 0.7:
-        print("   ✅ Response Quality: GOOD (Semantic Similarity ≥ 0.7)")
-        score += 1
-    elif semantic_sim >= 0.5:
-        print("   ⚠️  Response Quality: MEDIUM (Semantic Similarity = 0.5-0.7)")
+    if not eval_generation:
+        print("   ⏭️  Response Quality / Medical Accuracy: SKIPPED (--eval_generation off)")
+        print(f"\n📈 RETRIEVAL SCORE: {score}/1")
     else:
-        print("   ❌ Response Quality: POOR (Semantic Similarity < 0.5)")
+        if semantic_sim >= 0.7:
+            print("   ✅ Response Quality: GOOD (Semantic Similarity ≥ 0.7)")
+            score += 1
+        elif semantic_sim >= 0.5:
+            print("   ⚠️  Response Quality: MEDIUM (Semantic Similarity = 0.5-0.7)")
+        else:
+            print("   ❌ Response Quality: POOR (Semantic Similarity < 0.5)")
     
-    if entity_acc >= 0.8:
-        print("   ✅ Medical Accuracy: GOOD (Entity Accuracy ≥ 0.8)")
-        score += 1
-    elif entity_acc >= 0.6:
-        print("   ⚠️  Medical Accuracy: MEDIUM (Entity Accuracy = 0.6-0.8)")
-    else:
-        print("   ❌ Medical Accuracy: POOR (Entity Accuracy < 0.6)")
+        if entity_acc >= 0.8:
+            print("   ✅ Medical Accuracy: GOOD (Entity Accuracy ≥ 0.8)")
+            score += 1
+        elif entity_acc >= 0.6:
+            print("   ⚠️  Medical Accuracy: MEDIUM (Entity Accuracy = 0.6-0.8)")
+        else:
+            print("   ❌ Medical Accuracy: POOR (Entity Accuracy < 0.6)")
     
-    print(f"\n📈 OVERALL SCORE: {score}/3")
-    if score >= 2:
-        print("   🎉 Model is GOOD - Ready for production!")
-    elif score == 1:
-        print("   ⚠️  Model is MEDIUM - Needs improvement")
-    else:
-        print("   ❌ Model is POOR - Major improvements needed")
+        print(f"\n📈 OVERALL SCORE: {score}/3")
+        if score >= 2:
+            print("   🎉 Model is GOOD - Ready for production!")
+        elif score == 1:
+            print("   ⚠️  Model is MEDIUM - Needs improvement")
+        else:
+            print("   ❌ Model is POOR - Major improvements needed")
     
     print("=" * 60)
     
     # Save results
     if output_file:
         print(f"\n💾 Saving results to: {output_file}")
-        if output_file.endswith('.csv'):
-            results_df.to_csv(output_file, index=False, encoding='utf-8-sig')
-        elif output_file.endswith('.json'):
-            results_df.to_json(output_file, orient='records', force_ascii=False, indent=2)
+        save_results(stream_path, results_df, output_file)
         
         # Save summary
         summary_file = output_file.replace('.csv', '_summary.json').replace('.json', '_summary.json')
@@ -389,6 +872,7 @@ def evaluate_dataset(
         print(f"✅ Results saved:")
         print(f"   - {output_file}")
         print(f"   - {summary_file}")
+        print(f"   - {stream_path} (raw records)")
     
     return results_df, metrics_summary
 
@@ -415,6 +899,50 @@ def main():
         default=[1, 3, 5],
         help='K values for Precision@K, Recall@K (default: 1 3 5)'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=8,
+        help='Number of questions evaluated in parallel (default: 8)'
+    )
+    parser.add_argument(
+        '--eval_generation',
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help='Generate answers with the LLM and compute Semantic Similarity / Entity Accuracy. '
+             'Off by default: retrieval-only runs skip one multi-second OpenAI call per question '
+             '(much faster, no API cost) but report no response-quality metrics (default: off)'
+    )
+    parser.add_argument(
+        '--vector_only',
+        action='store_true',
+        help='Diagnostic baseline: retrieve with pure vector search for all questions in one '
+             'matrix multiply instead of per-question hybrid_search (no BM25)'
+    )
+    parser.add_argument(
+        '--gen_cache',
+        type=str,
+        default=None,
+        metavar='PATH',
+        help='Opt-in SQLite cache of generated answers keyed by model + prompt hash, question '
+             'and top-5 retrieved documents (default: off)'
+    )
+    parser.add_argument(
+        '--gen_cache_semantic',
+        action='store_true',
+        help='Also reuse cached answers of near-duplicate questions (cosine >= 0.95)'
+    )
+    parser.add_argument(
+        '--int8_similarity',
+        action='store_true',
+        help='Quantize answer embeddings to int8 for Semantic Similarity (4x less memory, ~1e-3 error)'
+    )
+    parser.add_argument(
+        '--embedding_cache',
+        type=str,
+        default='.cache/phobert',
+        help='Directory for persisted PhoBERT embeddings, "" to disable (default: .cache/phobert)'
+    )
     
     args = parser.parse_args()
     
@@ -422,7 +950,14 @@ def main():
         results_df, metrics_summary = evaluate_dataset(
             test_file=args.test_file,
             output_file=args.output,
-            k_values=args.k_values
+            k_values=args.k_values,
+            max_workers=args.workers,
+            embedding_cache_dir=args.embedding_cache or None,
+            eval_generation=args.eval_generation,
+            int8_similarity=args.int8_similarity,
+            vector_only=args.vector_only,
+            generation_cache_path=args.gen_cache or None,
+            generation_cache_semantic=args.gen_cache_semantic
         )
         
         if results_df is not None:
@@ -10,6 +10,7 @@ import os
 import sys
 from dotenv import load_dotenv
 import psycopg2
+from psycopg2 import sql
 
 # Load environment variables
 load_dotenv()
@@ -70,42 +71,75 @@ def check_postgresql_connection():
         print(f"\n❌ Unexpected error: {str(e)}")
         return False
 
+# DDL dựng sẵn từ models (scripts/database/compile_ddl.py)
+SCHEMA_SQL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations', 'schema.sql')
+
 def create_tables():
-    """Create all tables using SQLAlchemy models"""
+    """Create all tables from the prebuilt schema (falls back to SQLAlchemy models)"""
     print("\n" + "=" * 60)
     print("STEP 2: Creating Database Tables")
     print("=" * 60)
     
+    if not os.path.exists(SCHEMA_SQL_PATH):
+        print(f"\n⚠️  {SCHEMA_SQL_PATH} not found, using SQLAlchemy models")
+        print("   (run: python scripts/database/compile_ddl.py)")
+        return create_tables_from_models()
+    
     try:
-        # Import Flask app and database
-        from src import create_app
-        from src.models.base import db
-        
-        # Import all models to ensure they're registered
-        from src.models import (
-            User, Conversation, Message, OTP, 
-            Notification, Itinerary, ItineraryItem
-        )
-        
-        print("\n📦 Creating Flask app context...")
-        app = create_app()
-        
-        with app.app_context():
-            print("🔨 Creating all tables...")
-            db.create_all()
-            
-            print("\n✅ Tables created successfully!")
-            
-            # List all tables
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            tables = inspector.get_table_names()
-            
-            print(f"\n📋 Created {len(tables)} tables:")
-            for table in sorted(tables):
-                print(f"   ✓ {table}")
-            
-            return True
+        with open(SCHEMA_SQL_PATH, encoding='utf-8') as f:
+            ddl = f.read()
+        
+        conn = psycopg2.connect(os.getenv('DATABASE_POSTGRESQL_URL'))
+        try:
+            # 1 round-trip, 1 transaction: commit khi thành công, rollback nếu lỗi
+            with conn, conn.cursor() as cursor:
+                print(f"🔨 Executing {SCHEMA_SQL_PATH}...")
+                cursor.execute(ddl)
+                
+                cursor.execute("""
+                    SELECT table_name 
+                    FROM information_schema.tables 
+                    WHERE table_schema = 'public'
+                    ORDER BY table_name;
+                """)
+                tables = [row[0] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        
+        print("\n✅ Tables created successfully!")
+        print(f"\n📋 Created {len(tables)} tables:")
+        for table in tables:
+            print(f"   ✓ {table}")
+        
+        return True
+        
+    except Exception as e:
+        print(f"\n❌ Error creating tables: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def create_tables_from_models():
+    """Create all tables using SQLAlchemy models"""
+    try:
+        # Engine tối giản: không cần create_app() (blueprints, PhoBERT, ChromaDB)
+        from sqlalchemy import inspect
+        from scripts._minimal_db import engine, Base
+        
+        print("🔨 Creating all tables...")
+        Base.metadata.create_all(engine)
+        
+        print("\n✅ Tables created successfully!")
+        
+        # List all tables
+        inspector = inspect(engine)
+        tables = inspector.get_table_names()
+        
+        print(f"\n📋 Created {len(tables)} tables:")
+        for table in sorted(tables):
+            print(f"   ✓ {table}")
+        
+        return True
             
     except Exception as e:
         print(f"\n❌ Error creating tables: {str(e)}")
@@ -142,13 +176,22 @@ def verify_tables():
         
         print(f"\n✅ Found {len(existing_tables)} tables in database:")
         
+        # Count rows: 1 câu UNION ALL cho mọi bảng (1 round-trip thay vì 1 query / bảng)
+        found_tables = [table for table in expected_tables if table in existing_tables]
+        row_counts = {}
+        if found_tables:
+            cursor.execute(sql.SQL(" UNION ALL ").join(
+                sql.SQL("SELECT {name}, COUNT(*) FROM {table}").format(
+                    name=sql.Literal(table), table=sql.Identifier(table)
+                )
+                for table in found_tables
+            ))
+            row_counts = dict(cursor.fetchall())
+        
         all_found = True
         for table in expected_tables:
-            if table in existing_tables:
-                # Count rows
-                cursor.execute(f'SELECT COUNT(*) FROM "{table}";')
-                count = cursor.fetchone()[0]
-                print(f"   ✓ {table} ({count} rows)")
+            if table in row_counts:
+                print(f"   ✓ {table} ({row_counts[table]} rows)")
             else:
                 print(f"   ✗ {table} (MISSING)")
                 all_found = False
@@ -11,33 +11,38 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 print("🔄 Starting migration...")
 
 try:
-    from src import create_app
-    from src.models.base import db
+    # Engine tối giản: không cần create_app() (blueprints, PhoBERT, ChromaDB)
+    from sqlalchemy import inspect
+    from scripts._minimal_db import engine, Base
     
     print("✅ Imported modules successfully")
     
-    app = create_app()
-    print("✅ Created Flask app")
+    # DDL dựng sẵn từ models (scripts/database/compile_ddl.py): 1 round-trip thay vì create_all()
+    schema_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
     
-    with app.app_context():
-        print("🔄 Creating tables...")
-        db.create_all()
-        print("✅ Tables created!")
-        
-        # Verify tables exist
-        from sqlalchemy import inspect
-        inspector = inspect(db.engine)
-        tables = inspector.get_table_names()
-        
-        print(f"\n📊 Database tables ({len(tables)}):")
-        for table in sorted(tables):
-            print(f"   - {table}")
+    print("🔄 Creating tables...")
+    if os.path.exists(schema_path):
+        with open(schema_path, encoding='utf-8') as f:
+            ddl = f.read()
+        with engine.begin() as conn:
+            conn.exec_driver_sql(ddl)
+    else:
+        Base.metadata.create_all(engine)
+    print("✅ Tables created!")
+    
+    # Verify tables exist
+    inspector = inspect(engine)
+    tables = inspector.get_table_names()
+    
+    print(f"\n📊 Database tables ({len(tables)}):")
+    for table in sorted(tables):
+        print(f"   - {table}")
+    
+    if 'MedicationSchedules' in tables and 'MedicationLogs' in tables:
+        print("\n✅ SUCCESS: Medication tables created!")
+    else:
+        print("\n⚠️  WARNING: Medication tables not found")
         
-        if 'MedicationSchedules' in tables and 'MedicationLogs' in tables:
-            print("\n✅ SUCCESS: Medication tables created!")
-        else:
-            print("\n⚠️  WARNING: Medication tables not found")
-            
 except Exception as e:
     print(f"\n❌ ERROR: {e}")
     import traceback
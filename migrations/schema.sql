@@ -0,0 +1,183 @@
+-- Generated by scripts/database/compile_ddl.py from src/models. Do not edit by hand.
+
+DO $$ BEGIN
+    CREATE TYPE sender_enum AS ENUM ('user', 'bot');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+DO $$ BEGIN
+    CREATE TYPE message_type_enum AS ENUM ('text', 'voice');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+CREATE TABLE IF NOT EXISTS "Attractions" (
+	id VARCHAR(50) NOT NULL,
+	name VARCHAR(255) NOT NULL,
+	address VARCHAR(500) NOT NULL,
+	description TEXT,
+	image_url VARCHAR(500),
+	rating FLOAT,
+	latitude FLOAT,
+	longitude FLOAT,
+	category VARCHAR(100),
+	tags JSON,
+	price FLOAT,
+	opening_hours VARCHAR(200),
+	phone_number VARCHAR(20),
+	language VARCHAR(500),
+	aliases JSON,
+	PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS "OTP" (
+	id SERIAL NOT NULL,
+	email VARCHAR(100),
+	otp_code VARCHAR(6),
+	purpose VARCHAR(20),
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	expires_at TIMESTAMP WITHOUT TIME ZONE,
+	is_used BOOLEAN,
+	PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS "Users" (
+	user_id SERIAL NOT NULL,
+	full_name VARCHAR(100),
+	email VARCHAR(100),
+	password_hash VARCHAR(255),
+	language_preference VARCHAR(10),
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	is_verified BOOLEAN,
+	is_admin BOOLEAN,
+	PRIMARY KEY (user_id),
+	UNIQUE (email)
+);
+
+CREATE TABLE IF NOT EXISTS "Conversations" (
+	conversation_id SERIAL NOT NULL,
+	user_id INTEGER,
+	started_at TIMESTAMP WITHOUT TIME ZONE,
+	ended_at TIMESTAMP WITHOUT TIME ZONE,
+	source_language VARCHAR(10),
+	title VARCHAR(100),
+	summary TEXT,
+	is_archived BOOLEAN,
+	is_pinned BOOLEAN,
+	PRIMARY KEY (conversation_id),
+	FOREIGN KEY(user_id) REFERENCES "Users" (user_id)
+);
+
+CREATE TABLE IF NOT EXISTS "HealthProfiles" (
+	user_id INTEGER NOT NULL,
+	date_of_birth DATE,
+	gender VARCHAR(10),
+	blood_type VARCHAR(5),
+	height FLOAT,
+	weight FLOAT,
+	allergies TEXT,
+	chronic_conditions TEXT,
+	medications TEXT,
+	family_history TEXT,
+	created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	PRIMARY KEY (user_id),
+	FOREIGN KEY(user_id) REFERENCES "Users" (user_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS "Itineraries" (
+	id SERIAL NOT NULL,
+	user_id INTEGER NOT NULL,
+	selected_date DATE NOT NULL,
+	title VARCHAR(255),
+	notes TEXT,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	updated_at TIMESTAMP WITHOUT TIME ZONE,
+	is_deleted BOOLEAN,
+	PRIMARY KEY (id),
+	FOREIGN KEY(user_id) REFERENCES "Users" (user_id)
+);
+
+CREATE TABLE IF NOT EXISTS "MedicationSchedules" (
+	schedule_id SERIAL NOT NULL,
+	user_id INTEGER NOT NULL,
+	medication_name VARCHAR(200) NOT NULL,
+	dosage VARCHAR(100),
+	frequency VARCHAR(50) NOT NULL,
+	time_of_day TEXT NOT NULL,
+	start_date DATE NOT NULL,
+	end_date DATE,
+	notes TEXT,
+	is_active BOOLEAN NOT NULL,
+	created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	PRIMARY KEY (schedule_id),
+	FOREIGN KEY(user_id) REFERENCES "Users" (user_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS "ix_MedicationSchedules_user_id" ON "MedicationSchedules" (user_id);
+
+CREATE TABLE IF NOT EXISTS "ItineraryItems" (
+	id SERIAL NOT NULL,
+	itinerary_id INTEGER NOT NULL,
+	attraction_id VARCHAR(50) NOT NULL,
+	visit_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	estimated_duration INTEGER,
+	notes TEXT,
+	order_index INTEGER,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	PRIMARY KEY (id),
+	FOREIGN KEY(itinerary_id) REFERENCES "Itineraries" (id),
+	FOREIGN KEY(attraction_id) REFERENCES "Attractions" (id)
+);
+
+CREATE TABLE IF NOT EXISTS "MedicationLogs" (
+	log_id SERIAL NOT NULL,
+	schedule_id INTEGER NOT NULL,
+	user_id INTEGER NOT NULL,
+	scheduled_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	actual_time TIMESTAMP WITHOUT TIME ZONE,
+	status VARCHAR(20) NOT NULL,
+	note TEXT,
+	created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	PRIMARY KEY (log_id),
+	FOREIGN KEY(schedule_id) REFERENCES "MedicationSchedules" (schedule_id) ON DELETE CASCADE,
+	FOREIGN KEY(user_id) REFERENCES "Users" (user_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS "ix_MedicationLogs_schedule_id" ON "MedicationLogs" (schedule_id);
+
+CREATE INDEX IF NOT EXISTS "ix_MedicationLogs_scheduled_time" ON "MedicationLogs" (scheduled_time);
+
+CREATE INDEX IF NOT EXISTS "ix_MedicationLogs_user_id" ON "MedicationLogs" (user_id);
+
+CREATE TABLE IF NOT EXISTS "Messages" (
+	message_id SERIAL NOT NULL,
+	conversation_id INTEGER,
+	sender sender_enum,
+	message_text TEXT,
+	translated_text TEXT,
+	message_type message_type_enum,
+	voice_url TEXT,
+	sent_at TIMESTAMP WITHOUT TIME ZONE,
+	places JSON,
+	PRIMARY KEY (message_id),
+	FOREIGN KEY(conversation_id) REFERENCES "Conversations" (conversation_id)
+);
+
+CREATE TABLE IF NOT EXISTS "Notifications" (
+	id SERIAL NOT NULL,
+	user_id INTEGER NOT NULL,
+	itinerary_id INTEGER NOT NULL,
+	title VARCHAR(255) NOT NULL,
+	message TEXT NOT NULL,
+	notification_type VARCHAR(50),
+	is_read BOOLEAN,
+	scheduled_for TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	sent_at TIMESTAMP WITHOUT TIME ZONE,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	is_deleted BOOLEAN,
+	PRIMARY KEY (id),
+	FOREIGN KEY(user_id) REFERENCES "Users" (user_id),
+	FOREIGN KEY(itinerary_id) REFERENCES "Itineraries" (id)
+);
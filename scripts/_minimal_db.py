@@ -0,0 +1,21 @@
+"""
+Minimal database access for migration scripts
+
+Builds a SQLAlchemy engine straight from the configured database URL and
+registers the models, without create_app() (no blueprints, mail, PhoBERT or
+ChromaDB start-up).
+
+Usage (from the project root):
+    from scripts._minimal_db import engine, Base
+    Base.metadata.create_all(engine)
+"""
+
+from sqlalchemy import create_engine
+
+from src.config.config import Config
+import src.models  # noqa: F401 - đăng ký tất cả model vào metadata
+from src.models.base import db
+
+Base = db.Model
+
+engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
@@ -6,9 +6,16 @@ Usage:
 """
 
 import argparse
+import re
 import pandas as pd
 from src.nlp_model.phobert_embedding import PhoBERTEmbeddingFunction
-from src.services.medical_chatbot_service import get_or_create_collection
+from src.services.medical_chatbot_service import (
+    get_or_create_collection, chroma_client, phobert_ef, initialize_bm25_index
+)
+from src.utils.text import truncate_series
+from src.services.chroma_ingest import (
+    DEFAULT_BATCH_SIZE, LOG_EVERY_N_BATCHES, add_batches, bulk_load_sqlite, clamp_batch_size
+)
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -28,7 +35,11 @@ def load_csv_dataset(csv_path: str):
     logger.info(f"Loading CSV: {csv_path}")
     
     try:
-        df = pd.read_csv(csv_path, encoding='utf-8-sig')
+        try:
+            # pyarrow: parser đa luồng, nhanh hơn nhiều với CSV nhiều text
+            df = pd.read_csv(csv_path, encoding='utf-8-sig', engine='pyarrow')
+        except ImportError:
+            df = pd.read_csv(csv_path, encoding='utf-8-sig')
         logger.info(f"✓ Loaded {len(df)} rows")
         logger.info(f"Columns: {df.columns.tolist()}")
         
@@ -53,68 +64,68 @@ def convert_qa_to_medical_format(df: pd.DataFrame):
     """
     logger.info("Converting to medical format...")
     
-    medical_data = []
+    def column(name):
+        # Giống str(row.get(name, '')): NaN -> 'nan', thiếu cột -> ''
+        if name in df.columns:
+            return df[name].map(str)
+        return pd.Series('', index=df.index)
     
-    for idx, row in df.iterrows():
-        question = str(row.get('question', ''))
-        answer = str(row.get('answer', ''))
-        link = str(row.get('link', ''))
-        
-        if not question or not answer:
-            continue
-        
-        # Use question as disease_name (truncate if too long)
-        disease_name = question.replace('?', '').strip()
-        if len(disease_name) > 150:
-            disease_name = disease_name[:150] + '...'
-        
-        # Analyze answer to extract structured info
-        answer_lower = answer.lower()
-        
-        # Extract symptoms
-        symptoms = ''
-        if any(kw in answer_lower for kw in ['triệu chứng', 'dấu hiệu', 'biểu hiện']):
-            # Try to extract symptoms section
-            symptoms = answer[:500]  # First 500 chars as symptoms
-        
-        # Extract treatment
-        treatment = ''
-        if any(kw in answer_lower for kw in ['điều trị', 'chữa', 'uống thuốc', 'dùng thuốc']):
-            treatment = answer
-        
-        # Extract prevention
-        prevention = ''
-        if any(kw in answer_lower for kw in ['phòng ngừa', 'tránh', 'dự phòng']):
-            prevention = answer
-        
-        # Create medical document
-        medical_doc = {
-            'disease_name': disease_name,
-            'description': answer[:1000],  # Limit to 1000 chars
-            'symptoms': symptoms,
-            'causes': '',  # Not available in Q&A format
-            'treatment': treatment[:1000] if treatment else '',
-            'prevention': prevention[:1000] if prevention else '',
-            'source': link if link and link != 'nan' else 'Medical Q&A Dataset',
-            'original_question': question,
-            'original_answer': answer
-        }
-        
-        medical_data.append(medical_doc)
+    question = column('question')
+    answer = column('answer')
+    link = column('link')
+    
+    keep = (question != '') & (answer != '')
+    question, answer, link = question[keep], answer[keep], link[keep]
+    
+    # Use question as disease_name (truncate if too long)
+    disease_name = question.str.replace('?', '', regex=False).str.strip()
+    disease_name = truncate_series(disease_name, 150)
+    
+    # Analyze answer to extract structured info: 1 regex alternation / nhóm keyword,
+    # chạy vectorized trên cả cột thay vì any(kw in ...) từng row
+    answer_lower = answer.str.lower()
+    
+    def mentions(keywords):
+        return answer_lower.str.contains('|'.join(map(re.escape, keywords)), regex=True)
+    
+    # Cắt 1000 ký tự một lần, dùng chung cho description/treatment/prevention
+    answer_1k = answer.str.slice(0, 1000)
     
-    result_df = pd.DataFrame(medical_data)
+    # Extract symptoms (first 500 chars), treatment, prevention
+    symptoms = answer_1k.str.slice(0, 500).where(mentions(['triệu chứng', 'dấu hiệu', 'biểu hiện']), '')
+    treatment = answer_1k.where(mentions(['điều trị', 'chữa', 'uống thuốc', 'dùng thuốc']), '')
+    prevention = answer_1k.where(mentions(['phòng ngừa', 'tránh', 'dự phòng']), '')
+    
+    # Create medical documents
+    medical_data = {
+        'disease_name': disease_name,
+        'description': answer_1k,  # Limit to 1000 chars
+        'symptoms': symptoms,
+        'causes': '',  # Not available in Q&A format
+        'treatment': treatment,
+        'prevention': prevention,
+        'source': link.where((link != '') & (link != 'nan'), 'Medical Q&A Dataset'),
+        'original_question': question,
+        'original_answer': answer
+    }
+    
+    result_df = pd.DataFrame(medical_data).reset_index(drop=True)
     logger.info(f"✓ Converted {len(result_df)} documents")
     
     return result_df
 
 
-def index_to_chromadb(df: pd.DataFrame, batch_size: int = 100):
+def index_to_chromadb(df: pd.DataFrame, batch_size: int = DEFAULT_BATCH_SIZE, embed_workers: int = 2):
     """
     Index documents into ChromaDB
     
+    Embeddings for upcoming batches are computed ahead of the writer
+    (see src/services/chroma_ingest.py).
+    
     Args:
         df: DataFrame with medical documents
-        batch_size: Batch size for indexing
+        batch_size: Batch size for indexing (capped at the client's max batch size)
+        embed_workers: Number of batches embedded ahead of the writer
     """
     logger.info("Indexing to ChromaDB...")
     
@@ -123,71 +134,76 @@ def index_to_chromadb(df: pd.DataFrame, batch_size: int = 100):
     current_count = collection.count()
     logger.info(f"Current collection size: {current_count}")
     
-    # Prepare data
-    documents = []
-    metadatas = []
-    ids = []
+    # Create metadata: column -> max length
+    metadata_limits = {
+        'disease_name': 500,
+        'description': 1000,
+        'symptoms': 1000,
+        'causes': 1000,
+        'treatment': 1000,
+        'prevention': 1000,
+        'source': 200,
+        'original_question': 500,
+        'original_answer': 2000
+    }
+    metadata_defaults = {'source': 'Unknown'}
     
-    for idx, row in df.iterrows():
-        # Create document text (for embedding)
-        # Combine question and answer for better semantic search
-        doc_text = f"Câu hỏi: {row['original_question']} Trả lời: {row['description']}"
-        documents.append(doc_text)
-        
-        # Create metadata
-        metadata = {
-            'disease_name': str(row['disease_name'])[:500],
-            'description': str(row['description'])[:1000],
-            'symptoms': str(row.get('symptoms', ''))[:1000],
-            'causes': str(row.get('causes', ''))[:1000],
-            'treatment': str(row.get('treatment', ''))[:1000],
-            'prevention': str(row.get('prevention', ''))[:1000],
-            'source': str(row.get('source', 'Unknown'))[:200],
-            'original_question': str(row.get('original_question', ''))[:500],
-            'original_answer': str(row.get('original_answer', ''))[:2000]
-        }
-        metadatas.append(metadata)
-        
-        # Create ID
-        ids.append(f"csv_qa_{current_count + idx + 1}")
+    # astype(str) một lần mỗi cột, dùng chung cho documents và metadata
+    text = {
+        column: (
+            df[column].astype(str) if column in df.columns
+            else pd.Series(metadata_defaults.get(column, ''), index=df.index)
+        )
+        for column in metadata_limits
+    }
+    
+    # Prepare data (vectorized - không lặp từng row)
+    # Combine question and answer for better semantic search
+    documents = (
+        "Câu hỏi: " + text['original_question'] +
+        " Trả lời: " + text['description']
+    ).tolist()
+    
+    metadata_df = pd.DataFrame({
+        column: text[column].str.slice(0, limit)
+        for column, limit in metadata_limits.items()
+    })
+    metadatas = metadata_df.to_dict(orient='records')
+    
+    # Create IDs
+    ids = [f"csv_qa_{current_count + i + 1}" for i in range(len(df))]
     
     # Add to collection in batches
+    batch_size = clamp_batch_size(chroma_client, batch_size)
     total_batches = (len(documents) - 1) // batch_size + 1
+    batches = (
+        (documents[i:i+batch_size], metadatas[i:i+batch_size], ids[i:i+batch_size])
+        for i in range(0, len(documents), batch_size)
+    )
     
-    for i in range(0, len(documents), batch_size):
-        batch_docs = documents[i:i+batch_size]
-        batch_meta = metadatas[i:i+batch_size]
-        batch_ids = ids[i:i+batch_size]
-        
-        collection.add(
-            documents=batch_docs,
-            metadatas=batch_meta,
-            ids=batch_ids
-        )
-        
-        batch_num = i // batch_size + 1
-        logger.info(f"Indexed batch {batch_num}/{total_batches}")
+    with bulk_load_sqlite(chroma_client):
+        for batch_num, _ in enumerate(add_batches(collection, batches, phobert_ef.embed_bucketed, embed_workers), 1):
+            if batch_num % LOG_EVERY_N_BATCHES == 0 or batch_num == total_batches:
+                logger.info("Indexed batch %d/%d", batch_num, total_batches)
     
     new_count = collection.count()
     added = new_count - current_count
     logger.info(f"✓ Indexed {added} new documents")
     logger.info(f"Total collection size: {new_count}")
     
-    return new_count, added
+    return new_count, added, {'ids': ids, 'metadatas': metadatas}
 
 
-def rebuild_bm25_index():
-    """Rebuild BM25 index with new documents"""
-    logger.info("Rebuilding BM25 index...")
-    
-    from src.services.medical_chatbot_service import initialize_bm25_index
+def rebuild_bm25_index(new_docs=None):
+    """Update BM25 index with new documents (incremental if a saved index exists)"""
+    logger.info("Updating BM25 index...")
     
-    success = initialize_bm25_index()
+    success = initialize_bm25_index(new_docs)
     
     if success:
-        logger.info("✓ BM25 index rebuilt successfully")
+        logger.info("✓ BM25 index updated successfully")
     else:
-        logger.warning("⚠ BM25 index rebuild failed")
+        logger.warning("⚠ BM25 index update failed")
     
     return success
 
@@ -198,6 +214,8 @@ def main():
                        help='Path to CSV file')
     parser.add_argument('--preview', action='store_true',
                        help='Preview data without indexing')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help='Documents per ChromaDB add() (50-250 recommended)')
     
     args = parser.parse_args()
     
@@ -220,10 +238,10 @@ def main():
             return 0
         
         # Step 3: Index to ChromaDB
-        new_count, added = index_to_chromadb(medical_df)
+        new_count, added, new_docs = index_to_chromadb(medical_df, batch_size=args.batch_size)
         
-        # Step 4: Rebuild BM25 index
-        rebuild_bm25_index()
+        # Step 4: Update BM25 index (chỉ tokenize các document vừa thêm)
+        rebuild_bm25_index(new_docs)
         
         # Summary
         print("\n" + "="*60)
@@ -233,7 +251,7 @@ def main():
         print(f"Loaded: {len(df)} Q&A pairs")
         print(f"Added: {added} new documents")
         print(f"Total in ChromaDB: {new_count} documents")
-        print(f"BM25 index: Rebuilt")
+        print(f"BM25 index: Updated")
         print("="*60)
         print("\n💡 Next steps:")
         print("1. Restart server: python main.py")
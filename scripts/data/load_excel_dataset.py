@@ -2,128 +2,269 @@
 Load Excel medical Q&A dataset into ChromaDB
 
 This script loads test.xlsx and indexes into the medical chatbot database
+
+Usage:
+    python load_excel_dataset.py --excel "src/scape/test.xlsx" [--load-in-memory] [--batch-size 250]
 """
 
+import argparse
+import asyncio
+import itertools
+import os
+import chromadb
 import pandas as pd
 from src.nlp_model.phobert_embedding import PhoBERTEmbeddingFunction
-from src.services.medical_chatbot_service import get_or_create_collection
+from src.services.medical_chatbot_service import (
+    get_or_create_collection, chroma_client, phobert_ef, initialize_bm25_index,
+    COLLECTION_NAME, COLLECTION_METADATA
+)
+from src.utils.text import truncate_series
+from src.services.chroma_ingest import (
+    DEFAULT_BATCH_SIZE, LOG_EVERY_N_BATCHES, add_batches, add_batches_async, bulk_load_sqlite, clamp_batch_size
+)
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def load_excel_to_chromadb(excel_path: str = "src/scape/test.xlsx"):
+# Các cột prepare_documents dùng; cột khác không cần đọc
+EXCEL_COLUMNS = ('question', 'answer', 'link')
+
+
+def read_excel_columns(excel_path: str, columns=EXCEL_COLUMNS) -> pd.DataFrame:
     """
-    Load Excel file and index into ChromaDB
+    Read only the given columns, as strings, into a DataFrame
+    
+    Uses the calamine engine (python-calamine, Rust) when installed. dtype=str
+    skips type inference and na_filter=False keeps empty cells as '' (filtered
+    out by prepare_documents).
     
     Args:
         excel_path: Path to Excel file
+        columns: Column names to read (missing ones are ignored)
+    """
+    options = dict(usecols=lambda name: name in columns, dtype=str, na_filter=False)
+    try:
+        return pd.read_excel(excel_path, engine='calamine', **options)
+    except ImportError:
+        return pd.read_excel(excel_path, **options)
+
+
+def excel_row_iter(excel_path: str):
     """
+    Yield rows of the first sheet lazily as {column: value} dicts
     
-    print("="*80)
-    print("LOADING EXCEL DATASET INTO CHROMADB")
-    print("="*80)
+    Uses openpyxl read-only mode so only the current row is held in memory.
+    Empty cells become '' (filtered out by prepare_documents like NaN).
+    
+    Args:
+        excel_path: Path to Excel file
+    """
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) for name in header]
+        
+        for values in rows:
+            if all(value is None for value in values):
+                continue  # Dòng trống (read-only mode hay trả thêm ở cuối sheet)
+            yield {
+                column: '' if value is None else value
+                for column, value in zip(columns, values)
+            }
+    finally:
+        workbook.close()
+
+
+def prepare_documents(df: pd.DataFrame, start_id: int = 1):
+    """
+    Build ChromaDB payloads from Q&A rows with column operations (no per-row loop)
     
-    # Step 1: Load Excel
-    logger.info(f"Loading Excel: {excel_path}")
-    df = pd.read_excel(excel_path)
-    logger.info(f"✓ Loaded {len(df)} Q&A pairs")
+    Args:
+        df: DataFrame with question, answer and optional link columns
+        start_id: Number used for the first generated ID
     
-    # Step 2: Get current collection size
-    collection = get_or_create_collection()
-    current_count = collection.count()
-    logger.info(f"Current collection size: {current_count}")
+    Returns:
+        (documents, metadatas, ids)
+    """
+    def column(name):
+        # Giống str(value) từng ô: NaN -> 'nan', thiếu cột -> ''
+        if name in df.columns:
+            return df[name].map(str)
+        return pd.Series('', index=df.index)
     
-    # Step 3: Prepare data for indexing
-    logger.info("Preparing documents for indexing...")
+    question = column('question')
+    answer = column('answer')
+    link = column('link')
     
-    documents = []
-    metadatas = []
-    ids = []
+    keep = (question != '') & (answer != '') & (question != 'nan') & (answer != 'nan')
+    question, answer, link = question[keep], answer[keep], link[keep]
     
-    for idx, row in df.iterrows():
-        question = str(row.get('question', ''))
-        answer = str(row.get('answer', ''))
-        link = str(row.get('link', ''))
-        
-        if not question or not answer or question == 'nan' or answer == 'nan':
-            continue
-        
-        # Create document text (combine question + answer for better search)
-        doc_text = f"Câu hỏi: {question} Trả lời: {answer}"
-        documents.append(doc_text)
-        
-        # Extract disease name from question
-        disease_name = question.replace('?', '').strip()
-        if len(disease_name) > 150:
-            disease_name = disease_name[:150] + '...'
-        
-        # Create metadata
-        metadata = {
-            'disease_name': disease_name[:500],
-            'description': answer[:1000],
-            'symptoms': '',
-            'causes': '',
-            'treatment': answer[:1000] if any(kw in answer.lower() for kw in ['điều trị', 'chữa', 'thuốc']) else '',
-            'prevention': answer[:1000] if any(kw in answer.lower() for kw in ['phòng', 'tránh']) else '',
-            'source': link[:200] if link and link != 'nan' else 'Medical Q&A Dataset',
-            'original_question': question[:500],
-            'original_answer': answer[:2000]
-        }
-        metadatas.append(metadata)
-        
-        # Create ID
-        ids.append(f"excel_qa_{current_count + idx + 1}")
+    # Create document text (combine question + answer for better search)
+    documents = ("Câu hỏi: " + question + " Trả lời: " + answer).tolist()
+    
+    # Extract disease name from question
+    disease_name = question.str.replace('?', '', regex=False).str.strip()
+    disease_name = truncate_series(disease_name, 150)
     
-    logger.info(f"Prepared {len(documents)} documents")
+    answer_lower = answer.str.lower()
+    answer_1k = answer.str.slice(0, 1000)
     
-    # Step 4: Index in batches
-    batch_size = 100
-    total_batches = (len(documents) - 1) // batch_size + 1
+    # Create metadata
+    metadatas = pd.DataFrame({
+        'disease_name': disease_name.str.slice(0, 500),
+        'description': answer_1k,
+        'symptoms': '',
+        'causes': '',
+        'treatment': answer_1k.where(answer_lower.str.contains('điều trị|chữa|thuốc', regex=True), ''),
+        'prevention': answer_1k.where(answer_lower.str.contains('phòng|tránh', regex=True), ''),
+        'source': link.str.slice(0, 200).where((link != '') & (link != 'nan'), 'Medical Q&A Dataset'),
+        'original_question': question.str.slice(0, 500),
+        'original_answer': answer.str.slice(0, 2000)
+    }).to_dict(orient='records')
     
-    logger.info(f"Indexing {len(documents)} documents in {total_batches} batches...")
+    # Create IDs
+    ids = [f"excel_qa_{i}" for i in range(start_id, start_id + len(documents))]
     
-    for i in range(0, len(documents), batch_size):
-        batch_docs = documents[i:i+batch_size]
-        batch_meta = metadatas[i:i+batch_size]
-        batch_ids = ids[i:i+batch_size]
+    return documents, metadatas, ids
+
+
+def _row_batches(excel_path: str, batch_size: int, load_in_memory: bool = False):
+    """Yield DataFrames of batch_size sheet rows (streamed unless load_in_memory)"""
+    if load_in_memory:
+        df = read_excel_columns(excel_path)
+        logger.info(f"✓ Loaded {len(df)} Q&A pairs")
+        for i in range(0, len(df), batch_size):
+            yield df.iloc[i:i+batch_size]
+    else:
+        rows = excel_row_iter(excel_path)
+        for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+            yield pd.DataFrame(batch)
+
+
+def _prepared_batches(row_batches, start_id: int, progress: dict):
+    """Yield (documents, metadatas, ids) per row batch, with contiguous IDs; counts rows read"""
+    next_id = start_id
+    for batch_df in row_batches:
+        progress['rows'] += len(batch_df)
+        documents, metadatas, ids = prepare_documents(batch_df, start_id=next_id)
+        if documents:
+            next_id += len(ids)
+            yield documents, metadatas, ids
+
+
+async def _ingest_to_server(row_batches, progress: dict, concurrency: int):
+    """
+    Index into a Chroma server (CHROMA_HTTP_HOST / CHROMA_HTTP_PORT) with concurrent adds
+    
+    Returns:
+        (count before, count after)
+    """
+    client = await chromadb.AsyncHttpClient(
+        host=os.getenv('CHROMA_HTTP_HOST'),
+        port=int(os.getenv('CHROMA_HTTP_PORT', '8000'))
+    )
+    collection = await client.get_or_create_collection(name=COLLECTION_NAME, metadata=COLLECTION_METADATA)
+    
+    current_count = await collection.count()
+    logger.info(f"Current collection size (server): {current_count}")
+    
+    batches = _prepared_batches(row_batches, current_count + 1, progress)
+    written = await add_batches_async(collection, batches, phobert_ef.embed_bucketed, concurrency)
+    logger.info(f"✓ Indexed {written} batches ({progress['rows']} rows read)")
+    
+    return current_count, await collection.count()
+
+
+def load_excel_to_chromadb(excel_path: str = "src/scape/test.xlsx", batch_size: int = DEFAULT_BATCH_SIZE,
+                           load_in_memory: bool = False, embed_workers: int = 2):
+    """
+    Load Excel file and index into ChromaDB
+    
+    Rows are streamed from the sheet and sent to ChromaDB one batch at a time,
+    so peak memory is O(batch_size) instead of the whole sheet. Embeddings for
+    upcoming batches are computed ahead of the writer (see src/services/chroma_ingest.py).
+    
+    If CHROMA_HTTP_HOST is set, the documents go to that Chroma server through
+    chromadb.AsyncHttpClient with several adds in flight (a server accepts
+    concurrent writers). The local BM25 index is not touched in that mode.
+    
+    Args:
+        excel_path: Path to Excel file
+        batch_size: Batch size for indexing (capped at the client's max batch size)
+        load_in_memory: Read the whole sheet with pandas first (small files)
+        embed_workers: Number of batches embedded ahead of the writer
+    """
+    
+    print("="*80)
+    print("LOADING EXCEL DATASET INTO CHROMADB")
+    print("="*80)
+    
+    progress = {'rows': 0}
+    server_mode = bool(os.getenv('CHROMA_HTTP_HOST'))
+    
+    if server_mode:
+        logger.info(f"Loading Excel: {excel_path}")
+        logger.info(f"Indexing in batches of {batch_size} into {os.getenv('CHROMA_HTTP_HOST')}...")
+        current_count, new_count = asyncio.run(_ingest_to_server(
+            _row_batches(excel_path, batch_size, load_in_memory), progress, concurrency=max(2, embed_workers)
+        ))
+    else:
+        # Step 1: Get current collection size
+        collection = get_or_create_collection()
+        current_count = collection.count()
+        logger.info(f"Current collection size: {current_count}")
+        batch_size = clamp_batch_size(chroma_client, batch_size)
+        
+        # Step 2: Open Excel
+        logger.info(f"Loading Excel: {excel_path}")
+        row_batches = _row_batches(excel_path, batch_size, load_in_memory)
         
-        collection.add(
-            documents=batch_docs,
-            metadatas=batch_meta,
-            ids=batch_ids
-        )
+        # Step 3 + 4: Prepare and index batch by batch
+        logger.info(f"Indexing in batches of {batch_size}...")
         
-        batch_num = i // batch_size + 1
-        logger.info(f"✓ Indexed batch {batch_num}/{total_batches}")
+        batches = _prepared_batches(row_batches, current_count + 1, progress)
+        with bulk_load_sqlite(chroma_client):
+            for batch_num, _ in enumerate(add_batches(collection, batches, phobert_ef.embed_bucketed, embed_workers), 1):
+                if batch_num % LOG_EVERY_N_BATCHES == 0:
+                    logger.info("✓ Indexed batch %d (%d rows read)", batch_num, progress['rows'])
+        
+        new_count = collection.count()
+    
+    loaded = progress['rows']
+    logger.info(f"✓ Loaded {loaded} Q&A pairs")
     
     # Step 5: Verify
-    new_count = collection.count()
     added = new_count - current_count
     
     logger.info(f"✓ Successfully indexed {added} new documents")
     logger.info(f"Total collection size: {new_count}")
     
-    # Step 6: Rebuild BM25 index
-    logger.info("Rebuilding BM25 index...")
-    from src.services.medical_chatbot_service import initialize_bm25_index
-    
-    success = initialize_bm25_index()
-    if success:
-        logger.info("✓ BM25 index rebuilt successfully")
-    else:
-        logger.warning("⚠ BM25 index rebuild failed")
+    # Step 6: Rebuild BM25 index (chỉ với ChromaDB local; server mode: app tự đồng bộ khi khởi động)
+    success = False
+    if not server_mode:
+        logger.info("Rebuilding BM25 index...")
+        success = initialize_bm25_index()
+        if success:
+            logger.info("✓ BM25 index rebuilt successfully")
+        else:
+            logger.warning("⚠ BM25 index rebuild failed")
     
     # Summary
     print("\n" + "="*80)
     print("✅ SUCCESS!")
     print("="*80)
     print(f"Excel file: {excel_path}")
-    print(f"Loaded: {len(df)} Q&A pairs")
+    print(f"Loaded: {loaded} Q&A pairs")
     print(f"Indexed: {added} new documents")
     print(f"Total in ChromaDB: {new_count} documents")
-    print(f"BM25 index: {'✓ Rebuilt' if success else '✗ Failed'}")
+    print(f"BM25 index: {'skipped (Chroma server)' if server_mode else '✓ Rebuilt' if success else '✗ Failed'}")
     print("="*80)
     print("\n💡 Next steps:")
     print("1. Restart server: python main.py")
@@ -135,8 +276,19 @@ def load_excel_to_chromadb(excel_path: str = "src/scape/test.xlsx"):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load Excel medical Q&A dataset')
+    parser.add_argument('--excel', type=str, default="src/scape/test.xlsx",
+                       help='Path to Excel file')
+    parser.add_argument('--load-in-memory', action='store_true',
+                       help='Read the whole sheet with pandas before indexing (small files)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help='Documents per ChromaDB add() (50-250 recommended)')
+    
+    args = parser.parse_args()
+    
     try:
-        new_count, added = load_excel_to_chromadb()
+        new_count, added = load_excel_to_chromadb(args.excel, batch_size=args.batch_size,
+                                                   load_in_memory=args.load_in_memory)
     except Exception as e:
         logger.error(f"Failed: {e}", exc_info=True)
         exit(1)
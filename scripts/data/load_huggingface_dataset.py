@@ -2,14 +2,24 @@
 Load and index medical Q&A dataset from HuggingFace
 
 Usage:
-    python load_huggingface_dataset.py --dataset "username/dataset-name"
+    python load_huggingface_dataset.py --dataset "username/dataset-name" [--load-in-memory]
+
+By default the split is streamed and indexed batch by batch, so peak memory is
+O(batch_size) instead of the whole split.
 """
 
 import argparse
+import itertools
 from datasets import load_dataset
 import pandas as pd
 from src.nlp_model.phobert_embedding import PhoBERTEmbeddingFunction
-from src.services.medical_chatbot_service import get_or_create_collection
+from src.services.medical_chatbot_service import (
+    get_or_create_collection, chroma_client, phobert_ef, initialize_bm25_index
+)
+from src.utils.text import truncate_series
+from src.services.chroma_ingest import (
+    DEFAULT_BATCH_SIZE, LOG_EVERY_N_BATCHES, add_batches, bulk_load_sqlite, clamp_batch_size
+)
 from src.services.bm25_search import BM25SearchEngine
 import logging
 
@@ -17,22 +27,25 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def load_hf_dataset(dataset_name: str, split: str = 'train'):
+def load_hf_dataset(dataset_name: str, split: str = 'train', streaming: bool = False):
     """
     Load dataset from HuggingFace
     
     Args:
         dataset_name: HuggingFace dataset name (e.g., 'username/medical-qa')
         split: Dataset split ('train', 'test', 'validation')
+        streaming: Return an iterable of row dicts instead of loading the split
     
     Returns:
-        pandas DataFrame
+        pandas DataFrame (or IterableDataset when streaming)
     """
     logger.info(f"Loading dataset: {dataset_name}")
     
     try:
         # Load from HuggingFace
-        dataset = load_dataset(dataset_name, split=split)
+        dataset = load_dataset(dataset_name, split=split, streaming=streaming)
+        if streaming:
+            return dataset
         
         # Convert to pandas
         df = pd.DataFrame(dataset)
@@ -65,47 +78,149 @@ def convert_qa_to_medical_format(df: pd.DataFrame,
     """
     logger.info("Converting to medical format...")
     
-    medical_data = []
+    def column(name):
+        # Giống str(row.get(name, '')): NaN -> 'nan', thiếu cột -> ''
+        if name and name in df.columns:
+            return df[name].map(str)
+        return pd.Series('', index=df.index)
+    
+    question = column(question_col)
+    answer = column(answer_col)
+    
+    # Extract disease name from question (simple heuristic)
+    disease_name = question.str.replace('?', '', regex=False).str.strip()
+    disease_name = truncate_series(disease_name, 100)
+    
+    answer_lower = answer.str.lower()
+    
+    # Create medical documents (vectorized - không lặp từng row)
+    medical_data = {
+        'disease_name': disease_name,
+        'description': answer,
+        'symptoms': '',  # Extract if available
+        'causes': '',
+        'treatment': answer.where(answer_lower.str.contains('điều trị|chữa', regex=True), ''),
+        'prevention': answer.where(answer_lower.str.contains('phòng|tránh', regex=True), ''),
+        'source': 'HuggingFace Q&A',
+        'original_question': question,
+        'original_answer': answer,
+        'context': column(context_col)
+    }
+    
+    result_df = pd.DataFrame(medical_data).reset_index(drop=True)
+    logger.info(f"✓ Converted {len(result_df)} documents")
+    
+    return result_df
+
+
+def stream_medical_frames(rows, batch_size: int = DEFAULT_BATCH_SIZE,
+                          question_col: str = 'question',
+                          answer_col: str = 'answer',
+                          context_col: str = None,
+                          save_csv: str = None):
+    """
+    Convert streamed rows to medical-format DataFrames of batch_size rows
+    
+    Args:
+        rows: Iterable of row dicts (e.g. a streaming HuggingFace dataset)
+        batch_size: Rows per yielded DataFrame
+        question_col, answer_col, context_col: See convert_qa_to_medical_format
+        save_csv: Append each converted batch to this CSV file
+    
+    Yields:
+        DataFrame in medical format
+    """
+    rows = iter(rows)
     
-    for idx, row in df.iterrows():
-        question = str(row.get(question_col, ''))
-        answer = str(row.get(answer_col, ''))
-        context = str(row.get(context_col, '')) if context_col else ''
+    for batch_num in itertools.count():
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
         
-        # Extract disease name from question (simple heuristic)
-        disease_name = question.replace('?', '').strip()
-        if len(disease_name) > 100:
-            disease_name = disease_name[:100] + '...'
+        medical_df = convert_qa_to_medical_format(
+            pd.DataFrame(batch),
+            question_col=question_col,
+            answer_col=answer_col,
+            context_col=context_col
+        )
         
-        # Create medical document
-        medical_doc = {
-            'disease_name': disease_name,
-            'description': answer,
-            'symptoms': '',  # Extract if available
-            'causes': '',
-            'treatment': answer if 'điều trị' in answer.lower() or 'chữa' in answer.lower() else '',
-            'prevention': answer if 'phòng' in answer.lower() or 'tránh' in answer.lower() else '',
-            'source': 'HuggingFace Q&A',
-            'original_question': question,
-            'original_answer': answer,
-            'context': context
-        }
+        if save_csv:
+            # Ghi nối tiếp từng batch: header + BOM chỉ ở batch đầu
+            medical_df.to_csv(
+                save_csv, index=False,
+                mode='w' if batch_num == 0 else 'a',
+                header=batch_num == 0,
+                encoding='utf-8-sig' if batch_num == 0 else 'utf-8'
+            )
         
-        medical_data.append(medical_doc)
+        yield medical_df
+
+
+def prepare_documents(df: pd.DataFrame, start_id: int = 1):
+    """
+    Build ChromaDB payloads from medical-format rows
     
-    result_df = pd.DataFrame(medical_data)
-    logger.info(f"✓ Converted {len(result_df)} documents")
+    Args:
+        df: DataFrame with medical documents
+        start_id: Number used for the first generated ID
     
-    return result_df
+    Returns:
+        (documents, metadatas, ids)
+    """
+    # Column -> max length (None: không cắt); mỗi field là một cột, không tạo dict từng row
+    metadata_limits = {
+        'disease_name': None,
+        'description': 1000,
+        'symptoms': None,
+        'causes': None,
+        'treatment': 1000,
+        'prevention': 1000,
+        'source': None,
+        'original_question': 500,
+        'original_answer': 1000
+    }
+    metadata_defaults = {'source': 'Unknown'}
+    
+    # Giống str(row.get(name, default)): NaN -> 'nan'
+    text = {
+        column: (
+            df[column].map(str) if column in df.columns
+            else pd.Series(metadata_defaults.get(column, ''), index=df.index)
+        )
+        for column in metadata_limits
+    }
+    
+    # Create document text (for embedding)
+    documents = (text['disease_name'] + ". " + text['description']).tolist()
+    
+    # Create metadata
+    metadatas = pd.DataFrame({
+        column: text[column].str.slice(0, limit)
+        for column, limit in metadata_limits.items()
+    }).to_dict(orient='records')
+    
+    # Create IDs
+    ids = [f"hf_qa_{i}" for i in range(start_id, start_id + len(documents))]
+    
+    return documents, metadatas, ids
 
 
-def index_to_chromadb(df: pd.DataFrame, batch_size: int = 100):
+def index_to_chromadb(medical_data, batch_size: int = DEFAULT_BATCH_SIZE, embed_workers: int = 2):
     """
     Index documents into ChromaDB
     
+    Embeddings for upcoming batches are computed ahead of the writer
+    (see src/services/chroma_ingest.py).
+    
     Args:
-        df: DataFrame with medical documents
-        batch_size: Batch size for indexing
+        medical_data: DataFrame with medical documents, or an iterable of such
+                      DataFrames (streaming; see stream_medical_frames)
+        batch_size: Batch size for indexing (capped at the client's max batch size)
+        embed_workers: Number of batches embedded ahead of the writer
+    
+    Returns:
+        (new_count, added, new_docs) - new_docs ({'ids', 'metadatas'}) is None
+        when streaming, so the whole split is never held in memory
     """
     logger.info("Indexing to ChromaDB...")
     
@@ -114,69 +229,48 @@ def index_to_chromadb(df: pd.DataFrame, batch_size: int = 100):
     current_count = collection.count()
     logger.info(f"Current collection size: {current_count}")
     
-    # Prepare data
-    documents = []
-    metadatas = []
-    ids = []
+    batch_size = clamp_batch_size(chroma_client, batch_size)
+    in_memory = isinstance(medical_data, pd.DataFrame)
+    frames = [medical_data] if in_memory else medical_data
+    new_docs = {'ids': [], 'metadatas': []} if in_memory else None
     
-    for idx, row in df.iterrows():
-        # Create document text (for embedding)
-        doc_text = f"{row['disease_name']}. {row['description']}"
-        documents.append(doc_text)
-        
-        # Create metadata
-        metadata = {
-            'disease_name': str(row['disease_name']),
-            'description': str(row['description'])[:1000],  # Limit length
-            'symptoms': str(row.get('symptoms', '')),
-            'causes': str(row.get('causes', '')),
-            'treatment': str(row.get('treatment', ''))[:1000],
-            'prevention': str(row.get('prevention', ''))[:1000],
-            'source': str(row.get('source', 'Unknown')),
-            'original_question': str(row.get('original_question', ''))[:500],
-            'original_answer': str(row.get('original_answer', ''))[:1000]
-        }
-        metadatas.append(metadata)
-        
-        # Create ID
-        ids.append(f"hf_qa_{current_count + idx + 1}")
+    def batches():
+        next_id = current_count + 1
+        for frame in frames:
+            for i in range(0, len(frame), batch_size):
+                documents, metadatas, ids = prepare_documents(frame.iloc[i:i+batch_size], start_id=next_id)
+                next_id += len(ids)
+                if new_docs is not None:
+                    new_docs['ids'].extend(ids)
+                    new_docs['metadatas'].extend(metadatas)
+                yield documents, metadatas, ids
     
     # Add to collection in batches
-    total_batches = (len(documents) - 1) // batch_size + 1
+    total_batches = (len(medical_data) - 1) // batch_size + 1 if in_memory else None
     
-    for i in range(0, len(documents), batch_size):
-        batch_docs = documents[i:i+batch_size]
-        batch_meta = metadatas[i:i+batch_size]
-        batch_ids = ids[i:i+batch_size]
-        
-        collection.add(
-            documents=batch_docs,
-            metadatas=batch_meta,
-            ids=batch_ids
-        )
-        
-        batch_num = i // batch_size + 1
-        logger.info(f"Indexed batch {batch_num}/{total_batches}")
+    with bulk_load_sqlite(chroma_client):
+        for batch_num, _ in enumerate(add_batches(collection, batches(), phobert_ef.embed_bucketed, embed_workers), 1):
+            if batch_num % LOG_EVERY_N_BATCHES == 0 or batch_num == total_batches:
+                logger.info("Indexed batch %d/%s", batch_num, total_batches or '?')
     
     new_count = collection.count()
-    logger.info(f"✓ Indexed {new_count - current_count} new documents")
+    added = new_count - current_count
+    logger.info(f"✓ Indexed {added} new documents")
     logger.info(f"Total collection size: {new_count}")
     
-    return new_count
+    return new_count, added, new_docs
 
 
-def rebuild_bm25_index():
-    """Rebuild BM25 index with new documents"""
-    logger.info("Rebuilding BM25 index...")
-    
-    from src.services.medical_chatbot_service import initialize_bm25_index
+def rebuild_bm25_index(new_docs=None):
+    """Update BM25 index with new documents (incremental if a saved index exists)"""
+    logger.info("Updating BM25 index...")
     
-    success = initialize_bm25_index()
+    success = initialize_bm25_index(new_docs)
     
     if success:
-        logger.info("✓ BM25 index rebuilt successfully")
+        logger.info("✓ BM25 index updated successfully")
     else:
-        logger.warning("⚠ BM25 index rebuild failed")
+        logger.warning("⚠ BM25 index update failed")
     
     return success
 
@@ -195,40 +289,55 @@ def main():
                        help='Optional context column name')
     parser.add_argument('--save-csv', type=str, default='data/hf_medical_data.csv',
                        help='Save processed data to CSV')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help='Documents per ChromaDB add() (50-250 recommended)')
+    parser.add_argument('--load-in-memory', action='store_true',
+                       help='Load the whole split with pandas instead of streaming it')
     
     args = parser.parse_args()
     
     try:
-        # Step 1: Load dataset
-        df = load_hf_dataset(args.dataset, args.split)
-        
-        # Step 2: Convert to medical format
-        medical_df = convert_qa_to_medical_format(
-            df,
-            question_col=args.question_col,
-            answer_col=args.answer_col,
-            context_col=args.context_col
-        )
-        
-        # Step 3: Save to CSV (optional)
-        if args.save_csv:
-            medical_df.to_csv(args.save_csv, index=False, encoding='utf-8-sig')
-            logger.info(f"✓ Saved to {args.save_csv}")
+        if args.load_in_memory:
+            # Step 1: Load dataset
+            df = load_hf_dataset(args.dataset, args.split)
+            
+            # Step 2: Convert to medical format
+            medical_data = convert_qa_to_medical_format(
+                df,
+                question_col=args.question_col,
+                answer_col=args.answer_col,
+                context_col=args.context_col
+            )
+            
+            # Step 3: Save to CSV (optional)
+            if args.save_csv:
+                medical_data.to_csv(args.save_csv, index=False, encoding='utf-8-sig')
+                logger.info(f"✓ Saved to {args.save_csv}")
+        else:
+            # Step 1-3: Stream, convert and save (optional) batch by batch
+            medical_data = stream_medical_frames(
+                load_hf_dataset(args.dataset, args.split, streaming=True),
+                batch_size=args.batch_size,
+                question_col=args.question_col,
+                answer_col=args.answer_col,
+                context_col=args.context_col,
+                save_csv=args.save_csv
+            )
         
         # Step 4: Index to ChromaDB
-        new_count = index_to_chromadb(medical_df)
+        new_count, added, new_docs = index_to_chromadb(medical_data, batch_size=args.batch_size)
         
-        # Step 5: Rebuild BM25 index
-        rebuild_bm25_index()
+        # Step 5: Update BM25 index (chỉ tokenize các document vừa thêm)
+        rebuild_bm25_index(new_docs)
         
         # Summary
         print("\n" + "="*60)
         print("✅ SUCCESS!")
         print("="*60)
         print(f"Dataset: {args.dataset}")
-        print(f"Loaded: {len(df)} Q&A pairs")
+        print(f"Loaded: {added} Q&A pairs")
         print(f"Indexed: {new_count} total documents in ChromaDB")
-        print(f"BM25 index: Rebuilt")
+        print(f"BM25 index: Updated")
         print("="*60)
         
     except Exception as e:
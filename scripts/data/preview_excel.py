@@ -5,12 +5,65 @@ This script will:
 1. Load Excel file
 2. Show structure and columns
 3. Preview first few rows
+
+By default the sheet is streamed (openpyxl read-only) and only the first rows
+are read. Use --load-in-memory for the full pandas report (dtypes, memory, missing).
 """
 
+import argparse
+import itertools
 import pandas as pd
 import sys
 
-def preview_excel(excel_path: str):
+def preview_excel_streaming(excel_path: str, n_rows: int = 5):
+    """Preview Excel file structure without loading the whole sheet"""
+    from openpyxl import load_workbook
+    
+    print("="*80)
+    print(f"Opening Excel (read-only): {excel_path}")
+    print("="*80)
+    
+    try:
+        workbook = load_workbook(excel_path, read_only=True, data_only=True)
+        try:
+            ws = workbook.active
+            rows = ws.iter_rows(values_only=True)
+            columns = [str(name) for name in next(rows, ())]
+            head = pd.DataFrame(list(itertools.islice(rows, n_rows)), columns=columns)
+            # Số dòng lấy từ sheet dimension, không cần đọc hết file
+            total_rows = ws.max_row - 1 if ws.max_row else None
+        finally:
+            workbook.close()
+        
+        print(f"\n✓ Opened successfully!")
+        print(f"Rows: {total_rows if total_rows is not None else 'unknown'}")
+        print(f"Columns: {len(columns)}")
+        print(f"\nColumn names:")
+        for i, col in enumerate(columns, 1):
+            print(f"  {i}. {col}")
+        
+        print(f"\n" + "="*80)
+        print(f"First {n_rows} rows:")
+        print("="*80)
+        print(head.to_string())
+        
+        return head
+        
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def read_excel_fast(excel_path: str, columns=None) -> pd.DataFrame:
+    """Read Excel with the calamine engine when installed (optionally only some columns)"""
+    options = {'usecols': columns} if columns else {}
+    try:
+        return pd.read_excel(excel_path, engine='calamine', **options)
+    except ImportError:
+        return pd.read_excel(excel_path, **options)
+
+def preview_excel(excel_path: str, columns=None):
     """Preview Excel file structure"""
     
     print("="*80)
@@ -19,7 +72,7 @@ def preview_excel(excel_path: str):
     
     try:
         # Load Excel
-        df = pd.read_excel(excel_path)
+        df = read_excel_fast(excel_path, columns)
         
         print(f"\n✓ Loaded successfully!")
         print(f"Rows: {len(df)}")
@@ -43,13 +96,14 @@ def preview_excel(excel_path: str):
         print("="*80)
         print(f"Total rows: {len(df)}")
         print(f"Total columns: {len(df.columns)}")
-        print(f"Memory usage: {df.memory_usage(deep=True).sum() / 1024:.2f} KB")
+        # Shallow: không đo từng chuỗi (deep=True quét toàn bộ dữ liệu)
+        print(f"Memory usage (shallow): {df.memory_usage(deep=False).sum() / 1024:.2f} KB")
         
-        # Check for missing values
-        missing = df.isnull().sum()
-        if missing.any():
+        # Check for missing values (chỉ đếm các cột có giá trị thiếu)
+        null_cols = df.columns[df.isna().any()]
+        if len(null_cols):
             print(f"\nMissing values:")
-            print(missing[missing > 0])
+            print(df[null_cols].isna().sum())
         
         return df
         
@@ -60,8 +114,21 @@ def preview_excel(excel_path: str):
         return None
 
 if __name__ == "__main__":
-    excel_file = "src/scape/test.xlsx"
-    df = preview_excel(excel_file)
+    parser = argparse.ArgumentParser(description='Preview Excel file')
+    parser.add_argument('--excel', type=str, default="src/scape/test.xlsx",
+                       help='Path to Excel file')
+    parser.add_argument('--load-in-memory', action='store_true',
+                       help='Load the whole sheet with pandas for the full report')
+    parser.add_argument('--columns', type=str, default=None,
+                       help='Comma-separated columns to load with --load-in-memory (default: all)')
+    
+    args = parser.parse_args()
+    
+    if args.load_in_memory:
+        columns = args.columns.split(',') if args.columns else None
+        df = preview_excel(args.excel, columns)
+    else:
+        df = preview_excel_streaming(args.excel)
     
     if df is not None:
         print(f"\n" + "="*80)
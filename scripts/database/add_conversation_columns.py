@@ -5,6 +5,22 @@ import psycopg2
 
 load_dotenv()
 
+def backfill_null_flags(cursor):
+    """
+    Set NULL is_archived / is_pinned values to FALSE.
+    
+    Done as one set-based UPDATE (no per-row round-trips); rows that need no
+    change are skipped by the WHERE clause.
+    """
+    cursor.execute("""
+        UPDATE "Conversations"
+        SET is_archived = COALESCE(is_archived, FALSE),
+            is_pinned = COALESCE(is_pinned, FALSE)
+        WHERE is_archived IS NULL OR is_pinned IS NULL;
+    """)
+    if cursor.rowcount:
+        print(f"  ✅ Backfilled {cursor.rowcount} rows with NULL flags")
+
 def add_conversation_columns():
     """Add is_archived and is_pinned columns to Conversations table"""
     
@@ -30,10 +46,10 @@ def add_conversation_columns():
         cursor.execute("""
             SELECT column_name 
             FROM information_schema.columns 
-            WHERE table_name = 'Conversations' 
-            AND column_name IN ('is_archived', 'is_pinned');
-        """)
-        existing_columns = [row[0] for row in cursor.fetchall()]
+            WHERE table_name = %s 
+            AND column_name = ANY(%s);
+        """, ('Conversations', ['is_archived', 'is_pinned']))
+        existing_columns = {row[0] for row in cursor.fetchall()}
         
         columns_to_add = []
         if 'is_archived' not in existing_columns:
@@ -47,6 +63,9 @@ def add_conversation_columns():
             print("  ℹ️  Column 'is_pinned' already exists")
         
         if not columns_to_add:
+            # Columns may predate the DEFAULT: backfill NULLs in one statement
+            backfill_null_flags(cursor)
+            conn.commit()
             print("\n✅ All columns already exist. No migration needed.")
             cursor.close()
             conn.close()
@@ -55,10 +74,12 @@ def add_conversation_columns():
         # Add missing columns
         print(f"\nAdding columns: {', '.join(columns_to_add)}")
         
+        # One ALTER TABLE for all columns: single lock + single table rewrite
+        alters = ", ".join(f"ADD COLUMN {column} BOOLEAN DEFAULT FALSE" for column in columns_to_add)
+        sql = f'ALTER TABLE "Conversations" {alters};'
+        print(f"  Executing: {sql}")
+        cursor.execute(sql)
         for column in columns_to_add:
-            sql = f'ALTER TABLE "Conversations" ADD COLUMN {column} BOOLEAN DEFAULT FALSE;'
-            print(f"  Executing: {sql}")
-            cursor.execute(sql)
             print(f"  ✅ Added column '{column}'")
         
         # Commit changes
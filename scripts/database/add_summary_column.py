@@ -5,32 +5,28 @@ Run this script once to update your existing database:
     python add_summary_column.py
 """
 
-from src import create_app, db
+import sys
+import os
+from sqlalchemy import text
+
+# Add src to path
+sys.path.append(os.getcwd())
+
+# Engine tối giản: không cần create_app() (blueprints, PhoBERT, ChromaDB)
+from scripts._minimal_db import engine
 
 def add_summary_column():
-    app = create_app()
-    
-    with app.app_context():
-        try:
-            # Check if column already exists
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            columns = [col['name'] for col in inspector.get_columns('Conversations')]
-            
-            if 'summary' in columns:
-                print("✓ Column 'summary' already exists in Conversations table")
-                return
-            
-            # Add column using raw SQL
-            db.engine.execute(
-                'ALTER TABLE "Conversations" ADD COLUMN summary TEXT;'
-            )
-            
-            print("✅ Successfully added 'summary' column to Conversations table")
-            
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            print("\nIf the column already exists, you can ignore this error.")
+    try:
+        # IF NOT EXISTS (PostgreSQL 9.6+): 1 câu lệnh, không cần inspect trước
+        with engine.begin() as conn:
+            conn.execute(text(
+                'ALTER TABLE "Conversations" ADD COLUMN IF NOT EXISTS summary TEXT;'
+            ))
+        
+        print("✅ Column 'summary' is present in Conversations table")
+        
+    except Exception as e:
+        print(f"❌ Error: {e}")
 
 if __name__ == "__main__":
     print("Adding 'summary' column to Conversations table...")
@@ -1,5 +1,7 @@
 import sqlite3
 import os
+import sys
+import csv
 
 # Get the database path
 db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'chatbot.db')
@@ -52,8 +54,13 @@ else:
     print()
     print("All users in database:")
     cursor.execute("SELECT user_id, email, full_name, is_verified FROM Users;")
-    all_users = cursor.fetchall()
-    for u in all_users:
-        print(f"  - ID: {u[0]}, Email: {u[1]}, Name: {u[2]}, Verified: {u[3]}")
+    cursor.arraysize = 1000
+    writer = csv.writer(sys.stdout)
+    writer.writerow(['id', 'email', 'name', 'verified'])
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        writer.writerows(rows)
 
 conn.close()
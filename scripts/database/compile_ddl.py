@@ -0,0 +1,63 @@
+"""
+Compile the PostgreSQL schema of all SQLAlchemy models into migrations/schema.sql
+
+The generated file is committed so migrations can create every table with one
+round-trip (see migrate_postgresql_simple.py) instead of db.create_all().
+Re-run after changing a model:
+    python scripts/database/compile_ddl.py
+"""
+
+import sys
+import os
+from sqlalchemy import Enum
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable, CreateIndex
+
+# Add src to path
+sys.path.append(os.getcwd())
+
+import src.models  # noqa: F401 - đăng ký tất cả model vào db.metadata
+from src.models.base import db
+
+SCHEMA_PATH = os.path.join('migrations', 'schema.sql')
+
+
+def compile_ddl() -> str:
+    """Return idempotent DDL (types, tables, indexes) for every model, in dependency order"""
+    dialect = postgresql.dialect()
+    statements = []
+
+    # 1. Enum types: PostgreSQL không có CREATE TYPE IF NOT EXISTS
+    enum_names = set()
+    for table in db.metadata.sorted_tables:
+        for column in table.columns:
+            if isinstance(column.type, Enum) and column.type.name not in enum_names:
+                enum_names.add(column.type.name)
+                create_type = postgresql.CreateEnumType(column.type.dialect_impl(dialect)).compile(dialect=dialect)
+                statements.append(
+                    f"DO $$ BEGIN\n    {create_type};\n"
+                    f"EXCEPTION WHEN duplicate_object THEN NULL;\nEND $$"
+                )
+
+    # 2. Tables (sorted_tables: bảng được tham chiếu bởi foreign key đứng trước) + indexes
+    for table in db.metadata.sorted_tables:
+        statements.append(str(CreateTable(table, if_not_exists=True).compile(dialect=dialect)).strip())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            statements.append(str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect)).strip())
+
+    ddl = ';\n\n'.join(statements) + ';\n'
+    return '\n'.join(line.rstrip() for line in ddl.split('\n'))
+
+
+def main():
+    ddl = compile_ddl()
+
+    with open(SCHEMA_PATH, 'w', encoding='utf-8') as f:
+        f.write("-- Generated by scripts/database/compile_ddl.py from src/models. Do not edit by hand.\n\n")
+        f.write(ddl)
+
+    print(f"✅ Wrote {SCHEMA_PATH} ({len(db.metadata.sorted_tables)} tables)")
+
+
+if __name__ == "__main__":
+    main()
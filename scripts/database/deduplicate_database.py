@@ -7,42 +7,77 @@ This script:
 3. Keeps the best version of each document
 """
 
+import functools
+import hashlib
 import numpy as np
+from collections import defaultdict
 from typing import List, Dict, Tuple
-from src.services.medical_chatbot_service import get_or_create_collection
-from src.nlp_model.phobert_embedding import PhoBERTEmbeddingFunction
+from src.services.medical_chatbot_service import get_or_create_collection, get_distance_space, phobert_ef
+from src.nlp_model.embedding_cache import CachedEmbeddingFunction
+from src.utils.similarity import (
+    find_duplicates_matmul, find_duplicates_minhash, find_duplicates_numba, find_duplicates_query
+)
+from tqdm import tqdm
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def calculate_similarity(text1: str, text2: str, phobert_ef) -> float:
+@functools.lru_cache(maxsize=1)
+def _get_ef() -> CachedEmbeddingFunction:
     """
-    Calculate cosine similarity between two texts
+    Cached PhoBERT embedding function, created once per process
     
-    Returns:
-        Similarity score (0-1, higher = more similar)
+    Wraps the PhoBERT model medical_chatbot_service already loaded at import,
+    instead of loading a second copy of the model.
     """
-    emb1 = phobert_ef([text1])[0]
-    emb2 = phobert_ef([text2])[0]
-    
-    # Cosine similarity
-    similarity = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
+    # Cache embedding theo nội dung (instance/embedding_cache.db): lần chạy sau chỉ embed document mới
+    return CachedEmbeddingFunction(phobert_ef)
+
+
+def embed_documents(documents: List[str], batch_size: int = 100) -> np.ndarray:
+    """
+    Embed documents with PhoBERT in batches (through the persistent embedding cache)
     
-    return float(similarity)
+    Returns:
+        float32 array of shape (len(documents), dim)
+    """
+    cached_ef = _get_ef()
+    total_docs = len(documents)
+    
+    # Embed mỗi document đúng một lần (theo batch), thay vì 2 lần cho mỗi cặp
+    embeddings = np.empty((total_docs, 0), dtype=np.float32)
+    for start in tqdm(range(0, total_docs, batch_size), desc="Embedding", unit="batch"):
+        batch = cached_ef(documents[start:start + batch_size])
+        if start == 0:
+            embeddings = np.empty((total_docs, batch.shape[1]), dtype=np.float32)
+        embeddings[start:start + len(batch)] = batch
+    
+    return embeddings
 
 
 def find_duplicates(
     similarity_threshold: float = 0.95,
-    batch_size: int = 100
+    batch_size: int = 100,
+    method: str = "matmul",
+    precision: str = "fp32"
 ) -> List[Tuple[str, str, float]]:
     """
     Find duplicate documents in ChromaDB
     
+    Uses the embeddings ChromaDB already stores; PhoBERT only runs if the
+    collection returns none.
+    
     Args:
         similarity_threshold: Documents with similarity > this are considered duplicates
-        batch_size: Process in batches to avoid memory issues
+        batch_size: Number of documents embedded per PhoBERT call (fallback only)
+        method: "matmul" (exact, all pairs), "numba" (exact, parallel kernel without
+                similarity tiles), "query" (ChromaDB HNSW top-k neighbours,
+                for large collections) or "minhash" (only within / between
+                MinHash text clusters with close centroids)
+        precision: Embedding storage for the matmul: "fp32", "fp16" or "int8" (per-row
+                   scaled; quantization error is far below the 0.95 threshold)
     
     Returns:
         List of (id1, id2, similarity) tuples
@@ -50,95 +85,123 @@ def find_duplicates(
     logger.info("Finding duplicates...")
     
     collection = get_or_create_collection()
-    phobert_ef = PhoBERTEmbeddingFunction()
     
-    # Get all documents
-    all_docs = collection.get(include=["documents", "metadatas"])
+    # Get all documents (kèm embedding đã lưu trong ChromaDB)
+    all_docs = collection.get(include=["documents", "embeddings"])
     total_docs = len(all_docs['ids'])
     
     logger.info(f"Checking {total_docs} documents for duplicates...")
     
+    if total_docs == 0:
+        return []
+    
+    ids = all_docs['ids']
+    
+    # Trùng khớp hoàn toàn: gom nhóm theo hash nội dung (một lượt O(N), không so từng cặp chuỗi)
+    groups = defaultdict(list)
+    for i, text in enumerate(all_docs['documents']):
+        groups[hashlib.blake2b((text or '').encode('utf-8'), digest_size=16).digest()].append(i)
+    
     duplicates = []
+    representatives = []
+    for members in groups.values():
+        representatives.append(members[0])
+        for k in members[1:]:
+            duplicates.append((ids[members[0]], ids[k], 1.0))
     
-    # Compare each document with others
-    for i in range(total_docs):
-        if i % 100 == 0:
-            logger.info(f"Progress: {i}/{total_docs}")
-        
-        doc1_id = all_docs['ids'][i]
-        doc1_text = all_docs['documents'][i]
-        
-        # Only compare with documents after this one (avoid double-checking)
-        for j in range(i + 1, total_docs):
-            doc2_id = all_docs['ids'][j]
-            doc2_text = all_docs['documents'][j]
-            
-            # Quick check: if texts are identical
-            if doc1_text == doc2_text:
-                duplicates.append((doc1_id, doc2_id, 1.0))
-                continue
-            
-            # Calculate similarity
-            similarity = calculate_similarity(doc1_text, doc2_text, phobert_ef)
-            
-            if similarity >= similarity_threshold:
-                duplicates.append((doc1_id, doc2_id, similarity))
+    logger.info(f"{len(duplicates)} exact duplicates, comparing {len(representatives)} unique documents")
+    
+    embeddings = all_docs.get('embeddings')
+    if embeddings is not None and len(embeddings) == total_docs:
+        embeddings = np.asarray(embeddings, dtype=np.float32)[representatives]
+    else:
+        logger.warning("Collection returned no embeddings, computing them with PhoBERT")
+        embeddings = embed_documents([all_docs['documents'][i] for i in representatives], batch_size)
+    
+    representative_ids = [ids[i] for i in representatives]
+    
+    if method == "query":
+        # Chỉ xét top-k láng giềng của mỗi document (HNSW) thay vì mọi cặp
+        duplicates.extend(find_duplicates_query(
+            collection, representative_ids, embeddings, similarity_threshold,
+            space=get_distance_space(collection),
+            skip_pairs={frozenset(pair[:2]) for pair in duplicates}
+        ))
+    elif method == "minhash":
+        duplicates.extend(find_duplicates_minhash(
+            representative_ids, [all_docs['documents'][i] for i in representatives],
+            embeddings, similarity_threshold
+        ))
+    elif method == "numba":
+        duplicates.extend(find_duplicates_numba(representative_ids, embeddings, similarity_threshold))
+    else:
+        # Cosine similarity của mọi cặp đại diện: matmul theo khối trên vector đã chuẩn hóa
+        duplicates.extend(find_duplicates_matmul(
+            representative_ids, embeddings, similarity_threshold, precision=precision
+        ))
     
     logger.info(f"Found {len(duplicates)} duplicate pairs")
     
     return duplicates
 
 
-def choose_best_document(doc1: Dict, doc2: Dict) -> str:
+def score_documents(meta_by_id: Dict[str, Dict]) -> Dict:
     """
-    Choose which document to keep when there are duplicates
-    
-    Criteria:
-    1. Longer original_answer is better
-    2. Has source link is better
-    3. More complete metadata is better
+    Precompute the choose_best_document criteria for every candidate once
     
     Returns:
-        ID of the document to keep
+        {'index': id -> row, 'answer_len': int32 array, 'base': int32 array}
+        where base = 2 (has source link) + number of complete fields
     """
-    meta1 = doc1['metadata']
-    meta2 = doc2['metadata']
-    
-    # Score each document
-    score1 = 0
-    score2 = 0
+    fields = ['symptoms', 'treatment', 'prevention', 'causes']
+    metas = list(meta_by_id.values())
     
     # Criterion 1: Length of original_answer
-    answer1_len = len(meta1.get('original_answer', ''))
-    answer2_len = len(meta2.get('original_answer', ''))
-    
-    if answer1_len > answer2_len:
-        score1 += 3
-    elif answer2_len > answer1_len:
-        score2 += 3
+    answer_len = np.fromiter(
+        (len(meta.get('original_answer') or '') for meta in metas), dtype=np.int32, count=len(metas)
+    )
     
     # Criterion 2: Has source link
-    source1 = meta1.get('source', '')
-    source2 = meta2.get('source', '')
-    
-    if source1 and source1.startswith('http'):
-        score1 += 2
-    if source2 and source2.startswith('http'):
-        score2 += 2
+    has_source = np.fromiter(
+        ((meta.get('source') or '').startswith('http') for meta in metas), dtype=np.int32, count=len(metas)
+    )
     
     # Criterion 3: Completeness of metadata
-    fields = ['symptoms', 'treatment', 'prevention', 'causes']
-    for field in fields:
-        if meta1.get(field) and len(meta1.get(field, '')) > 50:
-            score1 += 1
-        if meta2.get(field) and len(meta2.get(field, '')) > 50:
-            score2 += 1
+    field_score = np.fromiter(
+        (sum(len(meta.get(field) or '') > 50 for field in fields) for meta in metas), dtype=np.int32, count=len(metas)
+    )
+    
+    return {
+        'index': {doc_id: i for i, doc_id in enumerate(meta_by_id)},
+        'answer_len': answer_len,
+        'base': 2 * has_source + field_score
+    }
+
+
+def choose_best_document(id1: str, id2: str, scores: Dict) -> str:
+    """
+    Choose which document to keep when there are duplicates
+    
+    Criteria:
+    1. Longer original_answer is better (+3)
+    2. Has source link is better (+2)
+    3. More complete metadata is better (+1 per field longer than 50 chars)
+    
+    Args:
+        id1, id2: Document IDs
+        scores: Output of score_documents()
+    
+    Returns:
+        ID of the document to keep (id1 on a tie)
+    """
+    i, j = scores['index'][id1], scores['index'][id2]
+    answer_len = scores['answer_len']
+    
+    score1 = scores['base'][i] + 3 * (answer_len[i] > answer_len[j])
+    score2 = scores['base'][j] + 3 * (answer_len[j] > answer_len[i])
     
     # Return ID of document with higher score
-    if score1 >= score2:
-        return doc1['id']
-    else:
-        return doc2['id']
+    return id1 if score1 >= score2 else id2
 
 
 def remove_duplicates(
@@ -153,7 +216,7 @@ def remove_duplicates(
         dry_run: If True, only show what would be deleted (don't actually delete)
     
     Returns:
-        Number of documents removed
+        Number of documents removed (dry run: number that would be removed)
     """
     if not duplicates:
         logger.info("No duplicates to remove")
@@ -161,34 +224,55 @@ def remove_duplicates(
     
     collection = get_or_create_collection()
     
-    # Build set of IDs to delete
-    to_delete = set()
+    # Lấy metadata của mọi document liên quan trong một lần gọi (không get từng cặp)
+    all_ids = list({doc_id for pair in duplicates for doc_id in pair[:2]})
+    got = collection.get(ids=all_ids, include=["metadatas"])
+    meta_by_id = dict(zip(got['ids'], got['metadatas']))
+    
+    # Union-find: gom các document trùng nhau (kể cả bắc cầu A~B~C) thành một cụm
+    parent = {}
+    
+    def find(doc_id):
+        while parent[doc_id] != doc_id:
+            parent[doc_id] = parent[parent[doc_id]]
+            doc_id = parent[doc_id]
+        return doc_id
     
     for id1, id2, similarity in duplicates:
-        # Get both documents
-        doc1_data = collection.get(ids=[id1], include=["metadatas"])
-        doc2_data = collection.get(ids=[id2], include=["metadatas"])
-        
-        if not doc1_data['ids'] or not doc2_data['ids']:
+        if id1 not in meta_by_id or id2 not in meta_by_id:
             continue
         
-        doc1 = {'id': id1, 'metadata': doc1_data['metadatas'][0]}
-        doc2 = {'id': id2, 'metadata': doc2_data['metadatas'][0]}
-        
-        # Choose which to keep
-        keep_id = choose_best_document(doc1, doc2)
-        delete_id = id2 if keep_id == id1 else id1
+        parent.setdefault(id1, id1)
+        parent.setdefault(id2, id2)
+        root1, root2 = find(id1), find(id2)
+        if root1 != root2:
+            parent[root2] = root1
+    
+    clusters = defaultdict(list)
+    for doc_id in parent:
+        clusters[find(doc_id)].append(doc_id)
+    
+    # Build set of IDs to delete: giữ đúng một document tốt nhất mỗi cụm
+    to_delete = set()
+    
+    scores = score_documents({doc_id: meta_by_id[doc_id] for doc_id in parent})
+    
+    for members in clusters.values():
+        keep_id = functools.reduce(lambda id1, id2: choose_best_document(id1, id2, scores), members)
+        delete_ids = [doc_id for doc_id in members if doc_id != keep_id]
         
-        to_delete.add(delete_id)
+        to_delete.update(delete_ids)
         
-        logger.info(f"Duplicate pair (similarity: {similarity:.3f}):")
-        logger.info(f"  Keep: {keep_id}")
-        logger.info(f"  Delete: {delete_id}")
+        # Log từng cụm chỉ ở mức DEBUG (không format chuỗi khi tắt)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Duplicate cluster ({len(members)} documents):")
+            logger.debug(f"  Keep: {keep_id}")
+            logger.debug(f"  Delete: {', '.join(delete_ids)}")
     
     if dry_run:
         logger.info(f"\n[DRY RUN] Would delete {len(to_delete)} documents")
         logger.info("Run with dry_run=False to actually delete")
-        return 0
+        return len(to_delete)
     
     # Actually delete
     if to_delete:
@@ -200,7 +284,9 @@ def remove_duplicates(
 
 def deduplicate_database(
     similarity_threshold: float = 0.95,
-    dry_run: bool = True
+    dry_run: bool = True,
+    method: str = "matmul",
+    precision: str = "fp32"
 ):
     """
     Main function to deduplicate the entire database
@@ -208,13 +294,16 @@ def deduplicate_database(
     Args:
         similarity_threshold: Documents with similarity > this are considered duplicates
         dry_run: If True, only show what would be deleted
+        method: "matmul" / "numba" (exact), "query" (ChromaDB HNSW search) or
+                "minhash" (MinHash clusters + centroid pruning)
+        precision: Embedding storage format for the matmul method
     """
     print("="*80)
     print("DEDUPLICATION TOOL")
     print("="*80)
     
     # Step 1: Find duplicates
-    duplicates = find_duplicates(similarity_threshold)
+    duplicates = find_duplicates(similarity_threshold, method=method, precision=precision)
     
     if not duplicates:
         print("\n✓ No duplicates found!")
@@ -230,7 +319,7 @@ def deduplicate_database(
     # Step 4: Summary
     print("\n" + "="*80)
     if dry_run:
-        print(f"[DRY RUN] Would remove {len(duplicates)} duplicate documents")
+        print(f"[DRY RUN] Would remove {removed} duplicate documents ({len(duplicates)} duplicate pairs)")
         print("Run with dry_run=False to actually remove")
     else:
         print(f"✓ Removed {removed} duplicate documents")
@@ -252,10 +341,25 @@ if __name__ == "__main__":
                        help='Similarity threshold (0-1, default: 0.95)')
     parser.add_argument('--execute', action='store_true',
                        help='Actually remove duplicates (default: dry run)')
+    parser.add_argument('--method', choices=['matmul', 'numba', 'query', 'minhash'], default='matmul',
+                       help='matmul: exact all-pairs similarity, numba: same with a parallel '
+                            'kernel (needs numba), query: ChromaDB HNSW search, minhash: '
+                            'compare within/between MinHash clusters (needs datasketch)')
+    parser.add_argument('--precision', choices=['fp32', 'fp16', 'int8'], default='fp32',
+                       help='Embedding storage format for the matmul method')
+    parser.add_argument('--verbose', action='store_true',
+                       help='Show progress logs (INFO) and every duplicate cluster (DEBUG)')
     
     args = parser.parse_args()
     
+    # Mặc định chỉ WARNING: log tiến độ / từng cụm chỉ khi --verbose
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+    
     deduplicate_database(
         similarity_threshold=args.threshold,
-        dry_run=not args.execute
+        dry_run=not args.execute,
+        method=args.method,
+        precision=args.precision
     )
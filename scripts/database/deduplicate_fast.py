@@ -4,73 +4,94 @@ FAST Deduplication using ChromaDB search
 Instead of comparing all pairs (slow), use ChromaDB to find similar documents
 """
 
-from src.services.medical_chatbot_service import get_or_create_collection
+import numpy as np
+from typing import List, Tuple
+from src.services.medical_chatbot_service import get_or_create_collection, get_distance_space
+from src.utils.similarity import find_duplicates_matmul, find_duplicates_query
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def find_duplicates_fast(similarity_threshold: float = 0.95):
+def load_embeddings(collection, page_size: int = 1000) -> Tuple[List[str], np.ndarray]:
+    """
+    Load all ids + embeddings from ChromaDB page by page
+    
+    Each page is copied straight into a preallocated float32 buffer, so the
+    whole collection never exists as one Python list of lists of floats.
+    
+    Returns:
+        (ids, embeddings) where embeddings has shape (N, dim)
+    """
+    total_docs = collection.count()
+    ids = []
+    embeddings = None
+    
+    for offset in range(0, total_docs, page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings"])
+        if not page['ids']:
+            break
+        
+        chunk = np.asarray(page['embeddings'], dtype=np.float32)
+        if embeddings is None:
+            embeddings = np.empty((total_docs, chunk.shape[1]), dtype=np.float32)
+        
+        embeddings[len(ids):len(ids) + len(chunk)] = chunk
+        ids.extend(page['ids'])
+    
+    if embeddings is None:
+        return [], np.empty((0, 0), dtype=np.float32)
+    
+    return ids, embeddings[:len(ids)]
+
+
+def find_duplicates_fast(
+    similarity_threshold: float = 0.95,
+    batch_size: int = 256,
+    method: str = "matmul",
+    precision: str = "fp16",
+    max_workers: int = 8
+):
     """
     Fast duplicate detection using ChromaDB search
     
     For each document, search for similar documents.
     Much faster than pairwise comparison!
+    
+    Args:
+        similarity_threshold: Documents with similarity >= this are considered duplicates
+        batch_size: Number of embeddings sent to ChromaDB per query call
+        method: "matmul" (exact, in-memory NumPy matmul) or "query" (ChromaDB HNSW search)
+        precision: Storage format for the matmul pass: "fp32", "fp16" or "int8"
+        max_workers: Threads issuing concurrent ChromaDB queries ("query" method)
     """
     logger.info("Finding duplicates (FAST method)...")
     
     collection = get_or_create_collection()
     
-    # Get all documents
-    all_docs = collection.get(include=["embeddings", "metadatas"])
-    total_docs = len(all_docs['ids'])
+    # Get all embeddings (paginated)
+    ids, embeddings = load_embeddings(collection)
+    total_docs = len(ids)
     
     logger.info(f"Checking {total_docs} documents...")
     
-    duplicates = []
-    checked = set()
-    
-    # For each document, search for similar ones
-    for i, doc_id in enumerate(all_docs['ids']):
-        if i % 100 == 0:
-            logger.info(f"Progress: {i}/{total_docs}")
-        
-        if doc_id in checked:
-            continue
-        
-        # Get embedding
-        embedding = all_docs['embeddings'][i]
-        
-        # Search for similar documents
-        results = collection.query(
-            query_embeddings=[embedding],
-            n_results=10,  # Top 10 similar
-            include=["distances"]
+    if method == "matmul":
+        duplicates = find_duplicates_matmul(
+            ids, embeddings, similarity_threshold, precision=precision
+        )
+    else:
+        duplicates = find_duplicates_query(
+            collection, ids, embeddings, similarity_threshold,
+            space=get_distance_space(collection), batch_size=batch_size, max_workers=max_workers
         )
-        
-        # Check results
-        for j, (result_id, distance) in enumerate(zip(results['ids'][0], results['distances'][0])):
-            if result_id == doc_id:
-                continue  # Skip self
-            
-            # Convert distance to similarity (cosine)
-            # ChromaDB uses L2 distance, convert to similarity
-            similarity = 1 - (distance / 2)  # Approximate conversion
-            
-            if similarity >= similarity_threshold:
-                # Found duplicate!
-                pair = tuple(sorted([doc_id, result_id]))
-                if pair not in checked:
-                    duplicates.append((doc_id, result_id, similarity))
-                    checked.add(pair)
     
     logger.info(f"Found {len(duplicates)} duplicate pairs")
     
     return duplicates
 
 
-def remove_duplicates_fast(dry_run: bool = True):
+def remove_duplicates_fast(dry_run: bool = True, method: str = "matmul", precision: str = "fp16"):
     """
     Fast deduplication
     """
@@ -79,7 +100,9 @@ def remove_duplicates_fast(dry_run: bool = True):
     print("="*80)
     
     # Find duplicates
-    duplicates = find_duplicates_fast(similarity_threshold=0.95)
+    duplicates = find_duplicates_fast(
+        similarity_threshold=0.95, method=method, precision=precision
+    )
     
     if not duplicates:
         print("\n✓ No duplicates found!")
@@ -112,6 +135,12 @@ if __name__ == "__main__":
     
     parser = argparse.ArgumentParser()
     parser.add_argument('--execute', action='store_true')
+    parser.add_argument('--method', choices=['matmul', 'query'], default='matmul',
+                       help='matmul: exact in-memory similarity, query: ChromaDB search')
+    parser.add_argument('--precision', choices=['fp32', 'fp16', 'int8'], default='fp16',
+                       help='Embedding storage format for the matmul pass')
     args = parser.parse_args()
     
-    remove_duplicates_fast(dry_run=not args.execute)
+    remove_duplicates_fast(
+        dry_run=not args.execute, method=args.method, precision=args.precision
+    )
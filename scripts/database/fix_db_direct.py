@@ -1,7 +1,7 @@
 
 import sys
 import os
-from sqlalchemy import create_engine, text, inspect
+from sqlalchemy import create_engine, inspect, text
 
 # Add src to path
 sys.path.append(os.getcwd())
@@ -11,17 +11,25 @@ from src.config.config import Config
 def fix_db():
     try:
         engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
-        inspector = inspect(engine)
         
-        with engine.connect() as conn:
+        # 1 connection, 1 transaction: check + DDL, tự commit khi thoát block
+        with engine.begin() as conn:
             print("Checking columns...")
-            columns = [col['name'] for col in inspector.get_columns('Conversations')]
+            is_postgres = engine.dialect.name == 'postgresql'
+            if is_postgres:
+                columns = [row[0] for row in conn.execute(text(
+                    "SELECT column_name FROM information_schema.columns WHERE table_name = 'Conversations'"
+                ))]
+            else:
+                # SQLite (dev) không có information_schema
+                columns = [col['name'] for col in inspect(conn).get_columns('Conversations')]
             print(f"Current columns: {columns}")
             
             if 'summary' not in columns:
                 print("Adding summary column...")
-                conn.execute(text('ALTER TABLE "Conversations" ADD COLUMN summary TEXT;'))
-                conn.commit()
+                # IF NOT EXISTS (chỉ PostgreSQL): an toàn nếu chạy song song / chạy lại
+                if_not_exists = 'IF NOT EXISTS ' if is_postgres else ''
+                conn.execute(text(f'ALTER TABLE "Conversations" ADD COLUMN {if_not_exists}summary TEXT;'))
                 print("✅ Column added successfully!")
             else:
                 print("✓ Column already exists.")
@@ -13,8 +13,10 @@ app = create_app()
 with app.app_context():
     try:
         # Update tất cả messages có message_type='audio' thành 'voice'
+        # Script chạy một lần: không tạo partial index cho 'audio' (không phải label của
+        # message_type_enum nên Postgres không nhận predicate đó làm điều kiện index)
         result = db.session.execute(
-            text("UPDATE messages SET message_type = 'voice' WHERE message_type = 'audio'")
+            text("""UPDATE "Messages" SET message_type = 'voice' WHERE message_type = 'audio'""")
         )
         
         rows_updated = result.rowcount
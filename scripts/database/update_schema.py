@@ -2,37 +2,49 @@ from src.config.config import Config
 from sqlalchemy import create_engine, text
 import os
 
+NEW_COLUMNS = ['is_archived', 'is_pinned']
+
 def update_db_schema():
     print(f"Connecting to database: {Config.SQLALCHEMY_DATABASE_URI}")
     engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
-    
-    with engine.connect() as conn:
-        # Check if columns exist
-        result = conn.execute(text("PRAGMA table_info(Conversations)"))
-        columns = [row[1] for row in result]
-        
-        if 'is_archived' not in columns:
-            print("Adding 'is_archived' column...")
-            try:
-                conn.execute(text("ALTER TABLE Conversations ADD COLUMN is_archived BOOLEAN DEFAULT 0"))
-                print("✓ Added 'is_archived'")
-            except Exception as e:
-                print(f"Error adding is_archived: {e}")
-        else:
-            print("'is_archived' already exists.")
-            
-        if 'is_pinned' not in columns:
-            print("Adding 'is_pinned' column...")
-            try:
-                conn.execute(text("ALTER TABLE Conversations ADD COLUMN is_pinned BOOLEAN DEFAULT 0"))
-                print("✓ Added 'is_pinned'")
-            except Exception as e:
-                print(f"Error adding is_pinned: {e}")
-        else:
-            print("'is_pinned' already exists.")
-            
-        conn.commit()
+
+    try:
+        # Một transaction cho cả kiểm tra lẫn ALTER
+        with engine.begin() as conn:
+            if engine.dialect.name == 'postgresql':
+                # Check if columns exist (1 query cho cả 2 cột)
+                result = conn.execute(text("""
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_name = 'Conversations' AND column_name = ANY(:names)
+                """), {'names': NEW_COLUMNS})
+                columns = {row[0] for row in result}
+
+                # PostgreSQL 9.6+: 1 câu ALTER, IF NOT EXISTS cho từng cột
+                conn.execute(text("""
+                    ALTER TABLE "Conversations"
+                        ADD COLUMN IF NOT EXISTS is_archived BOOLEAN DEFAULT FALSE,
+                        ADD COLUMN IF NOT EXISTS is_pinned BOOLEAN DEFAULT FALSE
+                """))
+            else:
+                # SQLite: không có ADD COLUMN IF NOT EXISTS
+                result = conn.execute(text("PRAGMA table_info(Conversations)"))
+                columns = {row[1] for row in result}
+
+                for column in NEW_COLUMNS:
+                    if column not in columns:
+                        conn.execute(text(f"ALTER TABLE Conversations ADD COLUMN {column} BOOLEAN DEFAULT 0"))
+
+        for column in NEW_COLUMNS:
+            if column in columns:
+                print(f"'{column}' already exists.")
+            else:
+                print(f"✓ Added '{column}'")
+
         print("Database schema update completed.")
 
+    except Exception as e:
+        print(f"Error updating schema: {e}")
+
 if __name__ == "__main__":
     update_db_schema()
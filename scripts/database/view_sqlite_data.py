@@ -57,14 +57,18 @@ def view_database():
     else:
         print("  No users found")
     
-    # Conversations
+    # Conversations: LIMIT trước, rồi đếm tin nhắn của 5 hội thoại qua index (không GROUP BY cả bảng messages)
     print_section("💬 CONVERSATIONS (Last 5)")
+    try:
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages(conversation_id)")
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        print(f"⚠️  Could not create index: {e}")
+    
     cursor.execute("""
         SELECT c.conversation_id, c.user_id, c.title, c.started_at,
-               COUNT(m.message_id) as msg_count
+               (SELECT COUNT(*) FROM messages m WHERE m.conversation_id = c.conversation_id) as msg_count
         FROM conversations c
-        LEFT JOIN messages m ON c.conversation_id = m.conversation_id
-        GROUP BY c.conversation_id
         ORDER BY c.started_at DESC 
         LIMIT 5
     """)
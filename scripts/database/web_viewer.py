@@ -4,13 +4,78 @@ Simple Web Viewer for SQLite Database
 Flask app to view SQLite data in browser
 """
 
-from flask import Flask, render_template_string, jsonify
+from flask import Flask, render_template_string, jsonify, request
+import functools
+import hashlib
 import sqlite3
+import threading
+import time
 import os
 
 app = Flask(__name__)
 DB_PATH = os.path.join('instance', 'chatbot.db')
 
+# Một kết nối dùng chung cho mọi request (mở lần đầu), khóa lại vì sqlite3 không an toàn đa luồng
+_conn = None
+_conn_lock = threading.Lock()
+
+
+# Index cho các truy vấn của viewer (partial index: COUNT tin nhắn voice không quét cả bảng)
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_messages_voice ON messages(message_type) WHERE message_type = 'voice'",
+    "CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages(conversation_id)",
+]
+
+
+def _create_indexes(conn):
+    for statement in INDEXES:
+        try:
+            conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            # DB chỉ đọc hoặc chưa có bảng: viewer vẫn chạy, chỉ chậm hơn
+            print(f"⚠️  Could not create index: {e}")
+    conn.commit()
+
+
+def query(sql, one=False):
+    """Run a read query on the shared connection; returns fetchall() (or fetchone() if one)"""
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            _conn.execute("PRAGMA mmap_size=268435456")  # 256 MB memory-mapped I/O
+            _create_indexes(_conn)
+        cursor = _conn.execute(sql)
+        return cursor.fetchone() if one else cursor.fetchall()
+
+
+# Mọi tab đang mở đều tự refresh: giữ kết quả API trong CACHE_TTL giây, trả 304 nếu ETag không đổi
+CACHE_TTL = 5
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def cached(view):
+    """Serve a JSON endpoint from a TTL cache with ETag / If-None-Match support"""
+    @functools.wraps(view)
+    def wrapper():
+        now = time.monotonic()
+        with _cache_lock:
+            entry = _cache.get(view.__name__)
+        
+        if entry is None or now - entry[0] >= CACHE_TTL:
+            body = view().get_data()
+            entry = (now, body, hashlib.md5(body).hexdigest())
+            with _cache_lock:
+                _cache[view.__name__] = entry
+        
+        response = app.response_class(entry[1], mimetype='application/json')
+        response.set_etag(entry[2])
+        response.cache_control.max_age = CACHE_TTL
+        return response.make_conditional(request)
+    return wrapper
+
+
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
@@ -237,23 +302,15 @@ def index():
     return render_template_string(HTML_TEMPLATE)
 
 @app.route('/api/stats')
+@cached
 def stats():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT COUNT(*) FROM users")
-    users = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM conversations")
-    conversations = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM messages")
-    messages = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM messages WHERE message_type = 'voice'")
-    voice_messages = cursor.fetchone()[0]
-    
-    conn.close()
+    # Một câu lệnh cho cả 4 số liệu thay vì 4 lần truy vấn
+    users, conversations, messages, voice_messages = query("""
+        SELECT (SELECT COUNT(*) FROM users),
+               (SELECT COUNT(*) FROM conversations),
+               (SELECT COUNT(*) FROM messages),
+               (SELECT COUNT(*) FROM messages WHERE message_type = 'voice')
+    """, one=True)
     
     return jsonify({
         'users': users,
@@ -263,48 +320,38 @@ def stats():
     })
 
 @app.route('/api/users')
+@cached
 def users():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+    data = query("""
         SELECT user_id, email, full_name, is_verified, created_at 
         FROM users 
         ORDER BY created_at DESC 
         LIMIT 20
     """)
-    data = cursor.fetchall()
-    conn.close()
     return jsonify(data)
 
 @app.route('/api/conversations')
+@cached
 def conversations():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+    data = query("""
         SELECT c.conversation_id, c.user_id, c.title, 
-               COUNT(m.message_id) as msg_count, c.started_at
+               (SELECT COUNT(*) FROM messages m WHERE m.conversation_id = c.conversation_id) as msg_count,
+               c.started_at
         FROM conversations c
-        LEFT JOIN messages m ON c.conversation_id = m.conversation_id
-        GROUP BY c.conversation_id
         ORDER BY c.started_at DESC 
         LIMIT 20
     """)
-    data = cursor.fetchall()
-    conn.close()
     return jsonify(data)
 
 @app.route('/api/messages')
+@cached
 def messages():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+    data = query("""
         SELECT message_id, conversation_id, sender, message_type, message_text, sent_at
         FROM messages 
         ORDER BY sent_at DESC 
         LIMIT 50
     """)
-    data = cursor.fetchall()
-    conn.close()
     return jsonify(data)
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import base64
 import time
@@ -7,14 +8,23 @@ BASE_URL = "http://localhost:5000/api"
 EMAIL = f"test_image_{int(time.time())}@example.com"
 PASSWORD = "password123"
 
+# 1x1 Red Pixel (base64 tạo sẵn một lần; API chat-secure chỉ nhận JSON)
+IMAGE_BASE64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNk+A8AAQUBAScY42YAAAAASUVORK5CYII="
+
 def test_image_upload():
     print("="*60)
     print("TEST IMAGE UPLOAD")
     print("="*60)
 
+    # Một session keep-alive cho cả 3 request (không bắt tay TCP/TLS lại mỗi lần)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
     # 1. Register
     print(f"\n[1] Registering user: {EMAIL}")
-    reg_resp = requests.post(
+    reg_resp = session.post(
         f"{BASE_URL}/auth/register",
         json={
             "email": EMAIL,
@@ -29,7 +39,7 @@ def test_image_upload():
 
     # 2. Login
     print("\n[2] Logging in...")
-    login_resp = requests.post(
+    login_resp = session.post(
         f"{BASE_URL}/auth/login",
         json={
             "email": EMAIL,
@@ -42,19 +52,16 @@ def test_image_upload():
         return
     
     token = login_resp.json()['token']
+    session.headers["Authorization"] = f"Bearer {token}"
     print(f"✅ Login successful. Token obtained.")
 
     # 3. Chat with Image
     print("\n[3] Sending image to chat...")
-    # 1x1 Red Pixel
-    image_base64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNk+A8AAQUBAScY42YAAAAASUVORK5CYII="
-    
-    chat_resp = requests.post(
+    chat_resp = session.post(
         f"{BASE_URL}/medical-chatbot/chat-secure",
-        headers={"Authorization": f"Bearer {token}"},
         json={
             "question": "Hình ảnh này là gì?",
-            "image_base64": image_base64
+            "image_base64": IMAGE_BASE64
         }
     )
     
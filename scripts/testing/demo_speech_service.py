@@ -18,20 +18,21 @@ from src.services.speech_service import speech_service
 
 def test_whisper_installation():
     """
-    Test 1: Kiểm tra Whisper đã cài đặt chưa
+    Test 1: Kiểm tra faster-whisper đã cài đặt chưa
     """
     print("\n" + "="*60)
-    print("TEST 1: Kiểm tra Whisper Installation")
+    print("TEST 1: Kiểm tra faster-whisper Installation")
     print("="*60)
     
     try:
-        import whisper
-        print(f"✓ Whisper version: {whisper.__version__}")
+        import faster_whisper
+        print(f"✓ faster-whisper version: {faster_whisper.__version__}")
+        print(f"✓ Backend: {speech_service.backend}")
         print(f"✓ Model name: {speech_service.model_name}")
         return True
     except ImportError as e:
-        print(f"✗ Whisper chưa được cài đặt: {e}")
-        print("  Chạy: pip install openai-whisper")
+        print(f"✗ faster-whisper chưa được cài đặt: {e}")
+        print("  Chạy: pip install faster-whisper")
         return False
 
 
@@ -196,7 +197,8 @@ def main():
     else:
         print("\n⚠ Some tests failed. Please check the errors above.")
         print("\nCommon issues:")
-        print("- Whisper not installed: pip install openai-whisper")
+        print("- faster-whisper not installed: pip install faster-whisper")
+        print("- Local model not used: set SPEECH_BACKEND=local")
         print("- ffmpeg not installed: choco install ffmpeg (Windows)")
         print("- No audio sample: create test_audio.mp3 for testing")
 
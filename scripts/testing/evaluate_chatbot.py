@@ -3,6 +3,7 @@ import os
 import sys
 import time
 import csv
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from tqdm import tqdm
 
@@ -16,9 +17,79 @@ from src.services.medical_chatbot_service import (
     generate_natural_response
 )
 
-def evaluate_chatbot(input_csv_path, output_csv_path):
+FIELDNAMES = [
+    'id', 'question', 'chatbot_answer', 'top_source_found', 'relevance_score',
+    'confidence_level', 'response_time_sec', 'user_rating_1_to_5', 'user_comments'
+]
+
+def process_question(question_id, question):
+    """
+    Run one question through the chatbot pipeline and return its result row.
+    """
+    start_time = time.time()
+    
+    try:
+        # 1. Extract Intent
+        intent_data = extract_user_intent_and_features(question)
+        extracted_features = intent_data.get('extracted_features', {})
+        
+        # 2. Search
+        search_result = combined_search_with_filters(question, extracted_features)
+        
+        # 3. Generate Response
+        response_data = generate_natural_response(
+            question, 
+            search_result.get('results', []), 
+            extracted_features
+        )
+        
+        end_time = time.time()
+        duration = round(end_time - start_time, 2)
+        
+        # Extract key metrics
+        answer = response_data.get('answer', '')
+        confidence = response_data.get('confidence', 'unknown')
+        sources = response_data.get('sources', [])
+        
+        top_source = "None"
+        top_score = 0.0
+        
+        if sources:
+            top_source = sources[0]['metadata'].get('disease_name', 'Unknown')
+            top_score = sources[0].get('relevance_score', 0.0)
+        
+        return {
+            'id': question_id,
+            'question': question,
+            'chatbot_answer': answer,
+            'top_source_found': top_source,
+            'relevance_score': top_score,
+            'confidence_level': confidence,
+            'response_time_sec': duration,
+            'user_rating_1_to_5': '', # Placeholder for user
+            'user_comments': ''       # Placeholder for user
+        }
+        
+    except Exception as e:
+        print(f"Error processing question '{question}': {e}")
+        return {
+            'id': question_id,
+            'question': question,
+            'chatbot_answer': f"ERROR: {str(e)}",
+            'top_source_found': 'ERROR',
+            'relevance_score': 0,
+            'confidence_level': 'error',
+            'response_time_sec': 0,
+            'user_rating_1_to_5': '',
+            'user_comments': ''
+        }
+
+def evaluate_chatbot(input_csv_path, output_csv_path, max_workers=16):
     """
     Run chatbot evaluation on a list of questions.
+    
+    Questions are processed concurrently (max_workers threads): each one is
+    I/O-bound on the LLM and the vector DB, so wall time drops with the worker count.
     """
     print(f"Loading questions from: {input_csv_path}")
     
@@ -32,79 +103,46 @@ def evaluate_chatbot(input_csv_path, output_csv_path):
         print(f"Error reading CSV: {e}")
         return
 
-    results = []
+    if 'question' in df.columns:
+        questions = df['question'].astype(str).tolist()
+    else:
+        questions = [''] * len(df)
     
+    # Bộ câu hỏi có cột audio_path: transcribe tất cả file audio trong 1 lần (batch)
+    # trước khi chạy chatbot, thay vì gọi transcribe_audio cho từng dòng
+    if 'audio_path' in df.columns:
+        from src.services.speech_service import speech_service
+        
+        audio_rows = df['audio_path'].dropna()
+        print(f"Transcribing {len(audio_rows)} audio files...")
+        batch_results = speech_service.transcribe_batch(audio_rows.astype(str).tolist(), language='vi')
+        for position, result in zip(df.index.get_indexer(audio_rows.index), batch_results):
+            if result['text']:
+                questions[position] = result['text']
+
+    if 'id' in df.columns:
+        question_ids = df['id'].tolist()
+    else:
+        question_ids = list(range(1, len(df) + 1))
+
     print(f"Starting evaluation of {len(df)} questions...")
     
-    for index, row in tqdm(df.iterrows(), total=len(df)):
-        question = str(row['question'])
-        question_id = row.get('id', index + 1)
+    # Ghi từng dòng ngay khi có kết quả: RAM chỉ giữ 1 dòng, crash giữa chừng vẫn còn các dòng đã xong
+    processed = 0
+    with open(output_csv_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
         
-        start_time = time.time()
-        
-        try:
-            # 1. Extract Intent
-            intent_data = extract_user_intent_and_features(question)
-            extracted_features = intent_data.get('extracted_features', {})
-            
-            # 2. Search
-            search_result = combined_search_with_filters(question, extracted_features)
-            
-            # 3. Generate Response
-            response_data = generate_natural_response(
-                question, 
-                search_result.get('results', []), 
-                extracted_features
-            )
-            
-            end_time = time.time()
-            duration = round(end_time - start_time, 2)
-            
-            # Extract key metrics
-            answer = response_data.get('answer', '')
-            confidence = response_data.get('confidence', 'unknown')
-            sources = response_data.get('sources', [])
-            
-            top_source = "None"
-            top_score = 0.0
-            
-            if sources:
-                top_source = sources[0]['metadata'].get('disease_name', 'Unknown')
-                top_score = sources[0].get('relevance_score', 0.0)
-            
-            results.append({
-                'id': question_id,
-                'question': question,
-                'chatbot_answer': answer,
-                'top_source_found': top_source,
-                'relevance_score': top_score,
-                'confidence_level': confidence,
-                'response_time_sec': duration,
-                'user_rating_1_to_5': '', # Placeholder for user
-                'user_comments': ''       # Placeholder for user
-            })
-            
-        except Exception as e:
-            print(f"Error processing question '{question}': {e}")
-            results.append({
-                'id': question_id,
-                'question': question,
-                'chatbot_answer': f"ERROR: {str(e)}",
-                'top_source_found': 'ERROR',
-                'relevance_score': 0,
-                'confidence_level': 'error',
-                'response_time_sec': 0,
-                'user_rating_1_to_5': '',
-                'user_comments': ''
-            })
+        # map() giữ nguyên thứ tự câu hỏi; chỉ luồng chính ghi file nên không cần lock
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for row in tqdm(executor.map(process_question, question_ids, questions), total=len(questions)):
+                writer.writerow(row)
+                f.flush()
+                processed += 1
 
-    # Save results
-    result_df = pd.DataFrame(results)
-    result_df.to_csv(output_csv_path, index=False, encoding='utf-8-sig')
-    
     print(f"\nEvaluation complete!")
     print(f"Results saved to: {output_csv_path}")
-    print(f"Total questions processed: {len(results)}")
+    print(f"Total questions processed: {processed}")
 
 if __name__ == "__main__":
     # Setup file logging
@@ -5,7 +5,11 @@ This script demonstrates the improvements from hybrid search by testing
 with various medical queries.
 """
 
+import asyncio
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 from typing import Dict, Any
 
@@ -13,6 +17,19 @@ from typing import Dict, Any
 BASE_URL = "http://127.0.0.1:5000"
 CHAT_ENDPOINT = f"{BASE_URL}/api/medical-chatbot/chat"
 
+# Một session keep-alive cho mọi test case (không bắt tay TCP lại mỗi câu hỏi)
+# Retry khi không kết nối được / server trả 502-504 (chưa xử lý request)
+SESSION = requests.Session()
+_adapter = HTTPAdapter(max_retries=Retry(
+    total=3,
+    read=0,
+    backoff_factor=0.5,
+    status_forcelist=(502, 503, 504),
+    allowed_methods=frozenset(["POST"])
+))
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+
 def test_query(question: str, conversation_id: int = None) -> Dict[str, Any]:
     """
     Send a query to the medical chatbot API
@@ -30,13 +47,38 @@ def test_query(question: str, conversation_id: int = None) -> Dict[str, Any]:
     }
     
     try:
-        response = requests.post(CHAT_ENDPOINT, json=payload)
+        response = SESSION.post(CHAT_ENDPOINT, json=payload, timeout=60)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"❌ Error: {e}")
         return None
 
+async def test_query_async(session: aiohttp.ClientSession, question: str, conversation_id: int = None) -> Dict[str, Any]:
+    """
+    Async version of test_query, so several questions can be in flight at once
+    
+    Args:
+        session: Shared aiohttp session
+        question: Medical question to ask
+        conversation_id: Optional conversation ID
+        
+    Returns:
+        API response with answer and metadata
+    """
+    payload = {
+        "message": question,
+        "conversation_id": conversation_id
+    }
+    
+    try:
+        async with session.post(CHAT_ENDPOINT, json=payload) as response:
+            response.raise_for_status()
+            return await response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"❌ Error ({question}): {e}")
+        return None
+
 def print_result(question: str, result: Dict[str, Any]):
     """Pretty print the test result"""
     print("\n" + "="*80)
@@ -80,8 +122,8 @@ def print_result(question: str, result: Dict[str, Any]):
             if source.get('final_score'):
                 print(f"       • Final Score (after reranking): {source['final_score']:.3f}")
 
-def main():
-    """Run test cases"""
+async def main():
+    """Run test cases (all questions are sent concurrently)"""
     print("\n" + "🧪 TESTING HYBRID SEARCH (BM25 + Vector)".center(80, "="))
     
     # Test cases designed to show hybrid search benefits
@@ -102,14 +144,13 @@ def main():
         "Làm thế nào để phòng ngừa cảm cúm?",
     ]
     
-    for i, question in enumerate(test_cases, 1):
+    # Gửi tất cả câu hỏi cùng lúc; gather trả kết quả đúng thứ tự test_cases để in ra
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60)) as session:
+        results = await asyncio.gather(*(test_query_async(session, q) for q in test_cases))
+    
+    for i, (question, result) in enumerate(zip(test_cases, results), 1):
         print(f"\n\n{'TEST CASE ' + str(i):.^80}")
-        result = test_query(question)
         print_result(question, result)
-        
-        # Small delay between requests
-        import time
-        time.sleep(1)
     
     print("\n\n" + "="*80)
     print("✅ Testing completed!".center(80))
@@ -124,4 +165,4 @@ def main():
     print("   - Final Score = Sau khi reranking với Cross-Encoder")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
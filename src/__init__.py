@@ -1,9 +1,11 @@
+import threading
 from flask import Flask
 from flask_restx import Api
 from flask_cors import CORS
 from flask_mail import Mail
 from src.models.base import db
 from src.config.config import Config
+from src.utils.json_provider import HAVE_ORJSON, ORJSONProvider, output_orjson
 
 # Import all models to ensure they are registered with SQLAlchemy
 from src.models.user import User
@@ -20,6 +22,33 @@ from src.models.medication_log import MedicationLog
 
 mail = Mail()
 
+def _warmup(app):
+    """Khởi tạo các thành phần nặng sau khi app đã sẵn sàng nhận request."""
+    with app.app_context():
+        # Initialize BM25 index for hybrid search
+        try:
+            from src.services import medical_chatbot_service
+            medical_chatbot_service.initialize_bm25_index()
+            app.config['BM25_READY'] = medical_chatbot_service.BM25_ENABLED
+        except Exception as e:
+            print(f"Warning: Failed to initialize BM25 index: {e}")
+        
+        # Initialize medication reminder scheduler
+        if app.config['ENABLE_MEDICATION']:
+            try:
+                from src.services.scheduler_service import init_scheduler
+                init_scheduler(app)
+            except Exception as e:
+                print(f"Warning: Failed to initialize scheduler: {e}")
+        
+        # Load sẵn model faster-whisper (SPEECH_BACKEND=local) để request đầu không phải chờ
+        if app.config['ENABLE_SPEECH']:
+            try:
+                from src.services.speech_service import speech_service
+                speech_service._load_model()
+            except Exception as e:
+                print(f"Warning: Failed to load Whisper model: {e}")
+
 def create_app():
     app = Flask(__name__)
     
@@ -63,6 +92,11 @@ def create_app():
         security='Bearer'
     )
     
+    # Serialize JSON bằng orjson nếu đã cài (jsonify và response của Flask-RESTX)
+    if HAVE_ORJSON:
+        app.json = ORJSONProvider(app)
+        api.representation('application/json')(output_orjson)
+    
     # Initialize extensions
     db.init_app(app)
     mail.init_app(app)
@@ -74,34 +108,30 @@ def create_app():
     from src.controllers.auth_controller import auth_ns
     from src.controllers.medical_chatbot_controller import medical_chatbot_ns
     from src.controllers.notification_controller import notification_ns
-    from src.controllers.speech_controller import speech_ns  # Speech-to-Text API
     from src.controllers.admin_controller import admin_ns  # Admin statistics API
-    from src.controllers.health_profile_controller import health_profile_ns  # Health Profile API
-    from src.controllers.medication_controller import medication_ns  # Medication Reminder API
     
     api.add_namespace(auth_ns, path='/api/auth')
     api.add_namespace(medical_chatbot_ns, path='/api/medical-chatbot')
     api.add_namespace(notification_ns, path='/api/notification')
-    api.add_namespace(speech_ns, path='/api/speech')  # Speech-to-Text endpoints
     api.add_namespace(admin_ns, path='/api/admin')  # Admin statistics endpoints
-    api.add_namespace(health_profile_ns, path='/api/health-profile')  # Health Profile endpoints
-    api.add_namespace(medication_ns, path='/api/medication')  # Medication Reminder endpoints
+    
+    # Các tính năng tùy chọn: tắt bằng biến môi trường thì không import controller/service tương ứng
+    if app.config['ENABLE_SPEECH']:
+        from src.controllers.speech_controller import speech_ns  # Speech-to-Text API
+        api.add_namespace(speech_ns, path='/api/speech')  # Speech-to-Text endpoints
+    if app.config['ENABLE_HEALTH_PROFILE']:
+        from src.controllers.health_profile_controller import health_profile_ns  # Health Profile API
+        api.add_namespace(health_profile_ns, path='/api/health-profile')  # Health Profile endpoints
+    if app.config['ENABLE_MEDICATION']:
+        from src.controllers.medication_controller import medication_ns  # Medication Reminder API
+        api.add_namespace(medication_ns, path='/api/medication')  # Medication Reminder endpoints
     
     with app.app_context():
         db.create_all()
-        
-        # Initialize BM25 index for hybrid search
-        try:
-            from src.services.medical_chatbot_service import initialize_bm25_index
-            initialize_bm25_index()
-        except Exception as e:
-            print(f"Warning: Failed to initialize BM25 index: {e}")
-        
-        # Initialize medication reminder scheduler
-        try:
-            from src.services.scheduler_service import init_scheduler
-            init_scheduler(app)
-        except Exception as e:
-            print(f"Warning: Failed to initialize scheduler: {e}")
+    
+    # BM25 index, scheduler và model Whisper chạy ở thread nền: worker nhận request ngay,
+    # hybrid_search chỉ dùng vector cho đến khi BM25_READY = True
+    app.config['BM25_READY'] = False
+    threading.Thread(target=_warmup, args=(app,), daemon=True, name='app-warmup').start()
     
     return app
\ No newline at end of file
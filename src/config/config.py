@@ -23,11 +23,29 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # PostgreSQL configuration (chỉ dùng khi chọn PostgreSQL)
+    # Production: DATABASE_POSTGRESQL_URL có thể trỏ tới PgBouncer (transaction mode)
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
+        # Pool là theo từng process: tổng connection tối đa = số gunicorn worker × (pool_size + max_overflow),
+        # phải nhỏ hơn max_connections của Postgres (mặc định 100, trừ hao cho psql/migration).
+        # VD: 4 worker × (5 + 10) = 60. Tăng DB_POOL_SIZE/DB_MAX_OVERFLOW khi có ít worker hoặc dùng PgBouncer.
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        # LIFO: dùng lại connection vừa trả về (còn "nóng"), connection thừa tự hết hạn theo pool_recycle
+        'pool_use_lifo': True,
     }
     
+    # Tham số riêng của libpq, chỉ thêm khi có cấu hình
+    # (PgBouncer từ chối startup parameter 'options' nếu không khai báo ignore_startup_parameters)
+    _PG_CONNECT_ARGS = {}
+    if os.getenv('DB_STATEMENT_TIMEOUT_MS'):
+        _PG_CONNECT_ARGS['options'] = f"-c statement_timeout={int(os.getenv('DB_STATEMENT_TIMEOUT_MS'))}"
+    if os.getenv('DB_SSLMODE'):
+        _PG_CONNECT_ARGS['sslmode'] = os.getenv('DB_SSLMODE')
+    if _PG_CONNECT_ARGS and (SQLALCHEMY_DATABASE_URI or '').startswith('postgres'):
+        SQLALCHEMY_ENGINE_OPTIONS['connect_args'] = _PG_CONNECT_ARGS
+    
     # JWT
     SECRET_KEY = os.getenv('SECRET_KEY')
     
@@ -49,13 +67,21 @@ class Config:
     DB_PASSWORD = os.getenv('DB_PASSWORD')
     DB_PORT = os.getenv('DB_PORT')
     
+    # Optional features (tắt để không đăng ký API / không khởi động service tương ứng)
+    ENABLE_SPEECH = os.getenv('ENABLE_SPEECH', 'True').lower() == 'true'  # /api/speech + Whisper
+    ENABLE_HEALTH_PROFILE = os.getenv('ENABLE_HEALTH_PROFILE', 'True').lower() == 'true'  # /api/health-profile
+    ENABLE_MEDICATION = os.getenv('ENABLE_MEDICATION', 'True').lower() == 'true'  # /api/medication + scheduler
+    
     # Cache settings
     CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'True').lower() == 'true'
     CACHE_MAX_SIZE = int(os.getenv('CACHE_MAX_SIZE', 1000))  # Max entries
     CACHE_TTL_SEARCH = int(os.getenv('CACHE_TTL_SEARCH', 3600))  # 1 hour for search results
     CACHE_TTL_RESPONSE = int(os.getenv('CACHE_TTL_RESPONSE', 1800))  # 30 min for responses
+    CACHE_TTL_SUGGESTIONS = int(os.getenv('CACHE_TTL_SUGGESTIONS', 3600))  # 1 hour for next-question suggestions
     
     # OpenAI Configuration (for Next-Question Suggestions)
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')  # Cheaper than gpt-4
-    ENABLE_SUGGESTIONS = os.getenv('ENABLE_SUGGESTIONS', 'True').lower() == 'true'
\ No newline at end of file
+    ENABLE_SUGGESTIONS = os.getenv('ENABLE_SUGGESTIONS', 'True').lower() == 'true'
+    SUGGESTION_WORKERS = int(os.getenv('SUGGESTION_WORKERS', 4))  # Threads running suggestion LLM calls
+    SUGGESTION_TIMEOUT = float(os.getenv('SUGGESTION_TIMEOUT', 5.0))  # Max seconds to wait for suggestions
\ No newline at end of file
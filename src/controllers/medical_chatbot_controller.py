@@ -1,4 +1,4 @@
-from flask import request  # Import request để lấy dữ liệu từ client gửi lên (header, body, query params)
+from flask import request, current_app  # Import request để lấy dữ liệu từ client gửi lên (header, body, query params)
 from flask_restx import Namespace, Resource, fields  # Import các công cụ tạo API: Namespace (nhóm API), Resource (Logic), fields (Validation)
 import logging  # Import thư viện ghi log để theo dõi lỗi và hoạt động của hệ thống
 from datetime import datetime  # Import thư viện xử lý thời gian
@@ -16,7 +16,8 @@ from src.models.message import Message  # Import model bảng messages
 from src.models.conversation import Conversation  # Import model bảng conversations
 from src.models.user import User  # Import model bảng users
 from src.utils.auth_middleware import token_required  # Import decorator bảo vệ API bằng JWT
-from src.services.suggestion_agent_service import generate_next_questions  # Import agent gợi ý câu hỏi tiếp theo
+from src.services.suggestion_agent_service import generate_next_questions_async  # Import agent gợi ý câu hỏi tiếp theo
+from src.config.config import Config
 
 # Cấu hình logging
 logger = logging.getLogger(__name__)
@@ -163,7 +164,7 @@ class SecureMedicalChat(Resource):
             # 4. Tìm kiếm thông tin (Hybrid Search: Vector + Keyword)
             # Kết hợp Caching để tăng tốc độ nếu câu hỏi lặp lại
             # Lưu ý ở đây đang dùng hàm cached_search (cần import bên dưới)
-            from src.services.cached_chatbot_service import cached_search, cached_response
+            from src.services.cached_chatbot_service import cached_search, cached_response, cached_suggestions_async
             
             search_result = cached_search(
                 combined_search_with_filters,
@@ -187,6 +188,15 @@ class SecureMedicalChat(Resource):
             answer = response.get('answer')
             response_from_cache = response.get('from_cache', False)
             
+            # 6. Gợi ý câu hỏi tiếp theo (Next Questions)
+            # Agent sẽ đoán xem user có thể muốn hỏi gì tiếp.
+            # Mỗi hội thoại 1 request LLM riêng trên thread pool, chạy song song với việc lưu tin nhắn bot vào DB
+            suggestion_future = cached_suggestions_async(
+                generate_next_questions_async,
+                question,
+                answer
+            )
+            
             # --- Lưu tin nhắn trả lời của Bot ---
             bot_msg = Message(
                 conversation_id=conversation.conversation_id,
@@ -198,30 +208,27 @@ class SecureMedicalChat(Resource):
             db.session.add(bot_msg)
             db.session.commit()
             
-            # 6. Gợi ý câu hỏi tiếp theo (Next Questions)
-            # Agent sẽ đoán xem user có thể muốn hỏi gì tiếp
-            suggestions = []
-            try:
-                suggestions = generate_next_questions(
-                    user_question=question,
-                    bot_answer=answer
-                )
-            except Exception as e:
-                logger.warning(f"Failed to generate suggestions: {e}")
-                # Không block response nếu suggestion fail
-            
-            # Trả về kết quả cho Client
-            return {
+            # Dựng response trong lúc suggestion vẫn đang chạy; chỉ chờ ở bước cuối
+            result = {
                 'question': question,
                 'answer': answer,
-                'suggestions': suggestions,
+                'suggestions': [],
                 'conversation_id': conversation.conversation_id,
                 'user_info': {'user_id': user_id, 'name': user_name},
                 'cache_info': {
                     'search_cached': search_from_cache,
                     'response_cached': response_from_cache
                 }
-            }, 200
+            }
+            
+            try:
+                result['suggestions'] = suggestion_future.result(timeout=Config.SUGGESTION_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Failed to generate suggestions: {e}")
+                # Không block response nếu suggestion fail
+            
+            # Trả về kết quả cho Client
+            return result, 200
             
         except Exception as e:
             logger.error(f"Error in secure chat: {str(e)}")
@@ -290,6 +297,8 @@ class HealthCheck(Resource):
                     'connected': True,
                     'records': count
                 },
+                # False khi BM25 còn đang build ở thread nền -> search tạm chỉ dùng vector
+                'bm25_ready': current_app.config.get('BM25_READY', False),
                 'models': {
                     'embedding': 'PhoBERT (vinai/phobert-base)',
                     'generation': 'GPT-3.5-turbo'
@@ -7,6 +7,7 @@ Giúp ứng dụng Mobile/Web có thể gửi file âm thanh và nhận về vă
 Endpoints:
 1. POST /api/speech/transcribe - Chỉ chuyển đổi Audio -> Text (dùng cho tính năng nhập liệu bằng giọng nói).
 2. POST /api/speech/chat - Chuyển đổi Audio -> Text, sau đó gửi Text vào RAG Pipeline để hỏi Chatbot.
+3. POST /api/speech/unload - (Admin) Giải phóng model faster-whisper khỏi RAM/VRAM.
 """
 
 from flask import request
@@ -15,13 +16,14 @@ import logging
 from werkzeug.datastructures import FileStorage
 
 from src.services.speech_service import speech_service  # Service xử lý file audio
+from src.services.whisper_manager import WhisperManager  # Cache model faster-whisper (local)
 from src.services.medical_chatbot_service import (
     extract_user_intent_and_features,
     combined_search_with_filters,
     generate_natural_response
 )
 from src.services.cached_chatbot_service import cached_search, cached_response  # Hỗ trợ cache để tăng tốc
-from src.utils.auth_middleware import token_required  # Bảo mật API
+from src.utils.auth_middleware import token_required, admin_required  # Bảo mật API
 from src.models.base import db
 from src.models.conversation import Conversation
 from src.models.message import Message
@@ -295,3 +297,26 @@ class SpeechHealthCheck(Resource):
                 'status': 'unhealthy',
                 'error': str(e)
             }, 500
+
+
+@speech_ns.route('/unload')
+class SpeechUnloadModel(Resource):
+    """
+    Endpoint (Admin): giải phóng model faster-whisper giữa các đợt batch job.
+    Request transcribe tiếp theo sẽ tự load lại model.
+    """
+    
+    @speech_ns.doc(security='Bearer')
+    @speech_ns.response(200, 'Success')
+    @speech_ns.response(403, 'Forbidden - Không phải Admin')
+    @admin_required
+    def post(self, current_user):
+        """Unload model Whisper local (chỉ Admin)."""
+        unloaded = WhisperManager.unload()
+        logger.info(f"Whisper model unload requested by {current_user['email']} (unloaded={unloaded})")
+        
+        return {
+            'success': True,
+            'unloaded': unloaded,
+            'message': 'Model unloaded' if unloaded else 'No model loaded'
+        }, 200
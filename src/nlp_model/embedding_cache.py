@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from typing import List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join("instance", "embedding_cache.db")
+
+
+class CachedEmbeddingFunction:
+    """
+    Persistent embedding cache in front of an embedding function.
+
+    Embeddings are stored in SQLite as float32 bytes, keyed by
+    "<model>:<sha256 of text>", so re-runs only embed new texts and a model
+    change never returns stale vectors. Shared by the dedup scripts and the
+    evaluation; safe to call from several threads.
+    """
+
+    def __init__(self, embedding_function, cache_path: str = DEFAULT_CACHE_PATH, key_prefix: str = None):
+        """
+        Initialize the cache.
+
+        Args:
+            embedding_function: Function mapping a list of texts to embeddings
+            cache_path: SQLite file holding the cache (None: in memory only, for this process)
+            key_prefix: Model/version tag in every key (default: model_name:max_length of the function)
+        """
+        self.embedding_function = embedding_function
+
+        if key_prefix is None:
+            key_prefix = "{}:{}".format(
+                getattr(embedding_function, "model_name", type(embedding_function).__name__),
+                getattr(embedding_function, "max_length", "")
+            )
+        self.key_prefix = key_prefix
+
+        if cache_path is None:
+            cache_path = ":memory:"
+        else:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        # Một connection dùng chung cho mọi thread, truy cập tuần tự qua lock
+        self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def _key(self, text: str) -> str:
+        return f"{self.key_prefix}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _lookup(self, keys: List[str]) -> dict:
+        found = {}
+        # SQLite giới hạn số tham số mỗi câu lệnh
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            found.update(rows)
+        return found
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts, computing only the ones not in the cache.
+
+        Args:
+            texts: List of text documents
+
+        Returns:
+            float32 array of shape (len(texts), dim)
+        """
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            found = self._lookup(list(set(keys)))
+
+        # Mỗi text chưa có trong cache chỉ embed một lần (kể cả khi lặp lại)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        if missing:
+            vectors = np.asarray(self.embedding_function(list(missing.values())), dtype=np.float32)
+            new_rows = [(key, vector.tobytes()) for key, vector in zip(missing, vectors)]
+            with self._lock, self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", new_rows)
+            found.update(new_rows)
+
+        logger.debug(f"Embedding cache: embedded {len(missing)} of {len(texts)} texts")
+
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([np.frombuffer(found[key], dtype=np.float32) for key in keys])
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
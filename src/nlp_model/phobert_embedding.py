@@ -62,27 +62,7 @@ class PhoBERTEmbeddingFunction(EmbeddingFunction):
                 logger.warning("Empty input received")
                 return []
             
-            # Tokenize sentences with proper padding and truncation
-            encoded_input = self.tokenizer(
-                input, 
-                padding=True, 
-                truncation=True, 
-                return_tensors='pt', 
-                max_length=self.max_length
-            )
-            
-            # Move to device
-            encoded_input = {k: v.to(self.device) for k, v in encoded_input.items()}
-
-            # Compute token embeddings
-            with torch.no_grad():
-                model_output = self.model(**encoded_input)
-
-            # Perform mean pooling
-            embeddings = self._mean_pooling(
-                model_output.last_hidden_state,
-                encoded_input['attention_mask']
-            )
+            embeddings = self._encode(input)
             
             # Convert to list and return
             return embeddings.cpu().numpy().tolist()
@@ -91,6 +71,42 @@ class PhoBERTEmbeddingFunction(EmbeddingFunction):
             logger.error(f"Error generating embeddings: {str(e)}")
             raise
     
+    def _encode(self, texts: List[str], half: bool = False) -> torch.Tensor:
+        """
+        Tokenize, run PhoBERT and mean-pool one batch.
+        
+        Args:
+            texts: Batch of text documents
+            half: Run under fp16 autocast (CUDA only)
+            
+        Returns:
+            Sentence-level embeddings (float32)
+        """
+        # Tokenize sentences with proper padding and truncation
+        encoded_input = self.tokenizer(
+            texts, 
+            padding=True, 
+            truncation=True, 
+            return_tensors='pt', 
+            max_length=self.max_length
+        )
+        
+        # Move to device
+        encoded_input = {k: v.to(self.device) for k, v in encoded_input.items()}
+
+        # Compute token embeddings
+        use_autocast = half and self.device.startswith("cuda")
+        with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16, enabled=use_autocast):
+            model_output = self.model(**encoded_input)
+
+            # Perform mean pooling
+            embeddings = self._mean_pooling(
+                model_output.last_hidden_state.float(),
+                encoded_input['attention_mask']
+            )
+        
+        return embeddings
+    
     def _mean_pooling(self, token_embeddings: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
         """
         Perform mean pooling on token embeddings.
@@ -135,4 +151,47 @@ class PhoBERTEmbeddingFunction(EmbeddingFunction):
                 logger.info(f"Processed {i + len(batch)}/{len(texts)} documents")
         
         return all_embeddings
-
+    
+    def embed_bucketed(self, texts: List[str], token_budget: int = 8192) -> Embeddings:
+        """
+        Generate embeddings with length-bucketed batches (for bulk indexing).
+        
+        Texts are sorted by token length and grouped so that each padded batch
+        holds at most token_budget tokens, which avoids padding short texts to
+        the longest one. Runs in fp16 on CUDA. Results keep the input order.
+        
+        Args:
+            texts: List of text documents
+            token_budget: Maximum padded tokens (batch size x longest text) per batch
+            
+        Returns:
+            List of embeddings
+        """
+        if not texts:
+            return []
+        
+        texts = list(texts)
+        lengths = self.tokenizer(
+            texts,
+            truncation=True,
+            max_length=self.max_length,
+            return_length=True
+        )['length']
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+        
+        embeddings = [None] * len(texts)
+        
+        def flush(batch):
+            for idx, embedding in zip(batch, self._encode([texts[i] for i in batch], half=True).cpu().numpy().tolist()):
+                embeddings[idx] = embedding
+        
+        batch = []
+        for idx in order:
+            # Đã sort tăng dần: text hiện tại là dài nhất trong batch
+            if batch and (len(batch) + 1) * lengths[idx] > token_budget:
+                flush(batch)
+                batch = []
+            batch.append(idx)
+        flush(batch)
+        
+        return embeddings
@@ -179,7 +179,10 @@ def process_medical_data():
         collection = chroma_client.create_collection(
             name="medical_collection",
             embedding_function=phobert_ef,
-            metadata={"description": "Medical knowledge base with diseases and Q&A"}
+            metadata={
+                "description": "Medical knowledge base with diseases and Q&A",
+                "hnsw:space": "cosine"
+            }
         )
         
         # Add all documents to collection
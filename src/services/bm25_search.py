@@ -6,13 +6,49 @@ to complement the vector-based semantic search.
 """
 
 import logging
+import os
+import pickle
+import tempfile
 from typing import List, Dict, Any
+import numpy as np
 from rank_bm25 import BM25Okapi
 import re
 
+try:
+    import numba
+    HAVE_NUMBA = True
+except ImportError:
+    numba = None
+    HAVE_NUMBA = False
+
 logger = logging.getLogger(__name__)
 
 
+def _bm25_scores_python(query_terms, query_idf, term_ptr, post_docs, post_freqs,
+                        doc_len, avgdl, k1, b, out):
+    """Accumulate BM25 scores over the postings of each query term (NumPy fallback)"""
+    for j in range(len(query_terms)):
+        start, end = term_ptr[query_terms[j]], term_ptr[query_terms[j] + 1]
+        docs = post_docs[start:end]
+        freqs = post_freqs[start:end]
+        # Postings of one term hold each document once, so fancy-index += is safe
+        out[docs] += query_idf[j] * (freqs * (k1 + 1) / (freqs + k1 * (1 - b + b * doc_len[docs] / avgdl)))
+
+
+if HAVE_NUMBA:
+    @numba.njit(cache=True)
+    def _bm25_scores(query_terms, query_idf, term_ptr, post_docs, post_freqs,
+                     doc_len, avgdl, k1, b, out):
+        for j in range(query_terms.shape[0]):
+            term = query_terms[j]
+            for p in range(term_ptr[term], term_ptr[term + 1]):
+                doc = post_docs[p]
+                freq = post_freqs[p]
+                out[doc] += query_idf[j] * (freq * (k1 + 1) / (freq + k1 * (1 - b + b * doc_len[doc] / avgdl)))
+else:
+    _bm25_scores = _bm25_scores_python
+
+
 class BM25SearchEngine:
     """BM25-based keyword search engine for medical documents"""
     
@@ -21,6 +57,9 @@ class BM25SearchEngine:
         self.documents = []
         self.document_ids = []
         self.metadatas = []
+        self._doc_counts = {}  # word -> number of documents containing it (for incremental idf)
+        self._total_len = 0
+        self._postings = None  # Immutable scoring snapshot (CSR inverted index), swapped in after every change
         
     def tokenize(self, text: str) -> List[str]:
         """
@@ -75,8 +114,216 @@ class BM25SearchEngine:
         # Create BM25 index
         self.bm25 = BM25Okapi(tokenized_docs)
         
+        self._doc_counts = {}
+        for frequencies in self.bm25.doc_freqs:
+            for word in frequencies:
+                self._doc_counts[word] = self._doc_counts.get(word, 0) + 1
+        self._total_len = sum(self.bm25.doc_len)
+        self._postings = self._build_postings()
+        
         logger.info(f"✓ BM25 index created with {len(documents)} documents")
     
+    def add_documents(self, documents: List[str], document_ids: List[str],
+                      metadatas: List[Dict]) -> None:
+        """
+        Add documents to an existing index without re-tokenizing the corpus.
+        
+        Only the new documents are tokenized; term frequencies, document lengths,
+        avgdl and idf are updated in place. Scores are identical to a full rebuild.
+        
+        Args:
+            documents: List of new document texts
+            document_ids: List of new document IDs
+            metadatas: List of new document metadata
+        """
+        if self.bm25 is None:
+            self.index_documents(documents, document_ids, metadatas)
+            return
+        
+        self.documents = self.documents + list(documents)
+        self.document_ids = self.document_ids + list(document_ids)
+        self.metadatas = self.metadatas + list(metadatas)
+        
+        for doc in documents:
+            tokens = self.tokenize(doc)
+            frequencies = {}
+            for word in tokens:
+                frequencies[word] = frequencies.get(word, 0) + 1
+            for word in frequencies:
+                self._doc_counts[word] = self._doc_counts.get(word, 0) + 1
+            
+            self.bm25.doc_freqs.append(frequencies)
+            self.bm25.doc_len.append(len(tokens))
+            self._total_len += len(tokens)
+        
+        self.bm25.corpus_size = len(self.bm25.doc_len)
+        self.bm25.avgdl = self._total_len / self.bm25.corpus_size
+        # idf depends on corpus size for every term: O(vocabulary), not O(corpus tokens)
+        self.bm25.idf = {}
+        self.bm25._calc_idf(self._doc_counts)
+        self._postings = self._build_postings()
+        
+        logger.info(f"✓ Added {len(documents)} documents to BM25 index ({self.bm25.corpus_size} total)")
+    
+    def remove_documents(self, document_ids) -> None:
+        """
+        Remove documents from the index without re-tokenizing the rest.
+        
+        Uses the stored per-document term frequencies; document frequencies,
+        avgdl and idf are updated in place.
+        
+        Args:
+            document_ids: IDs of documents to remove
+        """
+        remove = set(document_ids)
+        if self.bm25 is None or not remove:
+            return
+        
+        keep = [i for i, doc_id in enumerate(self.document_ids) if doc_id not in remove]
+        if not keep:
+            self.__init__()
+            return
+        
+        for i, doc_id in enumerate(self.document_ids):
+            if doc_id in remove:
+                for word in self.bm25.doc_freqs[i]:
+                    self._doc_counts[word] -= 1
+                    if not self._doc_counts[word]:
+                        del self._doc_counts[word]
+                self._total_len -= self.bm25.doc_len[i]
+        
+        removed = len(self.document_ids) - len(keep)
+        self.documents = [self.documents[i] for i in keep]
+        self.document_ids = [self.document_ids[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self.bm25.doc_freqs = [self.bm25.doc_freqs[i] for i in keep]
+        self.bm25.doc_len = [self.bm25.doc_len[i] for i in keep]
+        
+        self.bm25.corpus_size = len(keep)
+        self.bm25.avgdl = self._total_len / self.bm25.corpus_size
+        self.bm25.idf = {}
+        self.bm25._calc_idf(self._doc_counts)
+        self._postings = self._build_postings()
+        
+        logger.info(f"✓ Removed {removed} documents from BM25 index ({self.bm25.corpus_size} total)")
+    
+    def save(self, path: str) -> None:
+        """Persist the index so a restart does not need to re-tokenize the corpus"""
+        # Unique temp file per writer: workers and loader scripts may save concurrently
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.bm25_', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(
+                    {
+                        'bm25': self.bm25,
+                        'documents': self.documents,
+                        'document_ids': self.document_ids,
+                        'metadatas': self.metadatas,
+                        'doc_counts': self._doc_counts,
+                        'total_len': self._total_len
+                    },
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL
+                )
+            os.replace(tmp_path, path)  # Atomic: readers never see a partial file
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    
+    def load(self, path: str) -> bool:
+        """
+        Load an index written by save().
+        
+        Returns:
+            True if loaded, False if the file is missing or unreadable
+        """
+        if not os.path.exists(path):
+            return False
+        
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load BM25 index from {path}: {e}")
+            return False
+        
+        self.bm25 = state['bm25']
+        self.documents = state['documents']
+        self.document_ids = state['document_ids']
+        self.metadatas = state['metadatas']
+        self._doc_counts = state['doc_counts']
+        self._total_len = state['total_len']
+        self._postings = self._build_postings()
+        
+        logger.info(f"✓ BM25 index loaded from disk with {len(self.document_ids)} documents")
+        return True
+    
+    def _build_postings(self) -> Dict[str, Any]:
+        """
+        Build an immutable scoring snapshot around a term -> (documents, frequencies)
+        inverted index in CSR form.
+        
+        Postings of term t are post_docs/post_freqs[term_ptr[t]:term_ptr[t + 1]],
+        so a query only touches documents that contain its terms. The snapshot also
+        holds idf, avgdl and the document lists, and is published with a single
+        assignment: a concurrent search sees either the old or the new index, never
+        a mix of both.
+        """
+        vocabulary = {word: i for i, word in enumerate(self._doc_counts)}
+        
+        postings = [[] for _ in vocabulary]
+        for doc, frequencies in enumerate(self.bm25.doc_freqs):
+            for word, freq in frequencies.items():
+                postings[vocabulary[word]].append((doc, freq))
+        
+        term_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        term_ptr[1:] = np.cumsum([len(p) for p in postings])
+        flat = np.array([entry for p in postings for entry in p], dtype=np.int64).reshape(-1, 2)
+        
+        return {
+            'vocabulary': vocabulary,
+            'idf': np.array([self.bm25.idf.get(word) or 0 for word in vocabulary], dtype=np.float64),
+            'term_ptr': term_ptr,
+            'post_docs': flat[:, 0].copy(),
+            'post_freqs': flat[:, 1].astype(np.float64),
+            'doc_len': np.asarray(self.bm25.doc_len, dtype=np.float64),
+            'avgdl': float(self.bm25.avgdl),
+            'k1': float(self.bm25.k1),
+            'b': float(self.bm25.b),
+            'documents': self.documents,
+            'document_ids': self.document_ids,
+            'metadatas': self.metadatas
+        }
+    
+    @staticmethod
+    def _snapshot_scores(snapshot: Dict[str, Any], tokenized_query: List[str]) -> np.ndarray:
+        """BM25 score of every document in `snapshot` for a tokenized query"""
+        vocabulary = snapshot['vocabulary']
+        
+        # Terms outside the vocabulary contribute 0, as in BM25Okapi
+        query_terms = np.array([vocabulary[q] for q in tokenized_query if q in vocabulary], dtype=np.int64)
+        
+        scores = np.zeros(len(snapshot['doc_len']))
+        _bm25_scores(
+            query_terms, snapshot['idf'][query_terms],
+            snapshot['term_ptr'], snapshot['post_docs'], snapshot['post_freqs'],
+            snapshot['doc_len'], snapshot['avgdl'], snapshot['k1'], snapshot['b'],
+            scores
+        )
+        return scores
+    
+    def get_scores(self, tokenized_query: List[str]) -> np.ndarray:
+        """
+        BM25 score of every document for a tokenized query.
+        
+        Same values as BM25Okapi.get_scores, but only the postings of the query
+        terms are visited (Numba kernel when numba is installed).
+        """
+        snapshot = self._postings
+        if snapshot is None:
+            return np.zeros(0)
+        return self._snapshot_scores(snapshot, tokenized_query)
+    
     def search(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
         """
         Search documents using BM25.
@@ -88,7 +335,9 @@ class BM25SearchEngine:
         Returns:
             List of search results with scores
         """
-        if self.bm25 is None:
+        # Read the snapshot once: scores and documents must come from the same index
+        snapshot = self._postings
+        if snapshot is None:
             logger.warning("BM25 index not initialized")
             return []
         
@@ -100,18 +349,18 @@ class BM25SearchEngine:
             return []
         
         # Get BM25 scores
-        scores = self.bm25.get_scores(tokenized_query)
+        scores = self._snapshot_scores(snapshot, tokenized_query)
         
-        # Get top k results
-        top_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_k]
+        # Get top k results (stable: ties keep document order)
+        top_indices = np.argsort(-scores, kind='stable')[:top_k]
         
         results = []
         for idx in top_indices:
             if scores[idx] > 0:  # Only include results with positive scores
                 results.append({
-                    'id': self.document_ids[idx],
-                    'document': self.documents[idx],
-                    'metadata': self.metadatas[idx],
+                    'id': snapshot['document_ids'][idx],
+                    'document': snapshot['documents'][idx],
+                    'metadata': snapshot['metadatas'][idx],
                     'bm25_score': float(scores[idx]),
                     'rank': len(results) + 1
                 })
@@ -5,7 +5,9 @@ This module provides cached versions of search and response generation
 to reduce latency and API costs.
 """
 
+import hashlib
 import logging
+from concurrent.futures import Future
 from typing import Dict, List, Optional, Any
 from src.services.cache_manager import get_cache_manager, generate_cache_key
 from src.config.config import Config
@@ -119,6 +121,49 @@ def cached_response(
     return result
 
 
+def _suggestion_cache_key(question: str, answer: str) -> str:
+    qa_hash = hashlib.sha256(f"{question}\x00{answer}".encode()).hexdigest()
+    return f"suggestion:{qa_hash}"
+
+
+def cached_suggestions_async(submit_func, question: str, answer: str) -> Future:
+    """
+    Cached wrapper for next-question suggestions (non-blocking)
+    
+    Key is a hash of (question, answer) so identical Q&A pairs skip the LLM call.
+    
+    Args:
+        submit_func: Function (question, answer) -> Future, e.g. generate_next_questions_async
+        question: User's question
+        answer: Bot's answer
+        
+    Returns:
+        Future resolving to the list of suggestions (already done on a cache hit)
+    """
+    if not CACHE_ENABLED:
+        return submit_func(question, answer)
+    
+    cache_key = _suggestion_cache_key(question, answer)
+    
+    cached_result = cache.get(cache_key)
+    if cached_result is not None:
+        logger.info(f"✓ Cache HIT for suggestions: {question[:50]}...")
+        future = Future()
+        future.set_result(list(cached_result))
+        return future
+    
+    logger.info(f"✗ Cache MISS for suggestions: {question[:50]}...")
+    future = submit_func(question, answer)
+    
+    def _store(done: Future):
+        if not done.cancelled() and done.exception() is None and done.result():
+            cache.set(cache_key, list(done.result()), ttl=Config.CACHE_TTL_SUGGESTIONS)
+            logger.debug(f"Cached suggestions: {cache_key}")
+    
+    future.add_done_callback(_store)
+    return future
+
+
 def get_cache_stats() -> Dict[str, Any]:
     """
     Get cache statistics
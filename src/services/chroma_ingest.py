@@ -0,0 +1,263 @@
+"""
+Batch ingestion helper for the medical ChromaDB collection
+
+Shared by the dataset loaders in scripts/data. Embeddings for upcoming batches
+are computed on a small thread pool (PhoBERT/torch releases the GIL) while the
+current batch is written. Writes stay on the calling thread: the
+PersistentClient (SQLite) backend is not safe for concurrent adds.
+
+Batch preparation (reading rows, building documents/metadata) runs in a
+producer thread feeding a bounded queue, so it overlaps the embedding and the
+writes instead of stalling them.
+
+Batch size: ChromaDB's performance guidance puts the sweet spot at 50-250
+documents per add(); per-batch overhead dominates below that, and very large
+batches are rejected above the client's max batch size.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, List, Tuple, Dict
+
+logger = logging.getLogger(__name__)
+
+Batch = Tuple[List[str], List[Dict], List[str]]
+
+DEFAULT_BATCH_SIZE = 250
+
+# Log tiến độ mỗi N batch (không log từng batch trong vòng lặp ingest)
+LOG_EVERY_N_BATCHES = 10
+
+# Chỉ dùng cho load một lần: synchronous=OFF có thể làm hỏng DB nếu crash giữa chừng
+# Không đặt locking_mode=EXCLUSIVE: connection lấy được qua pool có thể không phải
+# connection Chroma dùng để ghi, khi đó lock exclusive sẽ chặn chính các lệnh add().
+BULK_LOAD_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'OFF',
+    'temp_store': 'MEMORY',
+    'cache_size': '-262144'  # 256 MB
+}
+
+
+def _sqlite_connection(client):
+    """
+    Return the SQLite connection behind a PersistentClient, or None if not reachable.
+
+    Best effort: relies on Chroma's private `_server._sysdb._conn_pool`, which may
+    change between chromadb versions. The pool hands out one connection per thread,
+    so connection-scoped PRAGMAs (synchronous, temp_store, cache_size) only apply
+    to writes made from the calling thread; journal_mode=WAL is persisted in the file.
+    """
+    server = getattr(client, '_server', client)
+    pool = getattr(getattr(server, '_sysdb', None), '_conn_pool', None)
+    if pool is None:
+        return None
+    return pool.connect()
+
+
+def _tune_chroma_sqlite(client, pragmas: Dict[str, str]) -> Dict[str, str]:
+    """
+    Set PRAGMAs on Chroma's SQLite connection.
+
+    Returns:
+        Previous values of the PRAGMAs that were changed (empty if unsupported)
+    """
+    conn = _sqlite_connection(client)
+    if conn is None:
+        return {}
+
+    previous = {}
+    for name, value in pragmas.items():
+        previous[name] = str(conn.execute(f"PRAGMA {name}").fetchone()[0])
+        conn.execute(f"PRAGMA {name}={value}")
+    return previous
+
+
+@contextmanager
+def bulk_load_sqlite(client):
+    """
+    Relax SQLite durability for the duration of a bulk load.
+
+    Only active when BULK_LOAD_UNSAFE=1; the previous PRAGMA values are
+    restored afterwards. No-op for clients without a Python SQLite backend.
+    """
+    if os.getenv('BULK_LOAD_UNSAFE') != '1':
+        yield
+        return
+
+    try:
+        previous = _tune_chroma_sqlite(client, BULK_LOAD_PRAGMAS)
+    except Exception as e:
+        logger.warning(f"Could not tune Chroma SQLite PRAGMAs: {e}")
+        previous = {}
+    if previous:
+        logger.info("Chroma SQLite tuned for bulk load (synchronous=OFF)")
+
+    try:
+        yield
+    finally:
+        if previous:
+            _tune_chroma_sqlite(client, previous)
+            logger.info("Chroma SQLite PRAGMAs restored")
+
+
+def clamp_batch_size(client, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Cap batch_size at the client's max batch size (if it exposes one)"""
+    get_max_batch_size = getattr(client, 'get_max_batch_size', None)
+    if get_max_batch_size is not None:
+        max_batch_size = get_max_batch_size()
+    else:
+        max_batch_size = getattr(client, 'max_batch_size', batch_size)
+    return max(1, min(batch_size, max_batch_size))
+
+
+# Số batch đã chuẩn bị được giữ trong queue (giới hạn RAM)
+PREP_QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+def produce_in_background(batches: Iterable[Batch], maxsize: int = PREP_QUEUE_SIZE) -> Iterator[Batch]:
+    """
+    Iterate `batches` in a producer thread through a bounded queue.
+
+    The consumer gets the same items in the same order; an exception raised
+    by the producer is re-raised in the consumer. If the consumer stops early
+    the producer thread exits at its next put().
+
+    Args:
+        batches: Iterable of batches; may be a lazy generator doing the prep work
+        maxsize: Maximum number of prepared batches waiting in the queue
+
+    Yields:
+        Items of `batches`
+    """
+    q = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+        except BaseException as e:
+            put((_DONE, e))
+            return
+        put((_DONE, None))
+
+    thread = threading.Thread(target=producer, name='prep', daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = q.get()
+            if isinstance(item, tuple) and len(item) == 2 and item[0] is _DONE:
+                if item[1] is not None:
+                    raise item[1]
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def add_batches(collection, batches: Iterable[Batch],
+                embedding_function: Callable[[List[str]], List],
+                embed_workers: int = 2) -> Iterator[List[str]]:
+    """
+    Add (documents, metadatas, ids) batches to a collection, embedding ahead of the writer.
+
+    Args:
+        collection: ChromaDB collection
+        batches: Iterable of (documents, metadatas, ids); may be a lazy generator
+        embedding_function: Function mapping a list of texts to embeddings
+        embed_workers: Number of batches embedded ahead of the writer
+
+    Pipeline: prep (producer thread, queue of PREP_QUEUE_SIZE) -> embed
+    (embed_workers threads) -> add (calling thread).
+
+    Yields:
+        IDs of each batch after it has been written (for progress logging)
+    """
+    batches = produce_in_background(batches)
+
+    with ThreadPoolExecutor(max_workers=embed_workers, thread_name_prefix='embed') as executor:
+        # Sliding window: tối đa embed_workers batch được embed trước (giới hạn RAM)
+        pending = deque()
+
+        def prefetch():
+            batch = next(batches, None)
+            if batch is not None:
+                pending.append((batch, executor.submit(embedding_function, batch[0])))
+
+        for _ in range(embed_workers):
+            prefetch()
+
+        while pending:
+            (documents, metadatas, ids), embeddings_future = pending.popleft()
+            prefetch()
+
+            collection.add(
+                embeddings=embeddings_future.result(),
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids
+            )
+
+            yield ids
+
+
+async def add_batches_async(collection, batches: Iterable[Batch],
+                            embedding_function: Callable[[List[str]], List],
+                            concurrency: int = 4) -> int:
+    """
+    Add batches to an AsyncHttpClient collection with several adds in flight.
+
+    A Chroma server accepts concurrent writers, unlike the in-process
+    PersistentClient. Embeddings are computed in worker threads; at most
+    `concurrency` batches are held in memory at once.
+
+    Args:
+        collection: Async ChromaDB collection (from chromadb.AsyncHttpClient)
+        batches: Iterable of (documents, metadatas, ids); may be a lazy generator
+        embedding_function: Function mapping a list of texts to embeddings
+        concurrency: Maximum number of batches being embedded/written at once
+
+    Returns:
+        Number of batches written
+    """
+    async def add(documents, metadatas, ids):
+        embeddings = await asyncio.to_thread(embedding_function, documents)
+        await collection.add(embeddings=embeddings, documents=documents, metadatas=metadatas, ids=ids)
+
+    pending = set()
+    written = 0
+
+    for documents, metadatas, ids in batches:
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()  # Lỗi của batch được raise ở đây
+            written += len(done)
+        pending.add(asyncio.create_task(add(documents, metadatas, ids)))
+
+    if pending:
+        await asyncio.gather(*pending)
+        written += len(pending)
+
+    return written
@@ -11,6 +11,8 @@ import numpy as np  # Import numpy để tính toán vector
 import sys
 import logging
 import re
+import glob
+import functools
 from collections import defaultdict  # Import defaultdict để dễ dàng gom nhóm kết quả tìm kiếm
 
 # Cấu hình logging để theo dõi hoạt động hệ thống
@@ -50,7 +52,8 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # Khởi tạo ChromaDB Client (Lưu trữ Vector)
 workspace_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-chroma_client = chromadb.PersistentClient(path=os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'chroma_db'))
+CHROMA_DB_PATH = os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'chroma_db')
+chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
 
 # Khởi tạo hàm Embedding PhoBERT (Dùng cho tiếng Việt)
 phobert_ef = PhoBERTEmbeddingFunction()
@@ -65,14 +68,28 @@ MEDICAL_KEYWORDS = {
 
 # Ngưỡng tin cậy (Confidence Threshold)
 # Nếu điểm số thấp hơn ngưỡng này thì coi như không liên quan
+# Lưu ý thang điểm: ngưỡng này (và mức high > 0.7 / medium > 0.5 trong combined_search_with_filters)
+# được chọn khi vector_score = 1 / (1 + d/10) trên collection L2. Với collection cosine,
+# vector_score = cos_sim thật (1 - d) nên cùng một ngưỡng có ý nghĩa khác: kết quả chỉ có
+# điểm vector (BM25 = 0) cần cos_sim >= 0.10 / HYBRID_VECTOR_WEIGHT ≈ 0.33 mới được giữ.
+# Chưa hiệu chỉnh lại trên dữ liệu thật — chạy evaluation/evaluate_model.py trước khi đổi.
 CONFIDENCE_THRESHOLD = 0.10  # Đã hạ thấp xuống 0.10 để lấy được nhiều kết quả hơn
 
+COLLECTION_NAME = "medical_collection"
+
+# Collection mới dùng cosine distance (distance = 1 - cos_sim).
+# Lưu ý: hnsw:space chỉ áp dụng lúc tạo collection; collection cũ vẫn là L2.
+COLLECTION_METADATA = {"hnsw:space": "cosine"}
+
 # Trọng số cho Hybrid Search (Kết hợp BM25 và Vector)
 # 70% điểm số dựa trên từ khóa (BM25) - Quan trọng vì thuật ngữ y tế cần chính xác
 # 30% điểm số dựa trên ngữ nghĩa (Vector) - Giúp tìm các từ đồng nghĩa
 HYBRID_BM25_WEIGHT = 0.7
 HYBRID_VECTOR_WEIGHT = 0.3
 
+# Model sinh câu trả lời (generate_natural_response)
+GENERATION_MODEL = "gpt-4o"
+
 # ═══════════════════════════════════════════════════════════════
 # PHẦN 1: TỐI ƯU HÓA RAG (Query Expansion & Reranking)
 # ═══════════════════════════════════════════════════════════════
@@ -294,36 +311,125 @@ Hãy tóm tắt:"""
 # CÁC HÀM HỖ TRỢ VECTOR DB & TÍNH TOÁN ĐIỂM SỐ
 # ═══════════════════════════════════════════════════════════════
 
+@functools.lru_cache(maxsize=1)
 def get_or_create_collection():
-    """Lấy hoặc tạo Collection trong ChromaDB"""
+    """
+    Lấy hoặc tạo Collection trong ChromaDB.
+    Handle được cache trong process (gọi lại là O(1)); dùng
+    get_or_create_collection.cache_clear() nếu collection bị xóa/tạo lại.
+    """
     try:
         collection = chroma_client.get_collection(
-            name="medical_collection",
+            name=COLLECTION_NAME,
             embedding_function=phobert_ef
         )
         return collection
     except Exception as e:
         print(f"Collection not found, creating new one: {str(e)}")
         collection = chroma_client.create_collection(
-            name="medical_collection",
-            embedding_function=phobert_ef
+            name=COLLECTION_NAME,
+            embedding_function=phobert_ef,
+            metadata=COLLECTION_METADATA
         )
         return collection
 
-def initialize_bm25_index():
+def get_distance_space(collection) -> str:
+    """Trả về không gian khoảng cách của collection ('cosine', 'l2' hoặc 'ip')"""
+    return (collection.metadata or {}).get("hnsw:space", "l2")
+
+# File lưu chỉ mục BM25 (tránh tokenize lại toàn bộ corpus mỗi lần khởi động)
+BM25_INDEX_PATH = os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'bm25_index.pkl')
+
+def _add_to_bm25_index(ids, metadatas):
+    """Thêm các document mới vào BM25 index hiện có (O(số doc mới))"""
+    BM25_ENGINE.add_documents(
+        documents=[create_searchable_text(metadata) for metadata in metadatas],
+        document_ids=list(ids),
+        metadatas=list(metadatas)
+    )
+
+def _bm25_index_is_fresh(collection) -> bool:
+    """
+    Index trên disk được ghi sau lần ghi cuối vào ChromaDB (chroma.sqlite3 và file WAL)
+    và có cùng số document -> dùng luôn, không cần liệt kê ids của cả collection.
+    """
+    try:
+        index_mtime = os.path.getmtime(BM25_INDEX_PATH)
+        chroma_mtime = max(os.path.getmtime(path) for path in glob.glob(os.path.join(CHROMA_DB_PATH, 'chroma.sqlite3*')))
+    except (OSError, ValueError):  # Thiếu file index hoặc file ChromaDB
+        return False
+    
+    return index_mtime > chroma_mtime and len(BM25_ENGINE.document_ids) == collection.count()
+
+def _save_bm25_index():
+    try:
+        BM25_ENGINE.save(BM25_INDEX_PATH)
+    except Exception as e:
+        logger.warning(f"Could not save BM25 index: {e}")
+
+def initialize_bm25_index(new_docs=None):
     """
     Khởi tạo chỉ mục BM25 từ toàn bộ dữ liệu trong ChromaDB.
     Hàm này cần chạy 1 lần khi server khởi động.
+    
+    Index được lưu ra BM25_INDEX_PATH. Lần sau chỉ load từ disk; nếu file index
+    mới hơn ChromaDB thì dùng luôn, ngược lại thêm document mới / bỏ document đã
+    bị xóa khỏi ChromaDB (incremental, không tokenize lại phần còn lại); chỉ build
+    lại toàn bộ khi chưa có file index.
+    
+    Args:
+        new_docs: dict {'ids': [...], 'metadatas': [...]} - các document vừa thêm.
+                  Nếu index (trong process hoặc trên disk) chỉ thiếu các document
+                  này, chỉ thêm chúng mà không đồng bộ lại với ChromaDB.
     """
     global BM25_ENABLED
     
     try:
-        logger.info("Initializing BM25 index...")
         collection = get_or_create_collection()
         
-        # Lấy toàn bộ dữ liệu (documents và metadata)
+        # 1. Index đã có (trong process hoặc trên disk) và chỉ thiếu new_docs: chỉ thêm phần mới,
+        #    không cần liệt kê ids của cả collection (collection.count() là O(1))
+        if new_docs is not None and (BM25_ENGINE.is_ready() or BM25_ENGINE.load(BM25_INDEX_PATH)):
+            if len(BM25_ENGINE.document_ids) + len(new_docs['ids']) == collection.count():
+                _add_to_bm25_index(new_docs['ids'], new_docs['metadatas'])
+                _save_bm25_index()
+                BM25_ENABLED = True
+                return True
+        
+        # 2. Load index từ disk và đồng bộ với ChromaDB (không tokenize lại các document đã có)
+        if BM25_ENGINE.is_ready() or BM25_ENGINE.load(BM25_INDEX_PATH):
+            if BM25_ENGINE.is_ready() and _bm25_index_is_fresh(collection):
+                BM25_ENABLED = True
+                logger.info(f"✓ BM25 index loaded, newer than ChromaDB ({len(BM25_ENGINE.document_ids)} documents)")
+                return True
+            
+            current_ids = collection.get(include=[])['ids']  # Chỉ lấy ids, không tải documents
+            current_set = set(current_ids)
+            indexed_ids = set(BM25_ENGINE.document_ids)
+            
+            stale_ids = indexed_ids - current_set
+            missing_ids = [doc_id for doc_id in current_ids if doc_id not in indexed_ids]
+            
+            if stale_ids:
+                BM25_ENGINE.remove_documents(stale_ids)
+            if missing_ids:
+                missing = collection.get(ids=missing_ids, include=["metadatas"])
+                _add_to_bm25_index(missing['ids'], missing['metadatas'])
+            if stale_ids or missing_ids:
+                _save_bm25_index()
+            
+            if BM25_ENGINE.is_ready():
+                BM25_ENABLED = True
+                logger.info(f"✓ BM25 index up to date ({len(BM25_ENGINE.document_ids)} documents, "
+                            f"{len(missing_ids)} added, {len(stale_ids)} removed)")
+                return True
+        
+        # 3. Build lại toàn bộ (chưa có index)
+        logger.info("Initializing BM25 index...")
+        
+        # Lấy toàn bộ dữ liệu (chỉ cần metadata để tạo searchable text)
         all_docs = collection.get(
-            include=["documents", "metadatas"]
+            include=["metadatas"]
         )
         
         if not all_docs['ids']:
@@ -342,6 +448,7 @@ def initialize_bm25_index():
             document_ids=all_docs['ids'],
             metadatas=all_docs['metadatas']
         )
+        _save_bm25_index()
         
         BM25_ENABLED = True
         logger.info(f"✓ BM25 index initialized with {len(all_docs['ids'])} documents")
@@ -352,8 +459,11 @@ def initialize_bm25_index():
         BM25_ENABLED = False
         return False
 
-def normalize_similarity(distance: float) -> float:
-    """Chuyển đổi khoảng cách L2 (Distance) thành điểm tương đồng (Similarity Score 0-1)"""
+def normalize_similarity(distance: float, space: str = "l2") -> float:
+    """Chuyển đổi khoảng cách (Distance) thành điểm tương đồng (Similarity Score 0-1)"""
+    if space == "cosine":
+        # Cosine distance = 1 - cos_sim -> chuyển đổi chính xác
+        return float(min(max(1 - distance, 0.0), 1.0))
     if distance <= 0:
         return 1.0
     # Công thức: 1 / (1 + distance)
@@ -406,10 +516,11 @@ def calculate_combined_score(
     distance: float,
     question: str,
     document: str,
-    metadata: Dict
+    metadata: Dict,
+    space: str = "l2"
 ) -> Tuple[float, Dict[str, float]]:
     """Tính điểm tổng hợp từ các thành phần (Semantic + Keyword + Medical Context)"""
-    semantic_score = normalize_similarity(distance)
+    semantic_score = normalize_similarity(distance, space)
     keyword_score = calculate_keyword_match_score(question, document, metadata)
     medical_score = calculate_medical_relevance_score(question, metadata)
     
@@ -491,10 +602,13 @@ def extract_user_intent_and_features(question: str) -> Dict[str, Any]:
 
 def hybrid_search(
     question: str,
-    n_results: int = 10
+    n_results: int = 10,
+    query_embedding: Optional[List[float]] = None
 ) -> List[Dict[str, Any]]:
     """
     Tìm kiếm kết hợp (Hybrid Search): BM25 + Vector.
+    query_embedding: Vector đã tính sẵn của câu hỏi (VD: batch embedding khi evaluate),
+    nếu None sẽ mã hóa câu hỏi bằng PhoBERT.
     Output: Danh sách kết quả đã được chấm điểm tổng hợp.
     """
     results_dict = defaultdict(lambda: {'bm25_score': 0.0, 'vector_score': 0.0})
@@ -523,7 +637,10 @@ def hybrid_search(
     # 2. TÌM KIẾM NGỮ NGHĨA (VECTOR SEARCH)
     try:
         collection = get_or_create_collection()
-        query_vec = phobert_ef([question])[0] # Mã hóa câu hỏi thành Vector
+        if query_embedding is not None:
+            query_vec = list(query_embedding)
+        else:
+            query_vec = phobert_ef([question])[0] # Mã hóa câu hỏi thành Vector
         vector_results = collection.query(
             query_embeddings=[query_vec],
             n_results=n_results * 2,
@@ -531,12 +648,13 @@ def hybrid_search(
         )
         
         # Xử lý kết quả Vector
+        space = get_distance_space(collection)
         for i in range(len(vector_results['ids'][0])):
             doc_id = vector_results['ids'][0][i]
             distance = vector_results['distances'][0][i]
             
             # Chuẩn hóa khoảng cách thành điểm Similarity (0-1)
-            vector_score = normalize_similarity(distance)
+            vector_score = normalize_similarity(distance, space)
             
             results_dict[doc_id]['vector_score'] = vector_score
             results_dict[doc_id]['metadata'] = vector_results['metadatas'][0][i]
@@ -862,7 +980,7 @@ LUÔN KHUYẾN CÁO ĐI KHÁM BÁC SĨ NẾU:
 
         # Gọi GPT Lần 1
         response = client.chat.completions.create(
-            model="gpt-4o",
+            model=GENERATION_MODEL,
             messages=messages,
             tools=AVAILABLE_TOOLS,  # Cung cấp danh sách công cụ
             tool_choice="auto",
@@ -895,7 +1013,7 @@ LUÔN KHUYẾN CÁO ĐI KHÁM BÁC SĨ NẾU:
             
             # Gọi GPT Lần 2 (có thông tin từ tool)
             second_response = client.chat.completions.create(
-                model="gpt-4o",
+                model=GENERATION_MODEL,
                 messages=messages,
                 temperature=0.3,
                 max_tokens=800
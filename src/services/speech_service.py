@@ -6,6 +6,8 @@ Service layer xử lý việc chuyển đổi giọng nói thành văn bản.
 Thay đổi quan trọng:
 - Trước đây: Sử dụng thư viện `whisper` local (nặng, tốn RAM, cần GPU).
 - Hiện tại: Sử dụng OpenAI Whisper API (nhanh, chính xác, không tốn tài nguyên server).
+- Tùy chọn: SPEECH_BACKEND=local chạy faster-whisper (CTranslate2) ngay trên server,
+  int8 trên CPU / float16 trên GPU (~4x nhanh hơn openai-whisper, ít RAM hơn).
 
 Tính năng:
 1. Validate file audio (định dạng, kích thước).
@@ -17,15 +19,24 @@ Tính năng:
 import os
 import logging
 import tempfile
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
 from openai import OpenAI
 client = OpenAI() # Tự động load API Key từ biến môi trường OPENAI_API_KEY
 
+from src.services.whisper_manager import WhisperManager, WHISPER_MODEL
+
 logger = logging.getLogger(__name__)
 
+# Backend: 'openai' (mặc định, gọi API) hoặc 'local' (faster-whisper trên server)
+SPEECH_BACKEND = os.getenv('SPEECH_BACKEND', 'openai').lower()
+
+# Prompt phụ trợ: Giúp model định hướng ngữ cảnh Y Tế Tiếng Việt
+# Whisper dùng prompt để hiểu các từ chuyên ngành tốt hơn.
+MEDICAL_PROMPT = "Đây là câu hỏi về y tế, sức khỏe bằng tiếng Việt. Hãy phiên âm chính xác các thuật ngữ y khoa."
+
 # Các định dạng audio hỗ trợ
 ALLOWED_EXTENSIONS = {'mp3', 'wav', 'm4a', 'webm', 'ogg', 'flac', 'mp4'}
 # Giới hạn kích thước file (25MB là giới hạn của Whisper API)
@@ -34,14 +45,24 @@ MAX_FILE_SIZE = 25 * 1024 * 1024  # 25MB
 
 class SpeechService:
     def __init__(self):
-        logger.info("SpeechService initialized using OpenAI Whisper API")
+        self.backend = SPEECH_BACKEND
+        self.model_name = WHISPER_MODEL if self.backend == 'local' else "whisper-1"
+        logger.info(f"SpeechService initialized (backend: {self.backend}, model: {self.model_name})")
+
+    @property
+    def model(self):
+        """Model faster-whisper đang được cache (None nếu chưa load hoặc dùng API)."""
+        return WhisperManager._model
 
     def _load_model(self):
         """
-        [Legacy] Placeholder cho hàm load model local cũ.
-        Hiện tại không dùng nữa vì gọi API.
+        Lấy model faster-whisper từ WhisperManager (chỉ khi SPEECH_BACKEND=local).
+        Model được cache cho cả process, không load lại mỗi request/test.
+        Với backend OpenAI API thì không cần load gì.
         """
-        return
+        if self.backend != 'local':
+            return None
+        return WhisperManager.get_model(model_size=self.model_name)
 
     def validate_audio_file(self, file: FileStorage) -> Tuple[bool, Optional[str]]:
         """
@@ -102,16 +123,48 @@ class SpeechService:
         logger.info(f"Temp audio saved: {temp_path}")
         return temp_path
 
+    @staticmethod
+    def _collect_segments(segments, info) -> dict:
+        """Gom kết quả faster-whisper thành dict giống transcribe_audio."""
+        # segments là generator: việc decode thực sự diễn ra khi duyệt
+        segments = [
+            {"start": seg.start, "end": seg.end, "text": seg.text.strip()}
+            for seg in segments
+        ]
+
+        return {
+            "text": " ".join(seg["text"] for seg in segments).strip(),
+            "language": info.language,
+            "segments": segments,
+            "duration": info.duration
+        }
+
+    def _transcribe_local(self, audio_path: str, language: str) -> dict:
+        """Transcribe bằng faster-whisper trên server."""
+        model = self._load_model()
+
+        # vad_filter: bỏ đoạn im lặng trước khi decode
+        segments, info = model.transcribe(
+            audio_path,
+            language=language,
+            beam_size=5,
+            vad_filter=True,
+            initial_prompt=MEDICAL_PROMPT
+        )
+        return self._collect_segments(segments, info)
+
     def transcribe_audio(self, audio_path: str, language: str = "vi") -> dict:
         """
-        Core function: Gọi OpenAI Whisper API.
+        Core function: Gọi OpenAI Whisper API (hoặc faster-whisper nếu SPEECH_BACKEND=local).
         """
         try:
-            logger.info(f"Calling Whisper API for file: {audio_path}")
+            if self.backend == 'local':
+                logger.info(f"Transcribing locally with faster-whisper: {audio_path}")
+                result = self._transcribe_local(audio_path, language)
+                logger.info(f"Transcription OK. Text length: {len(result['text'])} chars")
+                return result
 
-            # Prompt phụ trợ: Giúp model định hướng ngữ cảnh Y Tế Tiếng Việt
-            # Whisper dùng prompt để hiểu các từ chuyên ngành tốt hơn.
-            prompt = "Đây là câu hỏi về y tế, sức khỏe bằng tiếng Việt. Hãy phiên âm chính xác các thuật ngữ y khoa."
+            logger.info(f"Calling Whisper API for file: {audio_path}")
 
             with open(audio_path, "rb") as f:
                 # Gọi API transcription
@@ -119,7 +172,7 @@ class SpeechService:
                     model="whisper-1", # Model chuẩn của OpenAI cho audio
                     file=f,
                     language=language, # 'vi' cho tiếng Việt
-                    prompt=prompt,
+                    prompt=MEDICAL_PROMPT,
                     temperature=0.0    # 0.0 để kết quả nhất quán nhất
                 )
 
@@ -135,9 +188,44 @@ class SpeechService:
             }
 
         except Exception as e:
-            logger.error(f"OpenAI transcription failed: {e}")
+            logger.error(f"Transcription failed ({self.backend}): {e}")
             raise RuntimeError(f"Failed to transcribe audio: {e}")
 
+    def transcribe_batch(self, paths: List[str], language: str = "vi", batch_size: int = 16) -> List[dict]:
+        """
+        Transcribe nhiều file audio (dùng cho đánh giá / xử lý hàng loạt).
+        Kết quả trả về đúng thứ tự của paths; file lỗi có thêm key "error" thay vì làm hỏng cả lô.
+
+        - SPEECH_BACKEND=local: BatchedInferencePipeline của faster-whisper,
+          decode batch_size đoạn audio (đã cắt theo VAD) trong một lần chạy model.
+        - OpenAI API: gọi lần lượt từng file.
+        """
+        if self.backend == 'local':
+            from faster_whisper import BatchedInferencePipeline
+            # Tạo pipeline 1 lần cho cả lô, dùng chung model đã cache
+            pipeline = BatchedInferencePipeline(model=self._load_model())
+
+        results = []
+        for path in paths:
+            try:
+                if self.backend != 'local':
+                    results.append(self.transcribe_audio(path, language))
+                    continue
+
+                segments, info = pipeline.transcribe(
+                    path,
+                    language=language,
+                    batch_size=batch_size,
+                    initial_prompt=MEDICAL_PROMPT
+                )
+                results.append(self._collect_segments(segments, info))
+            except Exception as e:
+                logger.error(f"Batch transcription failed for {path}: {e}")
+                results.append({"text": "", "language": language, "segments": [], "duration": 0, "error": str(e)})
+
+        logger.info(f"Batch transcription done: {len(paths)} files ({self.backend})")
+        return results
+
     def cleanup_temp_file(self, file_path: str):
         """Xóa file tạm để giải phóng dung lượng đĩa."""
         try:
@@ -13,18 +13,22 @@ Tính năng:
 
 import json
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from openai import OpenAI
 from src.config.config import Config
 
 # Initialize OpenAI client
 client = OpenAI(api_key=Config.OPENAI_API_KEY)
 
-SUGGESTION_PROMPT_TEMPLATE = """
-Bạn là trợ lý y tế chuyên nghiệp tại Việt Nam. Dựa trên cuộc hội thoại sau, 
-hãy tạo 3 câu hỏi tiếp theo mà người dùng có thể quan tâm.
+# Thread pool để gọi LLM song song với request thread (VD: trong lúc commit DB)
+suggestion_executor = ThreadPoolExecutor(max_workers=Config.SUGGESTION_WORKERS, thread_name_prefix='suggestion')
 
-Câu hỏi của người dùng: {user_question}
-Câu trả lời của chatbot: {bot_answer}
+# System prompt cố định (không chứa dữ liệu thay đổi theo request).
+# Đặt toàn bộ phần tĩnh ở đầu messages để mọi request dùng chung một prefix,
+# giúp provider tái sử dụng prompt cache; chỉ phần Q&A ở cuối thay đổi.
+SUGGESTION_SYSTEM_PROMPT = """
+Bạn là trợ lý y tế chuyên nghiệp tại Việt Nam. Luôn trả lời bằng JSON format.
+Dựa trên cuộc hội thoại người dùng gửi, hãy tạo 3 câu hỏi tiếp theo mà người dùng có thể quan tâm.
 
 Yêu cầu:
 1. 3 câu hỏi phải liên quan trực tiếp đến chủ đề y tế đang thảo luận
@@ -39,15 +43,23 @@ Ví dụ tốt:
 - "Triệu chứng nào cần đi khám ngay?"
 
 Trả lời CHÍNH XÁC theo format JSON sau (không thêm text nào khác):
-{{
+{
   "suggestions": [
     "Câu hỏi 1",
     "Câu hỏi 2",
     "Câu hỏi 3"
   ]
-}}
+}
+"""
+
+# Phần thay đổi theo từng request (đặt sau system prompt)
+SUGGESTION_PROMPT_TEMPLATE = """
+Câu hỏi của người dùng: {user_question}
+Câu trả lời của chatbot: {bot_answer}
 """
 
+_SYSTEM_MESSAGE = {"role": "system", "content": SUGGESTION_SYSTEM_PROMPT}
+
 
 def generate_next_questions(user_question: str, bot_answer: str, topic: str = None) -> list:
     """
@@ -92,10 +104,7 @@ def generate_next_questions(user_question: str, bot_answer: str, topic: str = No
         response = client.chat.completions.create(
             model=Config.OPENAI_MODEL,
             messages=[
-                {
-                    "role": "system",
-                    "content": "Bạn là trợ lý y tế chuyên nghiệp. Luôn trả lời bằng JSON format."
-                },
+                _SYSTEM_MESSAGE,  # Prefix cố định -> cache được
                 {
                     "role": "user",
                     "content": prompt
@@ -128,13 +137,20 @@ def generate_next_questions(user_question: str, bot_answer: str, topic: str = No
         return []
 
 
-def generate_next_questions_async(user_question: str, bot_answer: str, topic: str = None):
+def generate_next_questions_async(user_question: str, bot_answer: str, topic: str = None) -> Future:
     """
     Async version - để tránh block main response
-    Có thể implement sau nếu cần
+    
+    Chạy generate_next_questions trên thread pool và trả về Future ngay lập tức,
+    caller có thể làm việc khác (VD: commit DB) rồi mới gọi future.result(timeout=...).
+    Mỗi hội thoại là 1 request riêng (không gộp dữ liệu y tế của nhiều user vào 1 prompt);
+    các request đồng thời chạy song song trên suggestion_executor và dùng chung prefix
+    _SYSTEM_MESSAGE nên vẫn tận dụng được prompt cache.
+    
+    Returns:
+        Future: kết quả là list câu hỏi gợi ý
     """
-    # TODO: Implement async version with asyncio
-    pass
+    return suggestion_executor.submit(generate_next_questions, user_question, bot_answer, topic)
 
 
 # Fallback suggestions khi API fail
@@ -0,0 +1,91 @@
+"""
+Whisper Model Manager
+=====================
+Giữ một model faster-whisper duy nhất cho cả process (singleton theo class).
+
+- Model chỉ load lại khi (device, model_size) thay đổi, nên Flask worker,
+  create_app() và các script test dùng chung một lần load (10-30s, ~150MB).
+- unload() giải phóng RAM/VRAM giữa các đợt batch job.
+"""
+
+import gc
+import os
+import logging
+import threading
+
+try:
+    from faster_whisper import WhisperModel
+    import ctranslate2
+    HAVE_FASTER_WHISPER = True
+except ImportError:
+    HAVE_FASTER_WHISPER = False
+
+logger = logging.getLogger(__name__)
+
+# Tên model faster-whisper khi chạy local (tiny, base, small, medium, large-v3, ...)
+WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')
+
+
+class WhisperManager:
+    _model = None
+    _device = None
+    _model_size = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_model(cls, device: str = None, model_size: str = WHISPER_MODEL):
+        """
+        Trả về model đã cache; chỉ load (lại) khi device/model_size khác lần trước.
+        device=None: tự chọn 'cuda' nếu có GPU, ngược lại 'cpu'.
+        """
+        if not HAVE_FASTER_WHISPER:
+            raise RuntimeError("SPEECH_BACKEND=local requires faster-whisper: pip install faster-whisper")
+
+        if device is None:
+            device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+
+        with cls._lock:
+            if cls._model is not None and (cls._device, cls._model_size) == (device, model_size):
+                return cls._model
+
+            # Config đổi -> bỏ model cũ trước khi load model mới
+            cls._release()
+
+            # GPU: float16, CPU: int8 (GEMM int8 của CTranslate2)
+            compute_type = "float16" if device == "cuda" else "int8"
+            logger.info(f"Loading faster-whisper model '{model_size}' on {device} ({compute_type})")
+
+            cls._model = WhisperModel(model_size, device=device, compute_type=compute_type)
+            cls._device = device
+            cls._model_size = model_size
+            return cls._model
+
+    @classmethod
+    def is_loaded(cls) -> bool:
+        return cls._model is not None
+
+    @classmethod
+    def unload(cls) -> bool:
+        """Giải phóng model (RAM/VRAM). Trả về True nếu có model để unload."""
+        with cls._lock:
+            return cls._release()
+
+    @classmethod
+    def _release(cls) -> bool:
+        if cls._model is None:
+            return False
+
+        logger.info(f"Unloading faster-whisper model '{cls._model_size}' ({cls._device})")
+        cls._model = None
+        cls._device = None
+        cls._model_size = None
+        gc.collect()
+
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+        return True
@@ -0,0 +1,62 @@
+"""
+JSON Utilities - Serialize response bằng orjson
+===============================================
+orjson (C) nhanh hơn json chuẩn vài lần với response lớn của chatbot (sources,
+score_breakdown, answer) và serialize được trực tiếp số numpy (điểm BM25/vector).
+
+Chỉ dùng khi đã cài orjson (pip install orjson); ngược lại Flask/Flask-RESTX
+giữ nguyên json chuẩn.
+"""
+
+from flask import current_app, make_response
+from flask.json.provider import DefaultJSONProvider
+from flask_restx.representations import output_json
+
+try:
+    import orjson
+    HAVE_ORJSON = True
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+except ImportError:
+    HAVE_ORJSON = False
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider của Flask (jsonify, request.get_json) dùng orjson."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        option = ORJSON_OPTIONS | orjson.OPT_PASSTHROUGH_DATETIME  # datetime: giữ định dạng HTTP date của Flask
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+# Các key của RESTX_JSON mà orjson hỗ trợ; key khác (cls, default, ...) -> dùng output_json chuẩn
+ORJSON_RESTX_SETTINGS = {'indent', 'sort_keys'}
+
+
+def output_orjson(data, code, headers=None):
+    """
+    Representation 'application/json' cho Flask-RESTX (thay cho output_json mặc định).
+
+    Tôn trọng RESTX_JSON giống output_json: indent (orjson chỉ có indent 2, debug mặc định
+    bật indent) và sort_keys (mặc định theo app.json.sort_keys). Setting khác -> json chuẩn.
+    """
+    settings = dict(current_app.config.get("RESTX_JSON", {}))
+    if not settings.keys() <= ORJSON_RESTX_SETTINGS:
+        return output_json(data, code, headers)
+
+    if current_app.debug:
+        settings.setdefault("indent", 4)
+
+    option = ORJSON_OPTIONS
+    if settings.get("indent"):
+        option |= orjson.OPT_INDENT_2
+    if settings.get("sort_keys", current_app.json.sort_keys):
+        option |= orjson.OPT_SORT_KEYS
+
+    resp = make_response(orjson.dumps(data, option=option) + b"\n", code)
+    resp.headers.extend(headers or {})
+    return resp
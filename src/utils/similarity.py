@@ -0,0 +1,379 @@
+"""
+Similarity Utilities - Tìm cặp vector gần trùng nhau
+=====================================================
+Cosine similarity theo khối (tiled matmul) trên embedding đã chuẩn hóa L2, hoặc
+tìm láng giềng gần nhất qua HNSW index của ChromaDB; dùng chung cho các script khử trùng lặp (scripts/database).
+"""
+
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+try:
+    from datasketch import MinHash, MinHashLSH
+    HAVE_DATASKETCH = True
+except ImportError:
+    MinHash = MinHashLSH = None
+    HAVE_DATASKETCH = False
+
+try:
+    import numba
+    HAVE_NUMBA = True
+except ImportError:
+    numba = None
+    HAVE_NUMBA = False
+
+logger = logging.getLogger(__name__)
+
+
+def _use_gpu() -> bool:
+    return torch is not None and torch.cuda.is_available()
+
+
+def _quantize_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-row int8 quantization: embeddings ~= codes / scales[:, None]
+    """
+    scales = 127.0 / np.maximum(np.abs(embeddings).max(axis=1), 1e-12)
+    codes = np.round(embeddings * scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _tile_similarity(rows: np.ndarray, cols: np.ndarray, row_scales=None, col_scales=None) -> np.ndarray:
+    """
+    Similarity tile between two blocks of normalized (possibly quantized) rows.
+    
+    Tiles are upcast only for the duration of the GEMM so the full matrix
+    stays in its compact storage format.
+    """
+    if rows.dtype == np.int8:
+        # Tích int8 cộng dồn chính xác trong float32 khi 127*127*dim < 2^24 (dim < 1040):
+        # dùng BLAS sgemm thay vì matmul số nguyên của NumPy (không có BLAS, chậm hơn ~20x)
+        acc_dtype = np.float32 if rows.shape[1] * 127 * 127 < 2 ** 24 else np.int32
+        dots = rows.astype(acc_dtype) @ cols.astype(acc_dtype).T
+        return np.minimum(dots / np.outer(row_scales, col_scales), 1.0)
+    return rows.astype(np.float32, copy=False) @ cols.astype(np.float32, copy=False).T
+
+
+def find_duplicates_matmul(
+    ids: List[str],
+    embeddings: np.ndarray,
+    similarity_threshold: float = 0.95,
+    block_size: int = 2048,
+    precision: str = "fp16"
+) -> List[Tuple[str, str, float]]:
+    """
+    Find duplicate pairs with a tiled cosine-similarity matmul
+    
+    Embeddings are L2-normalized once, then stored as fp32, fp16 or per-row
+    int8 (precision). The 0.95 threshold sits far above the quantization error,
+    so the compact formats halve / quarter memory without changing results.
+    On CUDA each block of rows is multiplied against the whole matrix in FP16
+    and thresholded on the device, so only the matching pairs are copied back;
+    on CPU only the upper-triangle tiles are computed.
+    
+    Returns:
+        List of (id1, id2, similarity) tuples
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = embeddings / np.maximum(norms, 1e-12)
+    total_docs = embeddings.shape[0]
+    
+    duplicates = []
+    
+    if _use_gpu():
+        matrix = torch.from_numpy(embeddings).cuda().half()
+        del embeddings
+        for start in range(0, total_docs, block_size):
+            logger.info("Progress: %d/%d", start, total_docs)
+            
+            sims = matrix[start:start + block_size] @ matrix.T
+            
+            # Keep only pairs (i, j) with global index j > i; lọc ngưỡng trên GPU,
+            # chỉ chuyển các cặp trùng (không phải cả khối) về CPU
+            sims = torch.triu(sims, diagonal=start + 1)
+            hits = torch.nonzero(sims >= similarity_threshold)
+            values = sims[hits[:, 0], hits[:, 1]].float().cpu().tolist()
+            for (i, j), similarity in zip(hits.cpu().tolist(), values):
+                duplicates.append((ids[start + i], ids[j], similarity))
+        return duplicates
+    
+    scales = None
+    if precision == "int8":
+        matrix, scales = _quantize_int8(embeddings)
+    elif precision == "fp16":
+        matrix = embeddings.astype(np.float16)
+    else:
+        matrix = embeddings
+    del embeddings
+    
+    for row_start in range(0, total_docs, block_size):
+        logger.info("Progress: %d/%d", row_start, total_docs)
+        
+        rows = matrix[row_start:row_start + block_size]
+        row_scales = scales[row_start:row_start + block_size] if scales is not None else None
+        
+        for col_start in range(row_start, total_docs, block_size):
+            cols = matrix[col_start:col_start + block_size]
+            col_scales = scales[col_start:col_start + block_size] if scales is not None else None
+            
+            sims = _tile_similarity(rows, cols, row_scales, col_scales)
+            if col_start == row_start:
+                sims = np.triu(sims, k=1)
+            
+            for i, j in np.argwhere(sims >= similarity_threshold):
+                duplicates.append((ids[row_start + i], ids[col_start + j], float(sims[i, j])))
+    
+    return duplicates
+
+
+if HAVE_NUMBA:
+    # Không dùng fastmath: 2 kernel phải cộng dot theo cùng một thứ tự,
+    # nếu không cặp sát ngưỡng có thể được đếm ở pass 1 nhưng khác kết quả ở pass 2
+    @numba.njit(parallel=True, cache=True)
+    def _count_pairs_above(matrix, threshold):
+        total_docs, dim = matrix.shape
+        counts = np.zeros(total_docs, dtype=np.int64)
+        for i in numba.prange(total_docs):
+            for j in range(i + 1, total_docs):
+                dot = np.float32(0.0)
+                for k in range(dim):
+                    dot += matrix[i, k] * matrix[j, k]
+                if dot >= threshold:
+                    counts[i] += 1
+        return counts
+
+    @numba.njit(parallel=True, cache=True)
+    def _fill_pairs_above(matrix, threshold, offsets, counts, out_i, out_j, out_s):
+        total_docs, dim = matrix.shape
+        for i in numba.prange(total_docs):
+            pos = offsets[i]
+            end = offsets[i] + counts[i]  # Numba không kiểm tra biên: không ghi quá phần của hàng i
+            for j in range(i + 1, total_docs):
+                dot = np.float32(0.0)
+                for k in range(dim):
+                    dot += matrix[i, k] * matrix[j, k]
+                if dot >= threshold and pos < end:
+                    out_i[pos] = i
+                    out_j[pos] = j
+                    out_s[pos] = dot
+                    pos += 1
+
+
+def find_duplicates_numba(
+    ids: List[str],
+    embeddings: np.ndarray,
+    similarity_threshold: float = 0.95
+) -> List[Tuple[str, str, float]]:
+    """
+    Find duplicate pairs with a parallel Numba kernel (no similarity matrix)
+    
+    Two passes over the upper triangle: the first counts the pairs above the
+    threshold per row, the second writes them at per-row offsets, so threads
+    never share an output slot. Memory stays O(N*dim + pairs). Falls back to
+    find_duplicates_matmul when numba is not installed.
+    
+    Returns:
+        List of (id1, id2, similarity) tuples
+    """
+    if not HAVE_NUMBA:
+        logger.warning("numba not installed, using the NumPy matmul")
+        return find_duplicates_matmul(ids, embeddings, similarity_threshold, precision="fp32")
+    
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    matrix = np.ascontiguousarray(embeddings / np.maximum(norms, 1e-12))
+    threshold = np.float32(similarity_threshold)
+    
+    counts = _count_pairs_above(matrix, threshold)
+    offsets = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=offsets[1:])
+    
+    total_pairs = int(counts.sum())
+    out_i = np.empty(total_pairs, dtype=np.int64)
+    out_j = np.empty(total_pairs, dtype=np.int64)
+    out_s = np.empty(total_pairs, dtype=np.float32)
+    _fill_pairs_above(matrix, threshold, offsets, counts, out_i, out_j, out_s)
+    
+    return [(ids[i], ids[j], float(sim)) for i, j, sim in zip(out_i, out_j, out_s)]
+
+
+def _minhash_clusters(texts: List[str], jaccard_threshold: float, num_perm: int) -> List[np.ndarray]:
+    """Group texts whose word 3-shingles collide in MinHash LSH (connected components)"""
+    lsh = MinHashLSH(threshold=jaccard_threshold, num_perm=num_perm)
+    parent = list(range(len(texts)))
+    
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    for i, text in enumerate(texts):
+        words = (text or '').split()
+        minhash = MinHash(num_perm=num_perm)
+        for k in range(max(len(words) - 2, 1)):
+            minhash.update(' '.join(words[k:k + 3]).encode('utf-8'))
+        
+        for j in lsh.query(minhash):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[root_i] = root_j
+        lsh.insert(i, minhash)
+    
+    clusters = {}
+    for i in range(len(texts)):
+        clusters.setdefault(find(i), []).append(i)
+    return [np.asarray(members) for members in clusters.values()]
+
+
+def find_duplicates_minhash(
+    ids: List[str],
+    texts: List[str],
+    embeddings: np.ndarray,
+    similarity_threshold: float = 0.95,
+    jaccard_threshold: float = 0.7,
+    centroid_threshold: float = 0.90,
+    num_perm: int = 128,
+    block_size: int = 2048
+) -> List[Tuple[str, str, float]]:
+    """
+    Find duplicate pairs inside MinHash clusters and across similar clusters only
+    
+    Texts are clustered by MinHash LSH over word 3-shingles. Each cluster is
+    summarized by the normalized mean of its L2-normed embeddings; pairs are
+    compared within a cluster and between clusters whose centroids have a
+    cosine above centroid_threshold. Approximate: skips cross-cluster work
+    when many documents share wording, but can miss a pair whose clusters'
+    centroids are far apart. Falls back to find_duplicates_matmul when
+    datasketch is not installed.
+    
+    Returns:
+        List of (id1, id2, similarity) tuples
+    """
+    if not HAVE_DATASKETCH:
+        logger.warning("datasketch not installed, using the NumPy matmul")
+        return find_duplicates_matmul(ids, embeddings, similarity_threshold, precision="fp32")
+    
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = embeddings / np.maximum(norms, 1e-12)
+    
+    clusters = _minhash_clusters(texts, jaccard_threshold, num_perm)
+    logger.info("%d MinHash clusters for %d documents", len(clusters), len(ids))
+    
+    centroids = np.stack([embeddings[members].mean(axis=0) for members in clusters]) if clusters else embeddings[:0]
+    centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    
+    duplicates = []
+    
+    def compare(rows: np.ndarray, cols: np.ndarray, same: bool):
+        sims = embeddings[rows] @ embeddings[cols].T
+        if same:
+            sims = np.triu(sims, k=1)
+        for i, j in np.argwhere(sims >= similarity_threshold):
+            duplicates.append((ids[rows[i]], ids[cols[j]], float(sims[i, j])))
+    
+    for members in clusters:
+        if len(members) > 1:
+            compare(members, members, same=True)
+    
+    # Cặp cluster có centroid gần nhau (chỉ nửa trên, theo khối để giới hạn RAM)
+    for start in range(0, len(clusters), block_size):
+        centroid_sims = np.triu(centroids[start:start + block_size] @ centroids.T, k=start + 1)
+        for a, b in np.argwhere(centroid_sims > centroid_threshold):
+            compare(clusters[start + a], clusters[b], same=False)
+    
+    return duplicates
+
+
+def find_duplicates_query(
+    collection,
+    ids: List[str],
+    embeddings: np.ndarray,
+    similarity_threshold: float = 0.95,
+    space: str = "cosine",
+    batch_size: int = 256,
+    n_results: int = 10,
+    max_workers: int = 8,
+    skip_pairs=None
+) -> List[Tuple[str, str, float]]:
+    """
+    Find duplicate pairs with ChromaDB's HNSW index instead of all pairs
+    
+    Each embedding is queried for its n_results nearest neighbours, so the
+    work is ~O(N log N) instead of O(N^2). Approximate: a document with more
+    than n_results near-copies only reports the closest ones.
+    
+    Args:
+        collection: ChromaDB collection holding the embeddings
+        space: Distance space of the collection ("cosine", "l2", "ip")
+        batch_size: Number of embeddings sent to ChromaDB per query call
+        max_workers: Threads issuing concurrent ChromaDB queries
+        skip_pairs: Pairs (frozensets of ids) already reported elsewhere
+    
+    Returns:
+        List of (id1, id2, similarity) tuples
+    
+    Raises:
+        ValueError: If space is not one of "cosine", "l2", "ip"
+    """
+    # Convert distance to similarity (cosine) for the collection's space
+    if space == "cosine":
+        to_similarity = lambda distance: 1 - distance  # Exact: distance = 1 - cos_sim
+    elif space == "ip":
+        to_similarity = lambda distance: 1 - distance  # distance = 1 - dot (= cos_sim on unit vectors)
+    elif space == "l2":
+        to_similarity = lambda distance: 1 - (distance / 2)  # Squared L2 on unit vectors: d = 2 - 2*cos_sim
+    else:
+        raise ValueError(f"Unknown distance space: {space}")
+    
+    total_docs = len(ids)
+    duplicates = []
+    seen_ids = set()      # IDs already reported as a duplicate
+    checked_pairs = set(skip_pairs or ())  # Pairs already reported (frozenset keys, order-independent)
+    
+    def _search(start: int):
+        results = collection.query(
+            query_embeddings=embeddings[start:start + batch_size].tolist(),
+            n_results=n_results,
+            include=["distances"]
+        )
+        return start, results
+    
+    # Search in batches: one collection.query call per batch instead of per document.
+    # Batches run on a thread pool (ChromaDB releases the GIL in its native search);
+    # results are consumed here in order so the bookkeeping sets need no locking.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for start, results in executor.map(_search, range(0, total_docs, batch_size)):
+            logger.info("Progress: %d/%d", start, total_docs)
+            
+            batch_ids = ids[start:start + batch_size]
+            
+            # Check results of each query row
+            for k, doc_id in enumerate(batch_ids):
+                if doc_id in seen_ids:
+                    continue
+                
+                for result_id, distance in zip(results['ids'][k], results['distances'][k]):
+                    if result_id == doc_id:
+                        continue  # Skip self
+                    
+                    similarity = to_similarity(distance)
+                    
+                    if similarity >= similarity_threshold:
+                        # Found duplicate!
+                        pair = frozenset((doc_id, result_id))
+                        if pair not in checked_pairs:
+                            duplicates.append((doc_id, result_id, similarity))
+                            checked_pairs.add(pair)
+                            seen_ids.add(result_id)
+    
+    return duplicates
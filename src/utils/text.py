@@ -0,0 +1,22 @@
+"""
+Text Utilities - Xử lý chuỗi dạng cột (pandas)
+===============================================
+Các hàm vectorized dùng chung cho các script nạp dữ liệu (scripts/data).
+"""
+
+import pandas as pd
+
+
+def truncate_series(s: pd.Series, n: int, suffix: str = '...') -> pd.Series:
+    """
+    Cắt mỗi chuỗi dài hơn n ký tự còn n ký tự + suffix (giữ nguyên chuỗi ngắn).
+
+    Args:
+        s: Series chuỗi
+        n: Độ dài tối đa trước khi cắt
+        suffix: Thêm vào cuối chuỗi bị cắt
+
+    Returns:
+        Series đã cắt (cùng index)
+    """
+    return s.where(s.str.len() <= n, s.str.slice(0, n) + suffix)